@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Medida de rendimiento de la sincronización de extremo a extremo contra el SITA simulado
+
+- Crea N empleados sintéticos (BENCH0001, BENCH0002...) con credenciales SITA
+- Arranca scripts/mock_sita.py en este proceso (o usa uno ya arrancado con --mock)
+- Sincroniza a todos con AutoSyncManager (modo manager) o con uno o varios procesos
+  standalone_sync.py (modo standalone, opcionalmente con concesiones)
+- Informa de usuarios por minuto, latencia p50/p95 por usuario y escrituras en BD por usuario
+
+Uso:
+    python scripts/benchmark_sync.py --usuarios 200 --workers 8 --latencia-ms 150
+    python scripts/benchmark_sync.py --modo standalone --procesos 3 --leases --usuarios 300
+
+Escribe en la base de datos configurada en .env: usar una base de datos de pruebas.
+Los empleados BENCH se conservan entre ejecuciones salvo que se pase --limpiar.
+"""
+
+import sys
+import os
+import io
+import argparse
+import json
+import math
+import subprocess
+import tempfile
+import time
+import urllib.request
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(RAIZ, 'web'))
+
+PREFIJO = "BENCH"
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmark de la sincronización contra SITA simulado")
+    parser.add_argument("--modo", choices=("manager", "standalone"), default="manager")
+    parser.add_argument("--usuarios", type=int, default=50, help="Empleados sintéticos a sincronizar")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos de sincronización por proceso")
+    parser.add_argument("--procesos", type=int, default=1, help="Procesos standalone_sync.py (modo standalone)")
+    parser.add_argument("--leases", action="store_true", help="Repartir usuarios con concesiones (modo standalone)")
+    parser.add_argument("--intervalo", type=int, default=2,
+                        help="AUTO_SYNC_CYCLE_INTERVAL de los procesos standalone sin concesiones (los "
+                             "usuarios vencidos se reparten a lo largo de este intervalo)")
+    parser.add_argument("--tiempo-max", type=int, default=600, help="Segundos máximos de espera")
+    parser.add_argument("--mock", help="URL base de un SITA simulado ya arrancado (por defecto se arranca uno)")
+    parser.add_argument("--latencia-ms", type=int, default=100)
+    parser.add_argument("--variacion-ms", type=int, default=50)
+    parser.add_argument("--tasa-errores", type=float, default=0.0)
+    parser.add_argument("--tasa-timeouts", type=float, default=0.0)
+    parser.add_argument("--timeout-s", type=int, default=60)
+    parser.add_argument("--turnos-por-dia", type=int, default=1)
+    parser.add_argument("--tasa-cambios", type=float, default=0.05)
+    parser.add_argument("--limpiar", action="store_true", help="Borrar los empleados BENCH al terminar")
+    return parser.parse_args()
+
+
+def _mock_json(url, ruta, datos=None):
+    """Llama a un endpoint de control del SITA simulado"""
+    cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+    peticion = urllib.request.Request(f"{url}{ruta}", data=cuerpo, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(peticion, timeout=10) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def _percentil(valores, p):
+    """Percentil por rango más cercano (None si no hay valores)"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados), max(1, math.ceil(p / 100 * len(ordenados)))) - 1]
+
+
+def _media(valores):
+    return sum(valores) / len(valores) if valores else 0
+
+
+def crear_usuarios(n, roster_url):
+    """Crea o reactiva los empleados BENCH y sus credenciales; devuelve sus IDs"""
+    from database import execute_query
+    from models.credencial_sita import CredencialSita
+
+    ids = []
+    for i in range(1, n + 1):
+        numero = f"{PREFIJO}{i:04d}"
+        # password_hash no válido: los empleados sintéticos no pueden iniciar sesión
+        execute_query(
+            """
+            INSERT INTO empleados (numero_empleado, nombre_completo, password_hash, activo, ultimo_acceso)
+            VALUES (%s, %s, '!benchmark', 1, NOW())
+            ON DUPLICATE KEY UPDATE activo = 1, ultimo_acceso = NOW(), ultima_sincronizacion = NULL,
+                                    sincronizacion_en_progreso = 0, ultimo_error_sincronizacion = NULL
+            """,
+            (numero, f"Benchmark {i}"),
+            commit=True
+        )
+        empleado = execute_query("SELECT id FROM empleados WHERE numero_empleado = %s", (numero,), fetchone=True)
+        exito, mensaje = CredencialSita.guardar(empleado['id'], numero, "benchmark", "BENCH", "bench", roster_url)
+        if not exito:
+            raise RuntimeError(mensaje)
+        ids.append(empleado['id'])
+    return ids
+
+
+def otros_usuarios_con_credenciales():
+    """Empleados activos con credenciales que no son del benchmark"""
+    from database import execute_query
+
+    fila = execute_query(
+        """
+        SELECT COUNT(*) AS total FROM empleados e
+        INNER JOIN credenciales_sita c ON e.id = c.empleado_id
+        WHERE e.activo = 1 AND e.numero_empleado NOT LIKE %s
+        """,
+        (f"{PREFIJO}%",),
+        fetchone=True
+    )
+    return fila['total']
+
+
+def limpiar_usuarios():
+    """Borra los empleados BENCH (turnos, credenciales y demás caen en cascada)"""
+    from database import db_connection
+
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM empleados WHERE numero_empleado LIKE %s", (f"{PREFIJO}%",))
+            borrados = cursor.rowcount
+        conn.commit()
+    return borrados
+
+
+def medir_manager(ids, workers):
+    """
+    Una pasada de AutoSyncManager por todos los usuarios con los hilos indicados
+
+    Cada usuario se mide con un contexto de perf_monitor: duración y sentencias de escritura
+    """
+    from auto_sync_manager import AutoSyncManager
+    from perf_monitor import perf_monitor
+
+    perf_monitor.enabled = True
+    registros = []
+
+    class ManagerMedido(AutoSyncManager):
+        def _sync_user_worker(self, user):
+            perf_monitor.iniciar_peticion()
+            resultado = None
+            try:
+                resultado = super()._sync_user_worker(user)
+                return resultado
+            finally:
+                status = 200 if resultado else (503 if resultado is None else 500)
+                registro = perf_monitor.finalizar_peticion("benchmark_sync", "SYNC", status)
+                if registro:
+                    registros.append(registro)
+
+    manager = ManagerMedido(workers=workers)
+    users = manager._get_active_users_with_credentials(ids)
+    if len(users) != len(ids):
+        print(f"✗ Solo {len(users)} de {len(ids)} usuarios cumplen los filtros de AUTO_SYNC (¿AUTO_SYNC_EXCLUDED_USERS?)")
+
+    # Sin el bucle del planificador: una única pasada por el mismo camino que usan los hilos
+    manager.running = True
+    inicio = time.perf_counter()
+    try:
+        if workers > 1:
+            manager._sync_users_concurrently(users)
+        else:
+            for user in users:
+                manager._sync_user_worker(user)
+    finally:
+        manager.running = False
+    duracion = time.perf_counter() - inicio
+
+    return {
+        'duracion_s': duracion,
+        'sincronizados': sum(1 for r in registros if r['status'] == 200),
+        'latencias_ms': [r['duracion_ms'] for r in registros],
+        'escrituras': [r['escrituras'] for r in registros],
+        'filas_escritas': [r['filas_escritas'] for r in registros],
+        'manager': manager.get_stats()
+    }
+
+
+def medir_standalone(ids, args, url_mock):
+    """
+    Arranca procesos standalone_sync.py y espera a que todos los usuarios se hayan
+    sincronizado una vez (ultima_sincronizacion posterior al inicio)
+
+    La latencia de cada usuario va de su primera petición al SITA simulado a su
+    ultima_sincronizacion (resolución de 1 s); las escrituras son las filas de
+    turnos_empleado modificadas durante la prueba
+    """
+    from database import execute_query
+
+    entorno = dict(os.environ)
+    entorno.update({
+        'AUTO_SYNC_WORKERS': str(args.workers),
+        'AUTO_SYNC_LEASES': 'true' if args.leases else 'false',
+        'AUTO_SYNC_USE_QUEUE': 'false',
+        # Con concesiones no hay reparto inicial: un intervalo largo evita resincronizar durante la prueba
+        'AUTO_SYNC_CYCLE_INTERVAL': '3600' if args.leases else str(args.intervalo),
+        'AUTO_SYNC_MAX_USERS_PER_CYCLE': '0'
+    })
+    if args.leases:
+        execute_query("DELETE FROM sync_leases WHERE empleado_id IN ({})".format(', '.join(['%s'] * len(ids))),
+                      ids, commit=True)
+
+    marcadores = ', '.join(['%s'] * len(ids))
+    inicio_bd = execute_query("SELECT NOW() AS ahora", fetchone=True)['ahora']
+    inicio = time.perf_counter()
+    directorio = tempfile.mkdtemp(prefix="benchmark_sync_")
+    procesos = [
+        subprocess.Popen(
+            [sys.executable, os.path.join(RAIZ, 'standalone_sync.py')],
+            cwd=directorio, env=entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        for _ in range(args.procesos)
+    ]
+    print(f"  {len(procesos)} procesos arrancados (logs en {directorio})")
+
+    try:
+        sincronizados = 0
+        while time.perf_counter() - inicio < args.tiempo_max:
+            time.sleep(1)
+            sincronizados = execute_query(
+                f"SELECT COUNT(*) AS total FROM empleados WHERE id IN ({marcadores}) AND ultima_sincronizacion >= %s",
+                (*ids, inicio_bd), fetchone=True
+            )['total']
+            if sincronizados >= len(ids) or any(p.poll() is not None for p in procesos):
+                break
+        duracion = time.perf_counter() - inicio
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+        for proceso in procesos:
+            try:
+                proceso.wait(timeout=40)
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+
+    filas = execute_query(
+        f"SELECT numero_empleado, UNIX_TIMESTAMP(ultima_sincronizacion) AS sincronizado_en FROM empleados WHERE id IN ({marcadores}) AND ultima_sincronizacion >= %s",
+        (*ids, inicio_bd)
+    )
+    # Epoch calculado por MySQL: no depende de la zona horaria del servidor ni de la de este equipo
+    primera = _mock_json(url_mock, "/_mock/stats")['primera_peticion']
+    latencias = [
+        max(0.0, float(fila['sincronizado_en']) - primera[fila['numero_empleado']]) * 1000
+        for fila in filas if fila['numero_empleado'] in primera
+    ]
+    escritas = execute_query(
+        f"""
+        SELECT empleado_id, COUNT(*) AS filas FROM turnos_empleado
+        WHERE empleado_id IN ({marcadores}) AND fecha_actualizacion >= %s
+        GROUP BY empleado_id
+        """,
+        (*ids, inicio_bd)
+    )
+    por_usuario = {fila['empleado_id']: fila['filas'] for fila in escritas}
+
+    return {
+        'duracion_s': duracion,
+        'sincronizados': sincronizados,
+        'latencias_ms': latencias,
+        'escrituras': None,
+        'filas_escritas': [por_usuario.get(i, 0) for i in ids],
+        'procesos_caidos': sum(1 for p in procesos if p.returncode not in (0, -15, None))
+    }
+
+
+def informe(resultado, usuarios, stats_mock):
+    """Imprime el resumen de la prueba"""
+    duracion = resultado['duracion_s']
+    latencias = resultado['latencias_ms']
+
+    print("\n" + "=" * 60)
+    print("RESULTADOS")
+    print("=" * 60)
+    print(f"  Usuarios sincronizados:  {resultado['sincronizados']}/{usuarios}")
+    print(f"  Duración:                {duracion:.1f}s")
+    print(f"  Usuarios por minuto:     {resultado['sincronizados'] / duracion * 60 if duracion else 0:.1f}")
+    if latencias:
+        print(f"  Latencia p50:            {_percentil(latencias, 50):.0f} ms")
+        print(f"  Latencia p95:            {_percentil(latencias, 95):.0f} ms")
+        print(f"  Latencia máxima:         {max(latencias):.0f} ms")
+    if resultado['escrituras'] is not None:
+        print(f"  Sentencias de escritura: {_media(resultado['escrituras']):.1f} por usuario")
+    print(f"  Filas escritas:          {_media(resultado['filas_escritas']):.1f} por usuario")
+    print(f"  SITA simulado:           {stats_mock['signins']} signins, {stats_mock['rosters']} rosters, "
+          f"{stats_mock['errores']} errores, {stats_mock['timeouts']} timeouts, "
+          f"{stats_mock['dias_cambiados']} días cambiados")
+    if resultado.get('manager'):
+        stats = resultado['manager']
+        print(f"  Errores / aplazados:     {stats['total_errors']} / {stats['total_postponed']}")
+        print(f"  Cortacircuitos SITA:     {stats['sita_breaker']['estado']} "
+              f"({stats['sita_breaker']['aperturas']} aperturas)")
+    if resultado.get('procesos_caidos'):
+        print(f"  ✗ {resultado['procesos_caidos']} procesos standalone terminaron con error")
+
+
+def main():
+    args = _argumentos()
+
+    # El SITA simulado y las URLs se fijan antes de importar los módulos de la web
+    servidor = None
+    url_mock = args.mock
+    if not url_mock:
+        from mock_sita import iniciar_en_segundo_plano
+        servidor, _, url_mock = iniciar_en_segundo_plano()
+    url_mock = url_mock.rstrip("/")
+    os.environ['SITA_BASE_URL'] = url_mock
+    os.environ['SITA_AUTH_URL'] = f"{url_mock}/api/v1/auth/signin"
+    os.environ['SITA_ROSTER_URL'] = f"{url_mock}/api/v1/roster"
+    if not os.getenv('ENCRYPTION_KEY'):
+        from dotenv import load_dotenv
+        load_dotenv()
+    if not os.getenv('ENCRYPTION_KEY'):
+        from cryptography.fernet import Fernet
+        os.environ['ENCRYPTION_KEY'] = Fernet.generate_key().decode()
+
+    success = False
+    try:
+        print("=" * 60)
+        print("BENCHMARK DE SINCRONIZACIÓN - TurnosSouth")
+        print("=" * 60)
+        print(f"  SITA simulado: {url_mock}")
+        print(f"  Modo: {args.modo}, {args.usuarios} usuarios, {args.workers} hilos"
+              + (f", {args.procesos} procesos{' con concesiones' if args.leases else ''}" if args.modo == 'standalone' else ""))
+
+        # 1. Configurar el SITA simulado
+        print("\n1. Configurando SITA simulado...")
+        _mock_json(url_mock, "/_mock/reset", {})
+        config = _mock_json(url_mock, "/_mock/config", {
+            'latencia_ms': args.latencia_ms,
+            'variacion_ms': args.variacion_ms,
+            'tasa_errores': args.tasa_errores,
+            'tasa_timeouts': args.tasa_timeouts,
+            'timeout_s': args.timeout_s,
+            'turnos_por_dia': args.turnos_por_dia,
+            'tasa_cambios': args.tasa_cambios
+        })
+        print(f"✓ {json.dumps(config)}")
+
+        # 2. Crear los empleados sintéticos
+        print(f"\n2. Preparando {args.usuarios} empleados {PREFIJO}...")
+        if args.modo == 'standalone':
+            otros = otros_usuarios_con_credenciales()
+            if otros:
+                print(f"✗ Hay {otros} empleados reales con credenciales: los procesos standalone los "
+                      f"sincronizarían contra el SITA simulado. Usar una base de datos de pruebas.")
+                return False
+        ids = crear_usuarios(args.usuarios, f"{url_mock}/api/v1/roster")
+        print(f"✓ {len(ids)} empleados con credenciales")
+
+        # 3. Sincronizar
+        print(f"\n3. Sincronizando ({args.modo})...")
+        if args.modo == 'manager':
+            resultado = medir_manager(ids, args.workers)
+        else:
+            resultado = medir_standalone(ids, args, url_mock)
+
+        informe(resultado, len(ids), _mock_json(url_mock, "/_mock/stats"))
+        success = resultado['sincronizados'] == len(ids)
+
+    except Exception as e:
+        print(f"\n✗ Error durante el benchmark: {e}")
+        import traceback
+        traceback.print_exc()
+
+    finally:
+        if args.limpiar:
+            print(f"\n✓ {limpiar_usuarios()} empleados {PREFIJO} eliminados")
+        if servidor:
+            servidor.shutdown()
+
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generador de datos sintéticos para pruebas de carga en TurnosSouth
+- Crea N empleados (SYN000001, SYN000002...) con contraseña común y último acceso variado
+- Crea sus credenciales SITA (apuntando a scripts/mock_sita.py salvo SITA_ROSTER_URL)
+- Rellena turnos_empleado con los años de historial indicados hasta el final del mes
+  siguiente: turnos de mañana y tarde, partidos, nocturnos, días libres, vacaciones,
+  bajas y ausencias sueltas, y versiones anteriores inactivas de parte de los días
+- Rellena turno_shift con los turnos de los días activos
+
+Los datos son reproducibles: con la misma semilla y los mismos parámetros se genera
+exactamente lo mismo. Se inserta por lotes con varias filas por sentencia y sin
+comprobaciones de claves en la sesión, para cargar millones de filas en minutos.
+
+Uso:
+    python scripts/generate_synthetic_data.py --empleados 1000 --anios 3
+    python scripts/generate_synthetic_data.py --empleados 1000 --anios 3 --borrar
+
+Escribe en la base de datos configurada en .env: usar una base de datos de pruebas.
+"""
+
+import sys
+import os
+import io
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web'))
+
+from database import get_db_connection
+from models.roster_digest import RosterDigest
+from models.turno_shift import TurnoShift
+import bcrypt
+from cryptography.fernet import Fernet
+
+NOMBRES = ('Ana', 'Carlos', 'Lucía', 'Javier', 'Marta', 'David', 'Laura', 'Sergio', 'Elena',
+           'Pablo', 'Carmen', 'Raúl', 'Paula', 'Iván', 'Sara', 'Jorge', 'Nuria', 'Álvaro')
+APELLIDOS = ('García', 'Martínez', 'López', 'Sánchez', 'Pérez', 'Gómez', 'Martín', 'Jiménez',
+             'Ruiz', 'Hernández', 'Díaz', 'Moreno', 'Muñoz', 'Álvarez', 'Romero', 'Navarro')
+ROLES = ('AGT', 'COORD', 'RAMP', 'PAX')
+AREAS = ('T1', 'T2', 'MUELLE', 'PLATAFORMA')
+
+SENTENCIA_TURNOS = """
+    INSERT INTO turnos_empleado
+    (empleado_id, dia, turno, ausencias, contenido_hash, activo, fecha_creacion, fecha_actualizacion)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+SENTENCIA_SHIFTS = f"INSERT INTO turno_shift ({TurnoShift.COLUMNAS}) VALUES (%s, %s, %s, %s, %s, %s)"
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Generador de datos sintéticos de empleados y turnos")
+    parser.add_argument("--empleados", type=int, default=100, help="Número de empleados a crear")
+    parser.add_argument("--anios", type=float, default=2, help="Años de historial por empleado")
+    parser.add_argument("--prefijo", default="SYN", help="Prefijo del número de empleado")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla de los datos generados")
+    parser.add_argument("--password", default="synthetic123", help="Contraseña común de los empleados")
+    parser.add_argument("--tasa-credenciales", type=float, default=0.8,
+                        help="Fracción de empleados con credenciales SITA")
+    parser.add_argument("--tasa-partidos", type=float, default=0.1, help="Fracción de jornadas partidas")
+    parser.add_argument("--tasa-nocturnos", type=float, default=0.15, help="Fracción de jornadas nocturnas")
+    parser.add_argument("--tasa-ausencias", type=float, default=0.03, help="Fracción de días con ausencia suelta")
+    parser.add_argument("--tasa-versiones", type=float, default=0.15,
+                        help="Fracción de días con versiones anteriores inactivas")
+    parser.add_argument("--lote", type=int, default=5000, help="Filas por lote de inserción")
+    parser.add_argument("--sin-turno-shift", action="store_true", help="No rellenar turno_shift")
+    parser.add_argument("--borrar", action="store_true", help="Borrar antes los empleados con el prefijo")
+    return parser.parse_args()
+
+
+class GeneradorTurnos:
+    """
+    Cuadrante sintético de un empleado con el formato de la respuesta de SITA
+
+    Cada empleado tiene un perfil propio (franja habitual, descanso semanal y
+    tendencia a partidos y nocturnos) derivado de la semilla y su número
+    """
+
+    def __init__(self, numero, args):
+        self.args = args
+        self.azar = random.Random(f"{args.semilla}|{numero}")
+        self.franja = self.azar.choice((5, 6, 7, 13, 14, 15))
+        self.descanso = self.azar.randrange(7)
+        self.partidos = args.tasa_partidos * self.azar.uniform(0.5, 1.5)
+        self.nocturnos = args.tasa_nocturnos * self.azar.uniform(0.5, 1.5)
+        self.rol = self.azar.choice(ROLES)
+        self.area = self.azar.choice(AREAS)
+        self.bloques = {}
+
+    def _ausencia_en_bloque(self, dia):
+        """Vacaciones (dos bloques al año) y alguna baja de varios días"""
+        anio = dia.year
+        if anio not in self.bloques:
+            bloques = []
+            for _ in range(2):
+                inicio = datetime(anio, 1, 1) + timedelta(days=self.azar.randrange(350))
+                bloques.append((inicio, inicio + timedelta(days=self.azar.randint(7, 14)), 'VAC'))
+            if self.azar.random() < 0.3:
+                inicio = datetime(anio, 1, 1) + timedelta(days=self.azar.randrange(355))
+                bloques.append((inicio, inicio + timedelta(days=self.azar.randint(2, 10)), 'BAJA'))
+            self.bloques[anio] = bloques
+        for inicio, fin, codigo in self.bloques[anio]:
+            if inicio <= dia < fin:
+                return codigo
+        return None
+
+    def _turno(self, inicio, horas):
+        fin = inicio + timedelta(minutes=int(horas * 60))
+        return {
+            "start": inicio.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "end": fin.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "roleCode": self.rol,
+            "workingArea": self.area if self.azar.random() < 0.8 else self.azar.choice(AREAS)
+        }
+
+    def dia(self, dia, azar=None):
+        """Turnos y ausencias de un día: (lista de shifts, lista de ausencias)"""
+        azar = azar or self.azar
+        codigo = self._ausencia_en_bloque(dia)
+        if codigo:
+            return [], [{"absenceTypeCode": codigo}]
+        if (dia.weekday() - self.descanso) % 7 < 2 and azar.random() < 0.9:
+            return [], []
+        if azar.random() < self.args.tasa_ausencias:
+            return [], [{"absenceTypeCode": azar.choice(('AP', 'LD', 'FOR'))}]
+
+        minuto = azar.choice((0, 15, 30, 45))
+        tirada = azar.random()
+        if tirada < self.nocturnos:
+            # Nocturno: empieza por la noche y termina al día siguiente
+            inicio = dia + timedelta(hours=azar.choice((21, 22, 23)), minutes=minuto)
+            shifts = [self._turno(inicio, azar.choice((7, 8, 8.5)))]
+        elif tirada < self.nocturnos + self.partidos:
+            # Partido: dos tramos con varias horas de descanso entre ellos
+            inicio = dia + timedelta(hours=azar.choice((6, 7, 8)), minutes=minuto)
+            primero = self._turno(inicio, azar.choice((3.5, 4)))
+            segundo_inicio = inicio + timedelta(hours=azar.choice((7, 8, 9)))
+            shifts = [primero, self._turno(segundo_inicio, azar.choice((3.5, 4)))]
+        else:
+            hora = self.franja + azar.choice((-1, 0, 0, 0, 1))
+            inicio = dia + timedelta(hours=hora, minutes=minuto)
+            shifts = [self._turno(inicio, azar.choice((4, 6, 7.5, 8, 8.5)))]
+
+        ausencias = []
+        if azar.random() < self.args.tasa_ausencias / 3:
+            ausencias.append({"absenceTypeCode": "AP"})
+        return shifts, ausencias
+
+
+def _canonico(shifts, ausencias):
+    """JSON canónico y hash del día, como los guarda la sincronización"""
+    shifts = sorted(shifts, key=lambda x: (x["start"], x["end"], x["roleCode"], x["workingArea"]))
+    shifts_str = json.dumps(shifts, ensure_ascii=False, sort_keys=True) if shifts else None
+    absences_str = json.dumps(ausencias, ensure_ascii=False, sort_keys=True) if ausencias else None
+    return shifts_str, absences_str, RosterDigest.hash_dia(shifts_str, absences_str)
+
+
+def filas_empleado(empleado_id, numero, desde, hasta, ahora, args):
+    """
+    Filas de turnos_empleado y turno_shift de un empleado
+
+    Los días con historial llevan de 1 a 3 versiones anteriores inactivas, escritas en
+    sincronizaciones anteriores a la de la versión activa
+    """
+    generador = GeneradorTurnos(numero, args)
+    filas = []
+    shifts_activos = []
+    dia = desde
+    while dia <= hasta:
+        dia_str = dia.strftime("%Y-%m-%d %H:%M:%S")
+        # Primera sincronización que vio el día: entre 60 y 5 días antes (nunca en el futuro)
+        escrito = min(ahora, dia - timedelta(days=generador.azar.randint(5, 60), hours=generador.azar.randrange(24)))
+
+        if generador.azar.random() < args.tasa_versiones:
+            for _ in range(generador.azar.randint(1, 3)):
+                azar_version = random.Random(f"{args.semilla}|{numero}|{dia_str}|{len(filas)}")
+                shifts_str, absences_str, contenido_hash = _canonico(*generador.dia(dia, azar_version))
+                sustituido = min(ahora, escrito + timedelta(days=generador.azar.randint(1, 4), hours=generador.azar.randrange(24)))
+                filas.append((empleado_id, dia_str, shifts_str, absences_str, contenido_hash, 0, escrito, sustituido))
+                escrito = sustituido
+
+        shifts, ausencias = generador.dia(dia)
+        shifts_str, absences_str, contenido_hash = _canonico(shifts, ausencias)
+        filas.append((empleado_id, dia_str, shifts_str, absences_str, contenido_hash, 1, escrito, escrito))
+        if shifts:
+            shifts_activos.extend(TurnoShift.filas_desde_turno(empleado_id, dia, shifts))
+        dia += timedelta(days=1)
+    return filas, shifts_activos
+
+
+def crear_empleados(cursor, args, ahora):
+    """Inserta los empleados y sus credenciales; devuelve [(id, numero_empleado)]"""
+    azar = random.Random(args.semilla)
+    password_hash = bcrypt.hashpw(args.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    empleados = []
+    for i in range(1, args.empleados + 1):
+        numero = f"{args.prefijo}{i:06d}"
+        tirada = azar.random()
+        if tirada < 0.3:
+            ultimo_acceso = ahora - timedelta(hours=azar.uniform(0, 24))
+        elif tirada < 0.7:
+            ultimo_acceso = ahora - timedelta(days=azar.uniform(1, 30))
+        elif tirada < 0.9:
+            ultimo_acceso = ahora - timedelta(days=azar.uniform(30, 365))
+        else:
+            ultimo_acceso = None
+        nombre = f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}"
+        empleados.append((numero, nombre, f"{numero.lower()}@example.com", password_hash,
+                          ultimo_acceso, int(azar.random() >= 0.05)))
+
+    for inicio in range(0, len(empleados), args.lote):
+        cursor.executemany("""
+            INSERT INTO empleados (numero_empleado, nombre_completo, email, password_hash, ultimo_acceso, activo)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, empleados[inicio:inicio + args.lote])
+
+    cursor.execute(
+        "SELECT id, numero_empleado FROM empleados WHERE numero_empleado LIKE %s ORDER BY id",
+        (f"{args.prefijo}%",)
+    )
+    ids = [(row['id'], row['numero_empleado']) for row in cursor.fetchall()]
+
+    # Credenciales: la misma contraseña cifrada para todos (el cifrado es lo lento)
+    encryption_key = os.getenv('ENCRYPTION_KEY')
+    if not encryption_key:
+        print("   ✗ ENCRYPTION_KEY no configurada: no se crean credenciales SITA")
+        return ids, 0
+    password_sita = Fernet(encryption_key.encode()).encrypt(args.password.encode()).decode()
+    roster_url = os.getenv("SITA_ROSTER_URL") or "http://127.0.0.1:8085/api/v1/roster"
+    credenciales = [
+        (empleado_id, numero, password_sita, args.prefijo, "synthetic", roster_url)
+        for empleado_id, numero in ids if azar.random() < args.tasa_credenciales
+    ]
+    for inicio in range(0, len(credenciales), args.lote):
+        cursor.executemany("""
+            INSERT INTO credenciales_sita
+            (empleado_id, sita_username, sita_password_encrypted, site_id, cvation_tenantid, roster_url)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, credenciales[inicio:inicio + args.lote])
+    return ids, len(credenciales)
+
+
+def generar_datos_sinteticos(args):
+    """Genera empleados, credenciales y turnos sintéticos"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        print("=" * 60)
+        print("GENERACIÓN DE DATOS SINTÉTICOS - TurnosSouth")
+        print("=" * 60)
+
+        ahora = datetime.now().replace(microsecond=0)
+        hoy = datetime(ahora.year, ahora.month, 1)
+        # Hasta el último día del mes siguiente, como el rango que descarga la sincronización
+        hasta = (hoy + timedelta(days=62)).replace(day=1) - timedelta(days=1)
+        desde = datetime(ahora.year, ahora.month, ahora.day) - timedelta(days=int(args.anios * 365))
+        print(f"  {args.empleados} empleados {args.prefijo}, turnos del {desde:%d/%m/%Y} al {hasta:%d/%m/%Y}")
+
+        # Sin comprobaciones de claves ni unicidad en esta sesión: los datos ya son coherentes
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+        # 1. Empleados existentes con el prefijo
+        print(f"\n1. Verificando empleados {args.prefijo} existentes...")
+        cursor.execute("SELECT COUNT(*) AS total FROM empleados WHERE numero_empleado LIKE %s", (f"{args.prefijo}%",))
+        existentes = cursor.fetchone()['total']
+        if existentes and not args.borrar:
+            print(f"   ✗ Ya hay {existentes} empleados {args.prefijo}: usar --borrar o cambiar --prefijo")
+            return False
+        if existentes:
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+            cursor.execute("DELETE FROM empleados WHERE numero_empleado LIKE %s", (f"{args.prefijo}%",))
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            conn.commit()
+            print(f"   ✓ {existentes} empleados borrados (con sus turnos y credenciales)")
+        else:
+            print("   ✓ No hay empleados previos")
+
+        # 2. Empleados y credenciales
+        print("\n2. Creando empleados y credenciales SITA...")
+        empleados, num_credenciales = crear_empleados(cursor, args, ahora)
+        conn.commit()
+        print(f"   ✓ {len(empleados)} empleados y {num_credenciales} credenciales")
+
+        # 3. Turnos por lotes
+        print("\n3. Generando turnos...")
+        inicio = time.perf_counter()
+        total_filas = total_inactivas = total_shifts = 0
+        pendientes_filas = []
+        pendientes_shifts = []
+        for i, (empleado_id, numero) in enumerate(empleados, 1):
+            filas, shifts = filas_empleado(empleado_id, numero, desde, hasta, ahora, args)
+            pendientes_filas.extend(filas)
+            total_inactivas += sum(1 for fila in filas if not fila[5])
+            if not args.sin_turno_shift:
+                pendientes_shifts.extend(shifts)
+
+            if len(pendientes_filas) >= args.lote or i == len(empleados):
+                cursor.executemany(SENTENCIA_TURNOS, pendientes_filas)
+                if pendientes_shifts:
+                    cursor.executemany(SENTENCIA_SHIFTS, pendientes_shifts)
+                conn.commit()
+                total_filas += len(pendientes_filas)
+                total_shifts += len(pendientes_shifts)
+                pendientes_filas = []
+                pendientes_shifts = []
+                duracion = time.perf_counter() - inicio
+                print(f"   - {i}/{len(empleados)} empleados, {total_filas} filas "
+                      f"({total_filas / duracion if duracion else 0:.0f} filas/s)")
+
+        duracion = time.perf_counter() - inicio
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+
+        print("\n" + "=" * 60)
+        print("✓ GENERACIÓN COMPLETADA EXITOSAMENTE")
+        print("=" * 60)
+        print(f"\n  • {len(empleados)} empleados ({args.prefijo}..., contraseña '{args.password}')")
+        print(f"  • {num_credenciales} credenciales SITA")
+        print(f"  • {total_filas} filas en turnos_empleado ({total_inactivas} versiones inactivas)")
+        print(f"  • {total_shifts} turnos en turno_shift")
+        print(f"  • {duracion:.0f}s de inserción de turnos")
+        print("\n  Para el planificador de auto-sync: python scripts/setup_sync_actividad.py")
+        print("=" * 60)
+
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ ERROR durante la generación: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    success = generar_datos_sinteticos(_argumentos())
+    sys.exit(0 if success else 1)
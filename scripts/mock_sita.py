@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor SITA simulado para pruebas y medidas de rendimiento de la sincronización
+
+Atiende los mismos endpoints que usa sita_client:
+- POST /api/v1/auth/signin          -> {"sessionToken": ...}
+- GET  /api/v1/roster/<usuario>     -> lista de días con shifts y ausencias (fromDate, toDate)
+
+Y endpoints de control para ajustar cada prueba sin reiniciar:
+- GET/POST /_mock/config            -> configuración actual / cambiar valores (JSON)
+- GET      /_mock/stats             -> contadores y primera petición de cada usuario
+- POST     /_mock/reset             -> vacía contadores, tokens y versiones de los cuadrantes
+
+Uso:
+    python scripts/mock_sita.py --puerto 8085 --latencia-ms 150 --tasa-errores 0.02
+
+Y en el proceso a medir:
+    SITA_AUTH_URL=http://127.0.0.1:8085/api/v1/auth/signin
+    SITA_ROSTER_URL=http://127.0.0.1:8085/api/v1/roster
+
+Solo usa la biblioteca estándar.
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+CONFIG_POR_DEFECTO = {
+    'latencia_ms': 100,        # Latencia media de cada respuesta
+    'variacion_ms': 50,        # +/- aleatorio sobre la latencia media
+    'tasa_errores': 0.0,       # Fracción de peticiones que responden 503
+    'tasa_timeouts': 0.0,      # Fracción de peticiones que tardan 'timeout_s' en responder
+    'timeout_s': 60,           # Retraso de las peticiones que simulan un timeout
+    'turnos_por_dia': 1,       # Turnos de cada día trabajado
+    'tasa_libres': 0.3,        # Fracción de días sin turno
+    'tasa_ausencias': 0.05,    # Fracción de días con ausencia de día completo
+    'tasa_cambios': 0.05,      # Probabilidad de que un día cambie entre dos descargas del mismo usuario
+    'token_ttl': 1200          # Validez de los tokens emitidos (en segundos)
+}
+
+ROLES = ('AGT', 'COORD', 'RAMP', 'PAX')
+AREAS = ('T1', 'T2', 'MUELLE', 'PLATAFORMA')
+AUSENCIAS = ('VAC', 'BAJA', 'AP')
+
+
+class EstadoMock:
+    """Configuración, tokens, versiones de los cuadrantes y contadores del servidor"""
+
+    def __init__(self, config):
+        self._lock = threading.Lock()
+        self.config = dict(config)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tokens = {}      # token -> (usuario, caduca_en)
+            self.versiones = {}   # (usuario, dia) -> versión del contenido del día
+            self.stats = {
+                'signins': 0,
+                'rosters': 0,
+                'no_autorizadas': 0,
+                'errores': 0,
+                'timeouts': 0,
+                'dias_servidos': 0,
+                'dias_cambiados': 0,
+                'inicio': time.time()
+            }
+            self.primera_peticion = {}
+            self.peticiones_usuario = {}
+
+    def actualizar_config(self, cambios):
+        with self._lock:
+            for clave, valor in cambios.items():
+                if clave not in CONFIG_POR_DEFECTO:
+                    raise KeyError(clave)
+                self.config[clave] = type(CONFIG_POR_DEFECTO[clave])(valor)
+            return dict(self.config)
+
+    def contar(self, clave, cantidad=1):
+        with self._lock:
+            self.stats[clave] += cantidad
+
+    def registrar_usuario(self, usuario):
+        with self._lock:
+            self.primera_peticion.setdefault(usuario, time.time())
+            self.peticiones_usuario[usuario] = self.peticiones_usuario.get(usuario, 0) + 1
+
+    def emitir_token(self, usuario):
+        token = uuid.uuid4().hex
+        with self._lock:
+            self.tokens[token] = (usuario, time.time() + self.config['token_ttl'])
+            self.stats['signins'] += 1
+        return token
+
+    def validar_token(self, token):
+        with self._lock:
+            datos = self.tokens.get(token)
+            return bool(datos) and datos[1] > time.time()
+
+    def roster(self, usuario, desde, hasta):
+        """
+        Cuadrante determinista de un usuario: cada día depende del usuario, la fecha y su
+        versión, que sube con probabilidad 'tasa_cambios' en cada descarga
+        """
+        config = self.config
+        dias = []
+        cambiados = 0
+        azar_cambios = random.Random()
+        dia = datetime(desde.year, desde.month, desde.day)
+        while dia <= hasta:
+            clave = (usuario, dia.date())
+            with self._lock:
+                version = self.versiones.get(clave)
+                if version is None:
+                    version = 0
+                elif azar_cambios.random() < config['tasa_cambios']:
+                    version += 1
+                    cambiados += 1
+                self.versiones[clave] = version
+            dias.append(self._dia(usuario, dia, version, config))
+            dia += timedelta(days=1)
+        self.contar('rosters')
+        self.contar('dias_servidos', len(dias))
+        self.contar('dias_cambiados', cambiados)
+        return dias
+
+    @staticmethod
+    def _dia(usuario, dia, version, config):
+        """Un día de la respuesta de SITA con el formato que espera la sincronización"""
+        azar = random.Random(f"{usuario}|{dia.date()}|{version}")
+        resultado = {
+            "date": dia.strftime("%Y-%m-%dT00:00:00Z"),
+            "shifts": [],
+            "fullDayAbsences": [],
+            "partDayAbsences": []
+        }
+        if azar.random() < config['tasa_ausencias']:
+            resultado["fullDayAbsences"].append({"absenceTypeCode": azar.choice(AUSENCIAS)})
+            return resultado
+        if azar.random() < config['tasa_libres']:
+            return resultado
+
+        hora = azar.choice((4, 5, 6, 8, 12, 14, 16, 20, 22))
+        for _ in range(max(0, config['turnos_por_dia'])):
+            inicio = dia + timedelta(hours=hora, minutes=azar.choice((0, 15, 30, 45)))
+            fin = inicio + timedelta(hours=azar.choice((4, 6, 8)))
+            resultado["shifts"].append({
+                "start": inicio.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "end": fin.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "roleCode": azar.choice(ROLES),
+                "workingArea": azar.choice(AREAS)
+            })
+            hora = (fin.hour + 1) % 24
+        return resultado
+
+
+def _fecha(valor):
+    return datetime.fromisoformat(valor.replace("Z", "")) if valor else None
+
+
+def crear_manejador(estado):
+    """Clase de manejador HTTP ligada al estado compartido"""
+
+    class ManejadorSita(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, formato, *args):
+            pass  # Sin log por petición: distorsiona las medidas
+
+        def _responder(self, status, datos):
+            cuerpo = json.dumps(datos).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _leer_json(self):
+            longitud = int(self.headers.get("Content-Length") or 0)
+            if not longitud:
+                return {}
+            return json.loads(self.rfile.read(longitud) or b"{}")
+
+        def _simular_red(self):
+            """Latencia, errores y timeouts configurados; devuelve False si ya respondió"""
+            config = estado.config
+            if config['tasa_timeouts'] and random.random() < config['tasa_timeouts']:
+                estado.contar('timeouts')
+                time.sleep(config['timeout_s'])
+            retraso = config['latencia_ms'] + random.uniform(-config['variacion_ms'], config['variacion_ms'])
+            time.sleep(max(0.0, retraso) / 1000)
+            if config['tasa_errores'] and random.random() < config['tasa_errores']:
+                estado.contar('errores')
+                self._responder(503, {"message": "Service Unavailable (mock)"})
+                return False
+            return True
+
+        def do_GET(self):
+            ruta = urlparse(self.path)
+            if ruta.path == "/_mock/config":
+                return self._responder(200, estado.config)
+            if ruta.path == "/_mock/stats":
+                with estado._lock:
+                    datos = dict(estado.stats)
+                    datos['usuarios'] = len(estado.primera_peticion)
+                    datos['primera_peticion'] = dict(estado.primera_peticion)
+                    datos['peticiones_usuario'] = dict(estado.peticiones_usuario)
+                return self._responder(200, datos)
+
+            if not ruta.path.startswith("/api/v1/roster/"):
+                return self._responder(404, {"message": "Not found"})
+
+            usuario = ruta.path.rstrip("/").rsplit("/", 1)[-1]
+            estado.registrar_usuario(usuario)
+            if not self._simular_red():
+                return
+
+            token = (self.headers.get("Authorization") or "").replace("Bearer", "").strip()
+            if not estado.validar_token(token):
+                estado.contar('no_autorizadas')
+                return self._responder(401, {"message": "Unauthorized"})
+
+            params = parse_qs(ruta.query)
+            try:
+                desde = _fecha(params.get("fromDate", [None])[0]) or datetime.now()
+                hasta = _fecha(params.get("toDate", [None])[0]) or desde + timedelta(days=60)
+            except ValueError:
+                return self._responder(400, {"message": "Invalid dates"})
+            self._responder(200, estado.roster(usuario, desde, hasta))
+
+        def do_POST(self):
+            ruta = urlparse(self.path)
+            try:
+                datos = self._leer_json()
+            except ValueError:
+                return self._responder(400, {"message": "Invalid JSON"})
+
+            if ruta.path == "/_mock/config":
+                try:
+                    return self._responder(200, estado.actualizar_config(datos))
+                except (KeyError, ValueError) as e:
+                    return self._responder(400, {"message": f"Parámetro no válido: {e}"})
+            if ruta.path == "/_mock/reset":
+                estado.reset()
+                return self._responder(200, {"ok": True})
+
+            if ruta.path != "/api/v1/auth/signin":
+                return self._responder(404, {"message": "Not found"})
+
+            usuario = datos.get("username")
+            if usuario:
+                estado.registrar_usuario(usuario)
+            if not self._simular_red():
+                return
+            if not usuario or not datos.get("password"):
+                return self._responder(400, {"message": "Missing credentials"})
+            self._responder(200, {"sessionToken": estado.emitir_token(usuario)})
+
+    return ManejadorSita
+
+
+def crear_servidor(host="127.0.0.1", puerto=8085, **config):
+    """
+    Crea el servidor simulado (sin arrancarlo)
+
+    Returns:
+        tuple: (ThreadingHTTPServer, EstadoMock)
+    """
+    estado = EstadoMock({**CONFIG_POR_DEFECTO, **config})
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(estado))
+    servidor.daemon_threads = True
+    return servidor, estado
+
+
+def iniciar_en_segundo_plano(host="127.0.0.1", puerto=0, **config):
+    """
+    Arranca el servidor en un hilo (puerto 0 = uno libre)
+
+    Returns:
+        tuple: (servidor, estado, URL base)
+    """
+    servidor, estado = crear_servidor(host, puerto, **config)
+    hilo = threading.Thread(target=servidor.serve_forever, name="MockSita", daemon=True)
+    hilo.start()
+    return servidor, estado, f"http://{host}:{servidor.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor SITA simulado")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8085)
+    for clave, valor in CONFIG_POR_DEFECTO.items():
+        parser.add_argument(f"--{clave.replace('_', '-')}", type=type(valor), default=valor, dest=clave)
+    args = parser.parse_args()
+
+    config = {clave: getattr(args, clave) for clave in CONFIG_POR_DEFECTO}
+    servidor, _ = crear_servidor(args.host, args.puerto, **config)
+    url = f"http://{args.host}:{servidor.server_address[1]}"
+    print("=" * 60)
+    print(f"SITA simulado escuchando en {url}")
+    print("=" * 60)
+    print(f"  SITA_AUTH_URL={url}/api/v1/auth/signin")
+    print(f"  SITA_ROSTER_URL={url}/api/v1/roster")
+    print(f"  Configuración: {json.dumps(config)}")
+    print("  Para detener: Ctrl+C")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para configurar los hashes de contenido de turnos en el sistema TurnosSouth
+- Agrega la columna contenido_hash a turnos_empleado si no existe
+- Crea la tabla turnos_digest si no existe
+- Calcula el hash de las filas activas que aún no lo tienen
+
+Se puede volver a ejecutar en cualquier momento: solo rellena las filas sin hash.
+"""
+
+import sys
+import os
+import io
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web'))
+
+from database import get_db_connection
+from models.roster_digest import RosterDigest
+
+TAMANO_LOTE = 1000
+
+
+def setup_contenido_hash():
+    """Crea la columna contenido_hash y la tabla turnos_digest y rellena los hashes"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        print("=" * 60)
+        print("CONFIGURACIÓN DE HASHES DE CONTENIDO - TurnosSouth")
+        print("=" * 60)
+
+        # 1. Agregar la columna si no existe
+        print("\n1. Verificando estructura de la tabla turnos_empleado...")
+        cursor.execute("""
+            SELECT COUNT(*) as count
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'turnos_empleado'
+            AND COLUMN_NAME = 'contenido_hash'
+        """)
+        result = cursor.fetchone()
+
+        if result['count'] == 0:
+            print("   - Agregando columna 'contenido_hash'...")
+            cursor.execute("""
+                ALTER TABLE turnos_empleado
+                ADD COLUMN contenido_hash CHAR(40) NULL AFTER ausencias
+            """)
+            print("   ✓ Columna 'contenido_hash' agregada")
+        else:
+            print("   ✓ Columna 'contenido_hash' ya existe")
+
+        # 2. Crear la tabla de huellas si no existe
+        print("\n2. Verificando tabla turnos_digest...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS turnos_digest (
+                empleado_id INT PRIMARY KEY,
+                digest CHAR(40) NOT NULL,
+                dia_desde DATETIME NULL,
+                dia_hasta DATETIME NULL,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ Tabla turnos_digest lista")
+
+        # 3. Rellenar los hashes de las filas activas por lotes
+        print("\n3. Calculando hashes de contenido...")
+        ultimo_id = 0
+        total = 0
+        while True:
+            cursor.execute("""
+                SELECT id, turno, ausencias
+                FROM turnos_empleado
+                WHERE activo = 1 AND contenido_hash IS NULL AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (ultimo_id, TAMANO_LOTE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            cursor.executemany(
+                "UPDATE turnos_empleado SET contenido_hash = %s WHERE id = %s",
+                [(RosterDigest.hash_fila(row), row['id']) for row in rows]
+            )
+            conn.commit()
+
+            total += len(rows)
+            ultimo_id = rows[-1]['id']
+            print(f"   - {total} filas actualizadas")
+
+        print("\n" + "=" * 60)
+        print("✓ CONFIGURACIÓN COMPLETADA EXITOSAMENTE")
+        print("=" * 60)
+        print(f"\n  • {total} filas activas con hash calculado")
+        print("=" * 60)
+
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ ERROR durante la configuración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    success = setup_contenido_hash()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para configurar la tabla de días festivos en el sistema TurnosSouth
+- Crea la tabla festivos si no existe
+- Importa las fechas de web/festivos.json (todas las regiones y años)
+
+Con FESTIVOS_FUENTE=bd la aplicación lee los festivos de esta tabla.
+Se puede volver a ejecutar tras editar el archivo: las fechas existentes no se duplican.
+"""
+
+import sys
+import os
+import io
+import json
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web'))
+
+from database import get_db_connection
+from festivos import ruta_archivo
+
+
+def setup_festivos():
+    """Crea y rellena la tabla festivos"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        print("=" * 60)
+        print("CONFIGURACIÓN DE DÍAS FESTIVOS - TurnosSouth")
+        print("=" * 60)
+
+        # 1. Crear la tabla si no existe
+        print("\n1. Verificando tabla festivos...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS festivos (
+                fecha DATE NOT NULL,
+                region VARCHAR(50) NOT NULL DEFAULT '*',
+                nombre VARCHAR(100) NULL,
+                PRIMARY KEY (region, fecha),
+                INDEX idx_fecha (fecha)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ Tabla festivos lista")
+
+        # 2. Importar el archivo
+        ruta = ruta_archivo()
+        print(f"\n2. Importando festivos de {ruta}...")
+        with open(ruta, encoding='utf-8') as f:
+            datos = json.load(f)
+
+        filas = []
+        for region, anios in datos.items():
+            for anio, fechas in sorted(anios.items()):
+                filas.extend((fecha, region) for fecha in fechas)
+                print(f"   - {region} {anio}: {len(fechas)} festivos")
+
+        if filas:
+            cursor.executemany("""
+                INSERT IGNORE INTO festivos (fecha, region)
+                VALUES (%s, %s)
+            """, filas)
+        conn.commit()
+
+        print("\n" + "=" * 60)
+        print("✓ CONFIGURACIÓN COMPLETADA EXITOSAMENTE")
+        print("=" * 60)
+        print(f"\n  • {len(filas)} fechas leídas del archivo")
+        print("  • Para usar la tabla: FESTIVOS_FUENTE=bd en el .env")
+        print("=" * 60)
+
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ ERROR durante la configuración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    success = setup_festivos()
+    sys.exit(0 if success else 1)
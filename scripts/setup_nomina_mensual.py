@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para configurar los agregados mensuales de nómina en el sistema TurnosSouth
+- Crea la tabla nomina_mensual si no existe
+- Recalcula todos los meses con turnos de cada empleado
+
+Se puede volver a ejecutar en cualquier momento para regenerar la tabla, por ejemplo
+tras cambiar las tarifas o los festivos (las filas de otra versión no se usan, pero
+hasta entonces se recalculan al consultarlas).
+"""
+
+import sys
+import os
+import io
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web'))
+
+from database import get_db_connection
+from nomina_mensual import recalcular_meses
+from nomina_cache import version_tarifas
+
+
+def _meses_entre(desde, hasta):
+    """Meses (año, mes) entre dos fechas, ambos incluidos"""
+    meses = []
+    anio, mes = desde.year, desde.month
+    while (anio, mes) <= (hasta.year, hasta.month):
+        meses.append((anio, mes))
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+def setup_nomina_mensual():
+    """Crea y rellena la tabla nomina_mensual"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        print("=" * 60)
+        print("CONFIGURACIÓN DE NÓMINA MENSUAL - TurnosSouth")
+        print("=" * 60)
+
+        # 1. Crear la tabla si no existe
+        print("\n1. Verificando tabla nomina_mensual...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS nomina_mensual (
+                empleado_id INT NOT NULL,
+                anio SMALLINT NOT NULL,
+                mes TINYINT NOT NULL,
+                version_tarifas CHAR(12) NOT NULL,
+                pluses_desde DATE NOT NULL,
+                pluses_hasta DATE NOT NULL,
+                num_dias INT NOT NULL DEFAULT 0,
+                total DOUBLE NOT NULL DEFAULT 0,
+                conceptos JSON NOT NULL,
+                dias JSON NOT NULL,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (empleado_id, anio, mes),
+                FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ Tabla nomina_mensual lista")
+
+        # 2. Recalcular los meses de cada empleado con turnos
+        print(f"\n2. Recalculando meses (versión de tarifas {version_tarifas()})...")
+        cursor.execute("""
+            SELECT empleado_id, MIN(dia) AS desde, MAX(dia) AS hasta
+            FROM turnos_empleado
+            WHERE activo = 1
+            GROUP BY empleado_id
+        """)
+        empleados = cursor.fetchall()
+
+        total_meses = 0
+        for row in empleados:
+            meses = _meses_entre(row['desde'], row['hasta'])
+            total_meses += recalcular_meses(row['empleado_id'], meses)
+            print(f"   - Empleado {row['empleado_id']}: {len(meses)} meses")
+
+        print("\n" + "=" * 60)
+        print("✓ CONFIGURACIÓN COMPLETADA EXITOSAMENTE")
+        print("=" * 60)
+        print(f"\n  • {len(empleados)} empleados con turnos")
+        print(f"  • {total_meses} meses calculados en nomina_mensual")
+        print("=" * 60)
+
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ ERROR durante la configuración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    success = setup_nomina_mensual()
+    sys.exit(0 if success else 1)
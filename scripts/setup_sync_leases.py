@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para configurar la sincronización automática repartida entre procesos en TurnosSouth
+- Crea la tabla sync_leases si no existe (y quita la columna intentos, que ya no se usa)
+- Registra los empleados activos con credenciales SITA (vencidos, se sincronizan enseguida)
+
+Se puede volver a ejecutar en cualquier momento: los empleados ya registrados no cambian.
+Requiere MySQL 8.0 o superior (SELECT ... FOR UPDATE SKIP LOCKED).
+"""
+
+import sys
+import os
+import io
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web'))
+
+from database import get_db_connection
+
+
+def setup_sync_leases():
+    """Crea la tabla sync_leases y registra los empleados a sincronizar"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        print("=" * 60)
+        print("CONFIGURACIÓN DE CONCESIONES DE SINCRONIZACIÓN - TurnosSouth")
+        print("=" * 60)
+
+        # 1. Comprobar la versión de MySQL (SKIP LOCKED)
+        print("\n1. Verificando versión de MySQL...")
+        cursor.execute("SELECT VERSION() AS version")
+        version = cursor.fetchone()['version']
+        mayor = int(version.split('.')[0])
+        if mayor < 8 or 'mariadb' in version.lower():
+            print(f"   ⚠ Versión {version}: se necesita MySQL 8.0+ para SKIP LOCKED")
+        else:
+            print(f"   ✓ Versión {version}")
+
+        # 2. Crear la tabla si no existe
+        print("\n2. Verificando tabla sync_leases...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_leases (
+                empleado_id INT PRIMARY KEY,
+                propietario VARCHAR(100) NULL,
+                lease_hasta DATETIME NULL,
+                proxima_sync DATETIME NOT NULL,
+                ultima_sync DATETIME NULL,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE,
+                INDEX idx_proxima_sync (proxima_sync),
+                INDEX idx_propietario (propietario)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+
+        cursor.execute("""
+            SELECT COUNT(*) as count
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+            AND TABLE_NAME = 'sync_leases'
+            AND COLUMN_NAME = 'intentos'
+        """)
+        if cursor.fetchone()['count'] > 0:
+            print("   - Eliminando columna 'intentos' (sin uso)...")
+            cursor.execute("ALTER TABLE sync_leases DROP COLUMN intentos")
+        print("   ✓ Tabla sync_leases lista")
+
+        # 3. Registrar los empleados activos con credenciales
+        print("\n3. Registrando empleados con credenciales SITA...")
+        cursor.execute("""
+            INSERT IGNORE INTO sync_leases (empleado_id, proxima_sync)
+            SELECT e.id, NOW()
+            FROM empleados e
+            INNER JOIN credenciales_sita c ON e.id = c.empleado_id
+            WHERE e.activo = 1
+        """)
+        nuevos = cursor.rowcount
+        conn.commit()
+
+        cursor.execute("SELECT COUNT(*) AS count FROM sync_leases")
+        total = cursor.fetchone()['count']
+
+        print("\n" + "=" * 60)
+        print("✓ CONFIGURACIÓN COMPLETADA EXITOSAMENTE")
+        print("=" * 60)
+        print(f"\n  • {nuevos} empleados registrados ahora ({total} en total)")
+        print("  • Active AUTO_SYNC_LEASES=true en cada proceso de sincronización")
+        print("=" * 60)
+
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ ERROR durante la configuración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    success = setup_sync_leases()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para configurar la tabla normalizada turno_shift en el sistema TurnosSouth
+- Crea de nuevo la tabla turno_shift (su contenido siempre se puede regenerar)
+- Reconstruye su contenido a partir de los turnos activos de turnos_empleado
+
+Se puede volver a ejecutar en cualquier momento para regenerar la tabla. También actualiza
+las tablas creadas con el esquema anterior (columna activo e índices que empezaban por ella).
+"""
+
+import sys
+import os
+import io
+
+# Configurar encoding para Windows
+sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+# Agregar el directorio web al path para importar módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web'))
+
+from database import get_db_connection
+from models.turno_shift import TurnoShift
+
+TAMANO_LOTE = 1000
+
+
+def setup_turno_shift():
+    """Crea y rellena la tabla turno_shift"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        print("=" * 60)
+        print("CONFIGURACIÓN DE LA TABLA turno_shift - TurnosSouth")
+        print("=" * 60)
+
+        # 1. Crear la tabla con el esquema actual (el contenido se reconstruye a continuación)
+        print("\n1. Creando tabla turno_shift...")
+        cursor.execute("DROP TABLE IF EXISTS turno_shift")
+        cursor.execute("""
+            CREATE TABLE turno_shift (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                empleado_id INT NOT NULL,
+                dia DATE NOT NULL,
+                inicio DATETIME NOT NULL,
+                fin DATETIME NOT NULL,
+                role_code VARCHAR(50) NULL,
+                working_area VARCHAR(100) NULL,
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE,
+                INDEX idx_empleado_dia (empleado_id, dia),
+                INDEX idx_empleado_inicio (empleado_id, inicio),
+                INDEX idx_inicio_fin (inicio, fin)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ Tabla turno_shift lista")
+
+        # 2. Reconstruir desde turnos_empleado por lotes
+        print("\n2. Reconstruyendo turnos normalizados...")
+        ultimo_id = 0
+        total_dias = 0
+        total_turnos = 0
+        while True:
+            cursor.execute("""
+                SELECT id, empleado_id, dia, turno
+                FROM turnos_empleado
+                WHERE activo = 1 AND id > %s
+                ORDER BY id
+                LIMIT %s
+            """, (ultimo_id, TAMANO_LOTE))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            filas = []
+            for row in rows:
+                filas.extend(TurnoShift.filas_desde_turno(row['empleado_id'], row['dia'], row['turno']))
+
+            if filas:
+                cursor.executemany(f"""
+                    INSERT INTO turno_shift ({TurnoShift.COLUMNAS})
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, filas)
+
+            total_dias += len(rows)
+            total_turnos += len(filas)
+            ultimo_id = rows[-1]['id']
+            print(f"   - {total_dias} días procesados ({total_turnos} turnos)")
+
+        conn.commit()
+
+        print("\n" + "=" * 60)
+        print("✓ CONFIGURACIÓN COMPLETADA EXITOSAMENTE")
+        print("=" * 60)
+        print(f"\n  • {total_dias} días activos leídos de turnos_empleado")
+        print(f"  • {total_turnos} turnos insertados en turno_shift")
+        print("=" * 60)
+
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n✗ ERROR durante la configuración: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == '__main__':
+    success = setup_turno_shift()
+    sys.exit(0 if success else 1)
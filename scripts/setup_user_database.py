@@ -69,6 +69,7 @@ def crear_tablas():
             dia DATETIME NOT NULL,
             turno JSON NULL,
             ausencias JSON NULL,
+            contenido_hash CHAR(40) NULL,
             activo TINYINT(1) DEFAULT 1,
             google_event_ids JSON NULL,
             fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -80,6 +81,37 @@ def crear_tablas():
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
         """)
         
+        # Crear tabla de huellas de la última sincronización de cada empleado
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS turnos_digest (
+            empleado_id INT PRIMARY KEY,
+            digest CHAR(40) NOT NULL,
+            dia_desde DATETIME NULL,
+            dia_hasta DATETIME NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+        
+        # Crear tabla de agregados mensuales de nómina
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS nomina_mensual (
+            empleado_id INT NOT NULL,
+            anio SMALLINT NOT NULL,
+            mes TINYINT NOT NULL,
+            version_tarifas CHAR(12) NOT NULL,
+            pluses_desde DATE NOT NULL,
+            pluses_hasta DATE NOT NULL,
+            num_dias INT NOT NULL DEFAULT 0,
+            total DOUBLE NOT NULL DEFAULT 0,
+            conceptos JSON NOT NULL,
+            dias JSON NOT NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (empleado_id, anio, mes),
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+        
         # Crear tabla para credenciales SITA
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS credenciales_sita (
@@ -96,6 +128,104 @@ def crear_tablas():
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
         """)
         
+        # Crear tabla de la cola de trabajos de sincronización
+        # clave_activa = empleado_id mientras el trabajo está pendiente o en curso (NULL al terminar)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_jobs (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            empleado_id INT NOT NULL,
+            clave_activa INT NULL,
+            origen VARCHAR(10) NOT NULL DEFAULT 'manual',
+            prioridad TINYINT NOT NULL DEFAULT 0,
+            estado VARCHAR(15) NOT NULL DEFAULT 'pendiente',
+            fase VARCHAR(20) NULL,
+            dias_actualizados INT NULL,
+            mensaje VARCHAR(500) NULL,
+            intentos INT NOT NULL DEFAULT 0,
+            worker VARCHAR(100) NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fecha_inicio TIMESTAMP NULL,
+            fecha_fin TIMESTAMP NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE,
+            UNIQUE INDEX idx_clave_activa (clave_activa),
+            INDEX idx_estado_prioridad (estado, prioridad, id),
+            INDEX idx_empleado (empleado_id, id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+
+        # Crear tabla de concesiones de la sincronización automática (varios procesos)
+        # propietario = instancia que sincroniza al empleado hasta lease_hasta (NULL si libre)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_leases (
+            empleado_id INT PRIMARY KEY,
+            propietario VARCHAR(100) NULL,
+            lease_hasta DATETIME NULL,
+            proxima_sync DATETIME NOT NULL,
+            ultima_sync DATETIME NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE,
+            INDEX idx_proxima_sync (proxima_sync),
+            INDEX idx_propietario (propietario)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+
+        # Crear tabla con el historial de cambios por empleado (planificador de auto-sync)
+        # cambios_media = media móvil de días actualizados por sincronización
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_actividad (
+            empleado_id INT PRIMARY KEY,
+            sincronizaciones INT NOT NULL DEFAULT 0,
+            con_cambios INT NOT NULL DEFAULT 0,
+            cambios_media DOUBLE NOT NULL DEFAULT 0,
+            ultimo_cambio DATETIME NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+
+        # Crear tabla normalizada de turnos (una fila por turno)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS turno_shift (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            empleado_id INT NOT NULL,
+            dia DATE NOT NULL,
+            inicio DATETIME NOT NULL,
+            fin DATETIME NOT NULL,
+            role_code VARCHAR(50) NULL,
+            working_area VARCHAR(100) NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE,
+            INDEX idx_empleado_dia (empleado_id, dia),
+            INDEX idx_empleado_inicio (empleado_id, inicio),
+            INDEX idx_inicio_fin (inicio, fin)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+        
+        # Crear tabla para la caché persistente de nómina (resultados por día)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS nomina_cache (
+            clave CHAR(40) PRIMARY KEY,
+            empleado_id INT NOT NULL,
+            dia DATE NOT NULL,
+            resultado JSON NOT NULL,
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (empleado_id) REFERENCES empleados(id) ON DELETE CASCADE,
+            INDEX idx_empleado_dia (empleado_id, dia)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+        
+        # Crear tabla de días festivos por región ('*' = todas las regiones)
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS festivos (
+            fecha DATE NOT NULL,
+            region VARCHAR(50) NOT NULL DEFAULT '*',
+            nombre VARCHAR(100) NULL,
+            PRIMARY KEY (region, fecha),
+            INDEX idx_fecha (fecha)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+        """)
+        
         # Commit cambios
         conn.commit()
         print("Tablas creadas correctamente.")
@@ -50,8 +50,10 @@ def main():
         =================================================================
         🔄 Sincronizador de turnos ejecutándose en modo independiente
         
-        - Se ejecuta cada hora
+        - Sincroniza a cada usuario según su actividad (como mucho cada hora)
         - Procesa usuarios uno por uno
+        - Con AUTO_SYNC_LEASES=true se reparte los usuarios con los
+          demás procesos (se pueden arrancar varios en paralelo)
         - Logs en: standalone_sync.log
         - Para detener: Ctrl+C
         =================================================================
@@ -67,7 +69,7 @@ def main():
             current_time = time.time()
             if current_time - last_stats_time >= 300:  # 5 minutos
                 stats = auto_sync_manager.get_stats()
-                if stats['cycle_count'] > 0:
+                if stats['cycle_count'] > 0 or stats.get('leases'):
                     logger.info(f"📊 Estadísticas: "
                               f"Ciclos: {stats['cycle_count']}, "
                               f"Usuarios sincronizados: {stats['total_users_synced']}, "
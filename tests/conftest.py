@@ -0,0 +1,15 @@
+"""
+Configuración común de las pruebas
+
+Los módulos de web/ se importan por su nombre, como al arrancar la aplicación desde
+ese directorio. Las pruebas no necesitan base de datos: los festivos se leen del
+archivo y la caché de nómina se queda en memoria.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("FESTIVOS_FUENTE", "archivo")
+os.environ.setdefault("NOMINA_CACHE_PERSISTENTE", "false")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "web"))
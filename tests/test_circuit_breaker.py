@@ -0,0 +1,134 @@
+"""
+Estados del cortacircuitos (cerrado, abierto, semiabierto) con un reloj simulado
+"""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import ABIERTO, CERRADO, SEMIABIERTO, CircuitBreaker, espera_exponencial
+
+
+class Reloj:
+    """Reloj monótono que solo avanza cuando la prueba lo pide"""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+    def avanzar(self, segundos):
+        self.ahora += segundos
+
+
+@pytest.fixture
+def reloj():
+    return Reloj()
+
+
+@pytest.fixture
+def espera_maxima(monkeypatch):
+    """Sin desfase aleatorio: cada espera es la máxima de su intento"""
+    monkeypatch.setattr(circuit_breaker.random, "uniform", lambda a, b: b)
+
+
+def _abrir(breaker):
+    for _ in range(breaker.umbral):
+        assert breaker.permitir()
+        breaker.registrar_fallo()
+
+
+def test_se_abre_tras_el_umbral_de_fallos_seguidos(reloj):
+    breaker = CircuitBreaker(umbral=3, espera=10, reloj=reloj)
+    breaker.registrar_fallo()
+    breaker.registrar_fallo()
+    assert breaker.get_stats()['estado'] == CERRADO
+    assert breaker.permitir()
+
+    breaker.registrar_fallo()
+    assert breaker.get_stats()['estado'] == ABIERTO
+    assert not breaker.permitir()
+    assert not breaker.disponible()
+    assert breaker.get_stats()['rechazadas'] == 1
+
+
+def test_un_exito_reinicia_los_fallos(reloj):
+    breaker = CircuitBreaker(umbral=3, espera=10, reloj=reloj)
+    breaker.registrar_fallo()
+    breaker.registrar_fallo()
+    breaker.registrar_exito()
+    breaker.registrar_fallo()
+    breaker.registrar_fallo()
+    assert breaker.get_stats()['estado'] == CERRADO
+
+
+def test_semiabierto_concede_una_sola_prueba(reloj, espera_maxima):
+    breaker = CircuitBreaker(umbral=1, espera=10, reloj=reloj)
+    _abrir(breaker)
+    assert breaker.segundos_para_reintento() == pytest.approx(10)
+
+    reloj.avanzar(9.9)
+    assert not breaker.permitir()
+    reloj.avanzar(0.1)
+    assert breaker.get_stats()['estado'] == SEMIABIERTO
+    assert breaker.disponible()
+    assert breaker.permitir()
+    assert not breaker.permitir()
+    assert not breaker.disponible()
+
+    breaker.registrar_exito()
+    assert breaker.get_stats()['estado'] == CERRADO
+    assert breaker.permitir()
+
+
+def test_cancelar_libera_la_prueba(reloj, espera_maxima):
+    breaker = CircuitBreaker(umbral=1, espera=10, reloj=reloj)
+    _abrir(breaker)
+    reloj.avanzar(10)
+    assert breaker.permitir()
+    breaker.cancelar()
+    assert breaker.get_stats()['estado'] == SEMIABIERTO
+    assert breaker.permitir()
+
+
+def test_la_espera_crece_con_cada_apertura_hasta_el_maximo(reloj, espera_maxima):
+    breaker = CircuitBreaker(umbral=2, espera=10, espera_max=60, reloj=reloj)
+    _abrir(breaker)
+
+    esperas = []
+    for _ in range(5):
+        espera = breaker.segundos_para_reintento()
+        esperas.append(espera)
+        reloj.avanzar(espera)
+        assert breaker.permitir()
+        # Un fallo en semiabierto vuelve a abrir sin esperar al umbral
+        breaker.registrar_fallo()
+        assert breaker.get_stats()['estado'] == ABIERTO
+
+    assert esperas == pytest.approx([10, 20, 40, 60, 60])
+    assert breaker.get_stats()['aperturas'] == 6
+
+    # Tras un éxito la espera vuelve a la inicial
+    reloj.avanzar(breaker.segundos_para_reintento())
+    assert breaker.permitir()
+    breaker.registrar_exito()
+    _abrir(breaker)
+    assert breaker.segundos_para_reintento() == pytest.approx(10)
+
+
+def test_estadisticas_del_reintento(reloj, espera_maxima):
+    breaker = CircuitBreaker(umbral=1, espera=30, reloj=reloj)
+    _abrir(breaker)
+    reloj.avanzar(12)
+    stats = breaker.get_stats()
+    assert stats['estado'] == ABIERTO
+    assert stats['reintento_en_segundos'] == pytest.approx(18)
+    assert stats['fallos'] == 1
+    assert stats['ultima_apertura'] is not None
+
+
+@pytest.mark.parametrize("intento", range(8))
+def test_espera_exponencial_entre_la_mitad_y_el_tope(intento):
+    tope = min(100, 5 * 2 ** intento)
+    for _ in range(50):
+        assert tope / 2 <= espera_exponencial(intento, 5, 100) <= tope
@@ -0,0 +1,83 @@
+"""
+CalendarioFestivos.segundos_festivos frente a un recorrido minuto a minuto
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from festivos import _EPOCA, CalendarioFestivos
+
+FESTIVOS = ["2025-01-01", "2025-01-06", "2025-03-19", "2025-03-20", "2025-12-25", "2026-01-01"]
+
+
+def _segundos(momento):
+    return int((momento - _EPOCA).total_seconds())
+
+
+def _referencia(inicio, fin, festivos):
+    """Segundos festivos de [inicio, fin) contando los minutos uno a uno"""
+    minutos = 0
+    momento = inicio
+    while momento < fin:
+        if momento.date().isoformat() in festivos:
+            minutos += 1
+        momento += timedelta(minutes=1)
+    return minutos * 60
+
+
+@pytest.fixture(scope="module")
+def calendario():
+    return CalendarioFestivos(FESTIVOS)
+
+
+@pytest.mark.parametrize("inicio, fin", [
+    # Día parcial al principio y al final
+    (datetime(2025, 3, 18, 20, 30), datetime(2025, 3, 19, 4, 15)),
+    (datetime(2025, 3, 19, 4, 30), datetime(2025, 3, 19, 12, 30)),
+    (datetime(2025, 3, 19, 22, 0), datetime(2025, 3, 21, 2, 0)),
+    # Semanas completas y cambio de año
+    (datetime(2024, 12, 30, 6, 0), datetime(2025, 1, 8, 6, 0)),
+    (datetime(2025, 12, 24, 23, 0), datetime(2026, 1, 1, 7, 45)),
+    # Fuera del mapa de bits (antes del primer año y después del último)
+    (datetime(2023, 5, 1, 0, 0), datetime(2023, 5, 2, 0, 0)),
+    (datetime(2027, 1, 1, 0, 0), datetime(2027, 1, 2, 0, 0)),
+    (datetime(2024, 12, 31, 18, 0), datetime(2025, 1, 1, 6, 0)),
+    (datetime(2026, 12, 31, 18, 0), datetime(2027, 1, 1, 6, 0)),
+    # Exactamente un día festivo
+    (datetime(2025, 1, 6, 0, 0), datetime(2025, 1, 7, 0, 0)),
+])
+def test_segundos_festivos(calendario, inicio, fin):
+    assert calendario.segundos_festivos(_segundos(inicio), _segundos(fin)) == _referencia(inicio, fin, set(FESTIVOS))
+    assert calendario.horas_festivas(inicio, fin) == _referencia(inicio, fin, set(FESTIVOS)) / 3600
+
+
+def test_intervalo_vacio_o_invertido(calendario):
+    s = _segundos(datetime(2025, 1, 1, 10, 0))
+    assert calendario.segundos_festivos(s, s) == 0
+    assert calendario.segundos_festivos(s, s - 3600) == 0
+
+
+def test_calendario_vacio():
+    calendario = CalendarioFestivos([])
+    assert len(calendario) == 0
+    assert calendario.segundos_festivos(_segundos(datetime(2025, 1, 1)), _segundos(datetime(2025, 2, 1))) == 0
+    assert not calendario.es_festivo("2025-01-01")
+
+
+def test_intervalos_aleatorios(calendario):
+    azar = random.Random(16)
+    for _ in range(300):
+        inicio = datetime(2024, 11, 1) + timedelta(minutes=azar.randrange(600 * 24 * 60))
+        fin = inicio + timedelta(minutes=azar.randrange(1, 3 * 24 * 60))
+        esperado = _referencia(inicio, fin, set(FESTIVOS))
+        assert calendario.segundos_festivos(_segundos(inicio), _segundos(fin)) == esperado
+
+
+def test_consultas_por_dia(calendario):
+    assert calendario.es_festivo("2025-03-19")
+    assert "2025-12-25" in calendario
+    assert "2025-12-24" not in calendario
+    assert "no es una fecha" not in calendario
+    assert calendario.por_anio(2026) == ["2026-01-01"]
@@ -0,0 +1,126 @@
+"""
+Contraste del motor de nómina por lotes (nomina_batch) con la calculadora por turnos
+"""
+
+import json
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from calculadora import calcular_nomina_desde_json
+from festivos import calendario_festivos
+from nomina_batch import (
+    CONCEPTOS_HORAS, TARIFA_CONCEPTO,
+    a_detalles, agregar_por_dia, agregar_por_mes, calcular_turnos_lote, turnos_a_arrays
+)
+from nomina_mensual import calcular_mes, ventana_pluses
+
+FESTIVOS = ["2025-03-19", "2025-03-20"]
+
+
+def _shift(inicio, horas):
+    fin = inicio + timedelta(hours=horas)
+    return {"start": inicio.strftime("%Y-%m-%dT%H:%M:%SZ"), "end": fin.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+
+def _filas(shifts):
+    """Filas de turnos_empleado: un día por fecha de inicio con sus turnos ordenados"""
+    por_dia = {}
+    for shift in sorted(shifts, key=lambda s: s["start"]):
+        por_dia.setdefault(date.fromisoformat(shift["start"][:10]), []).append(shift)
+    return [{"dia": dia, "turno": json.dumps(lista)} for dia, lista in sorted(por_dia.items())]
+
+
+def _lote(filas, festivos):
+    empleados, inicios, finales = turnos_a_arrays(filas, empleado_id=1)
+    return calcular_turnos_lote(empleados, inicios, finales, dias_festivos=festivos)
+
+
+def _comparar(batch, calculadora):
+    for concepto in TARIFA_CONCEPTO:
+        medida = "horas" if concepto in CONCEPTOS_HORAS else "unidades"
+        assert batch[concepto]["total"] == pytest.approx(calculadora[concepto]["total"]), concepto
+        assert batch[concepto][medida] == pytest.approx(calculadora[concepto][medida]), concepto
+
+
+def _contrastar_dias(shifts, festivos):
+    filas = _filas(shifts)
+    por_dia = agregar_por_dia(_lote(filas, festivos))
+    assert len(por_dia["dia"]) == len(filas)
+
+    for i, fila in enumerate(filas):
+        assert str(por_dia["dia"][i]) == fila["dia"].isoformat()
+        total, detalles = calcular_nomina_desde_json([{"shifts": json.loads(fila["turno"])}], festivos)
+        batch = a_detalles(por_dia, i)
+        _comparar(batch, detalles)
+        assert por_dia["total"][i] == pytest.approx(total)
+        # El día de los conceptos por turno es el de inicio en ambos motores
+        for concepto in ("SE001", "SE013", "SE055", "comida", "cena"):
+            assert batch[concepto]["dias"] == detalles[concepto]["dias"], concepto
+
+
+def test_jornada_partida():
+    _contrastar_dias([
+        _shift(datetime(2025, 3, 4, 5, 0), 4),
+        _shift(datetime(2025, 3, 4, 15, 30), 4.5)
+    ], FESTIVOS)
+
+
+def test_turno_que_cruza_medianoche():
+    _contrastar_dias([
+        _shift(datetime(2025, 3, 5, 21, 0), 8),
+        _shift(datetime(2025, 3, 7, 23, 45), 6.25)
+    ], FESTIVOS)
+
+
+def test_domingo_y_paso_a_lunes():
+    # 9 de marzo de 2025 es domingo
+    _contrastar_dias([
+        _shift(datetime(2025, 3, 9, 4, 30), 8),
+        _shift(datetime(2025, 3, 9, 20, 0), 7)
+    ], FESTIVOS)
+
+
+def test_festivos_y_vispera():
+    _contrastar_dias([
+        _shift(datetime(2025, 3, 18, 22, 0), 8),
+        _shift(datetime(2025, 3, 19, 14, 0), 9),
+        _shift(datetime(2025, 3, 20, 18, 0), 8)
+    ], FESTIVOS)
+
+
+def test_turnos_aleatorios():
+    azar = random.Random(20250301)
+    shifts = []
+    for _ in range(3000):
+        inicio = datetime(2025, 1, 1) + timedelta(minutes=15 * azar.randrange(365 * 96))
+        shifts.append(_shift(inicio, azar.choice((3, 4, 5.5, 6, 7.75, 8, 9, 10))))
+    _contrastar_dias(shifts, FESTIVOS)
+
+
+def test_mes_con_ventana_de_pluses():
+    """agregar_por_mes(ventana_pluses=True) frente a nomina_mensual.calcular_mes"""
+    # Enero de 2025: festivos el 1 y el 6, domingos el 5, 12, 19 y 26
+    azar = random.Random(7)
+    shifts = [_shift(datetime(2025, 1, 5, 22, 0), 8), _shift(datetime(2025, 1, 6, 4, 0), 4)]
+    for dia in range(1, 32):
+        if dia in (5, 6) or azar.random() < 0.3:
+            continue
+        inicio = datetime(2025, 1, dia, azar.choice((4, 5, 6, 13, 14, 20, 22)), azar.choice((0, 30)))
+        shifts.append(_shift(inicio, azar.choice((4, 6, 8))))
+        if azar.random() < 0.2:
+            shifts.append(_shift(inicio + timedelta(hours=9), 3))
+
+    filas = _filas(shifts)
+    festivos = list(calendario_festivos())
+    mes = agregar_por_mes(_lote(filas, festivos), ventana_pluses=True)
+    assert [str(m) for m in mes["mes"]] == ["2025-01"]
+
+    plus_start, plus_end = ventana_pluses(date(2025, 1, 1))
+    esperado = calcular_mes(filas, plus_start, plus_end)
+    _comparar({c: {k: v[0] for k, v in mes[c].items()} for c in TARIFA_CONCEPTO}, esperado["conceptos"])
+    assert mes["total"][0] == pytest.approx(esperado["total_salary"])
+    # Días con importe de los conceptos que se anotan en el día de inicio del turno
+    for concepto in ("SE001", "SE013", "SE055", "comida", "cena"):
+        assert mes[concepto]["dias"][0] == len(esperado["conceptos"][concepto]["dias"]), concepto
@@ -0,0 +1,108 @@
+"""
+TablaTarifas.horas_pluses e importe_pluses frente a un recorrido minuto a minuto
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from config import TARIFAS
+from festivos import CalendarioFestivos
+from tabla_tarifas import TARIFA_PLUS, TablaTarifas
+
+FESTIVOS = ["2025-03-19", "2025-12-25", "2025-12-26", "2026-01-01"]
+
+
+def _referencia(inicio, fin, festivos):
+    """Horas y días de cada plus contando los minutos del turno uno a uno"""
+    minutos = {"madrugue": 0, "nocturnidad": 0, "festividad": 0, "domingo": 0}
+    dias = {plus: [] for plus in minutos}
+    momento = inicio
+    while momento < fin:
+        dia = momento.date().isoformat()
+        activos = {
+            "madrugue": 4 <= momento.hour < 7,
+            "nocturnidad": momento.hour < 4 or momento.hour >= 22,
+            "domingo": momento.weekday() == 6,
+            "festividad": dia in festivos
+        }
+        for plus, activo in activos.items():
+            if activo:
+                minutos[plus] += 1
+                if dia not in dias[plus]:
+                    dias[plus].append(dia)
+        momento += timedelta(minutes=1)
+    return {plus: valor / 60 for plus, valor in minutos.items()}, dias
+
+
+def _importe(horas):
+    return sum(horas[plus] * TARIFAS[tarifa] for plus, tarifa in TARIFA_PLUS.items())
+
+
+@pytest.fixture(scope="module")
+def tabla():
+    return TablaTarifas(TARIFAS, FESTIVOS)
+
+
+def _contrastar(tabla, inicio, fin):
+    horas_ref, dias_ref = _referencia(inicio, fin, set(FESTIVOS))
+    for festivos in (None, set(FESTIVOS), CalendarioFestivos(FESTIVOS)):
+        horas, dias = tabla.horas_pluses(inicio, fin, festivos)
+        assert horas == pytest.approx(horas_ref)
+        assert dias == dias_ref
+        assert tabla.importe_pluses(inicio, fin, festivos) == pytest.approx(_importe(horas_ref))
+
+
+def test_turno_que_empieza_a_las_0430(tabla):
+    _contrastar(tabla, datetime(2025, 3, 4, 4, 30), datetime(2025, 3, 4, 12, 30))
+
+
+def test_turno_de_domingo_a_lunes(tabla):
+    # 9 de marzo de 2025 es domingo
+    _contrastar(tabla, datetime(2025, 3, 9, 21, 15), datetime(2025, 3, 10, 5, 45))
+
+
+def test_turno_de_festivo_a_festivo(tabla):
+    _contrastar(tabla, datetime(2025, 12, 25, 20, 0), datetime(2025, 12, 26, 6, 0))
+
+
+def test_cambio_de_anio_y_semana(tabla):
+    _contrastar(tabla, datetime(2025, 12, 28, 22, 0), datetime(2026, 1, 1, 7, 0))
+
+
+def test_turnos_fuera_del_calendario_de_festivos(tabla):
+    _contrastar(tabla, datetime(2019, 6, 2, 3, 0), datetime(2019, 6, 2, 11, 0))
+    _contrastar(tabla, datetime(2031, 1, 1, 0, 0), datetime(2031, 1, 1, 8, 0))
+
+
+def test_turno_vacio_o_invertido(tabla):
+    momento = datetime(2025, 3, 9, 5, 0)
+    assert tabla.importe_pluses(momento, momento) == 0.0
+    assert tabla.importe_pluses(momento, momento - timedelta(hours=1)) == 0.0
+    horas, dias = tabla.horas_pluses(momento, momento)
+    assert sum(horas.values()) == 0.0
+    assert not any(dias.values())
+
+
+def test_turnos_aleatorios(tabla):
+    azar = random.Random(15)
+    for _ in range(200):
+        inicio = datetime(2025, 1, 1) + timedelta(minutes=azar.randrange(400 * 24 * 60))
+        _contrastar(tabla, inicio, inicio + timedelta(minutes=azar.randrange(1, 14 * 60)))
+
+
+def test_horas_plus(tabla):
+    inicio, fin = datetime(2025, 3, 8, 20, 30), datetime(2025, 3, 9, 6, 10)
+    horas_ref, _ = _referencia(inicio, fin, set())
+    for plus in ("madrugue", "nocturnidad", "domingo"):
+        assert tabla.horas_plus(plus, inicio, fin) == pytest.approx(horas_ref[plus])
+    assert tabla.horas_plus("domingo", fin, inicio) == 0.0
+
+
+def test_fecha_de_los_dias():
+    # Los días se devuelven como 'YYYY-MM-DD' de la hora local del turno
+    tabla = TablaTarifas(TARIFAS, [])
+    _, dias = tabla.horas_pluses(datetime(2025, 3, 8, 23, 0), datetime(2025, 3, 9, 1, 0))
+    assert dias["domingo"] == [date(2025, 3, 9).isoformat()]
+    assert dias["nocturnidad"] == ["2025-03-08", "2025-03-09"]
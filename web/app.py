@@ -5,11 +5,12 @@ import os
 import calendar
 import atexit
 from datetime import datetime
-from flask_login import LoginManager
+from flask_login import LoginManager, current_user
 import pymysql
 from werkzeug.middleware.proxy_fix import ProxyFix
 from auto_sync_manager import AutoSyncManager
 from routes.auto_sync_routes import auto_sync_bp, init_auto_sync_manager
+from routes.perf_routes import perf_bp
 
 # Importar blueprints
 from routes import calendario_bp, nomina_bp, detalle_bp, simulador_bp, api_bp
@@ -19,6 +20,10 @@ from routes.admin_routes import admin_bp
 from routes.sincronizacion_routes import sincronizacion_bp
 from routes.legal_routes import legal_bp
 from models.usuario import Usuario
+from database import close_db_connection
+from sync_queue import sync_queue
+from perf_monitor import perf_monitor
+from ultimo_acceso_buffer import ultimo_acceso_buffer
 
 
 def get_month_name(month_number):
@@ -30,6 +35,12 @@ def get_month_name(month_number):
         return calendar.month_name[month_number]
     return ""
 
+def _ruta_medida():
+    """Regla de URL de la petición actual (agrupa /calendario/2025/3 y /calendario/2025/4)"""
+    if request.url_rule is not None:
+        return request.url_rule.rule
+    return '<sin ruta>'
+
 def create_app():
     """
     Crea y configura la aplicación Flask
@@ -48,7 +59,8 @@ def create_app():
     
     # Configuración de la aplicación
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev_key_change_in_production')
-    app.config['TEMPLATES_AUTO_RELOAD'] = True
+    # Recargar plantillas solo en desarrollo (cada comprobación cuesta un stat por render)
+    app.config['TEMPLATES_AUTO_RELOAD'] = os.getenv('TEMPLATES_AUTO_RELOAD', 'false').lower() == 'true'
     app.config['PREFERRED_URL_SCHEME'] = 'https'
     app.config['APPLICATION_ROOT'] = '/south'
     
@@ -61,7 +73,7 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return Usuario.obtener_por_id(int(user_id))
+        return Usuario.cargar_sesion(int(user_id))
     
     # Configuración de Jinja2
     # Añadir filtro personalizado para month_name
@@ -111,6 +123,7 @@ def create_app():
     app.register_blueprint(simulador_bp)
     app.register_blueprint(api_bp)
     app.register_blueprint(auto_sync_bp)
+    app.register_blueprint(perf_bp)
     
     # Asegurar que exista la carpeta static
     if not os.path.exists(static_dir):
@@ -131,6 +144,32 @@ def create_app():
     def page_not_found(e):
         return render_template('404.html'), 404
     
+    @app.before_request
+    def iniciar_medicion():
+        """Abre la medición de rendimiento de la petición"""
+        if request.endpoint != 'static':
+            perf_monitor.iniciar_peticion()
+            perf_monitor.marcar_ruta(_ruta_medida())
+    
+    @app.before_request
+    def registrar_ultimo_acceso():
+        """Anota el acceso del usuario (se escribe por lotes en segundo plano)"""
+        if request.endpoint != 'static' and current_user.is_authenticated:
+            ultimo_acceso_buffer.registrar(current_user.id)
+    
+    @app.after_request
+    def finalizar_medicion(response):
+        """Registra latencia, consultas y tiempo de BD de la petición"""
+        perf_monitor.finalizar_peticion(_ruta_medida(), request.method, response.status_code)
+        return response
+    
+    @app.teardown_request
+    def release_db_connection(exc):
+        """Devuelve al pool cualquier conexión que la petición no haya cerrado"""
+        # Peticiones que terminaron con una excepción no pasan por after_request
+        perf_monitor.finalizar_peticion(_ruta_medida(), request.method, 500)
+        close_db_connection()
+    
     @app.errorhandler(pymysql.OperationalError)
     def handle_db_error(error):
         """Manejador de errores para problemas de conexión a la base de datos"""
@@ -165,6 +204,13 @@ def create_app():
     # DESACTIVADO: La empresa ya no usa SITA, mantener datos actuales como demo
     # init_auto_sync()
     
+    # Arrancar la cola de sincronización (pool fijo de hilos)
+    sync_queue.start()
+    atexit.register(sync_queue.stop)
+    
+    # Volcar los últimos accesos pendientes al cerrar
+    atexit.register(ultimo_acceso_buffer.stop)
+    
     # Registrar función de limpieza al salir
     def cleanup_auto_sync():
         """Limpia el auto-sync al cerrar la aplicación"""
@@ -18,8 +18,16 @@ class AutoSyncConfig:
     
     # Tiempo de espera entre ciclos completos (en segundos)
     # Por defecto: 1 hora = 3600 segundos
+    # Con el planificador es el intervalo de los usuarios de mayor prioridad
     CYCLE_INTERVAL = int(os.getenv('AUTO_SYNC_CYCLE_INTERVAL', 3600))
     
+    # Multiplicador máximo del intervalo para usuarios sin accesos, cambios ni turnos próximos
+    # (1 = todos los usuarios cada CYCLE_INTERVAL)
+    MAX_INTERVAL_FACTOR = float(os.getenv('AUTO_SYNC_MAX_INTERVAL_FACTOR', 6))
+    
+    # Cada cuánto se vuelve a leer la lista de usuarios del planificador (en segundos)
+    SCHEDULER_REFRESH = int(os.getenv('AUTO_SYNC_SCHEDULER_REFRESH', 300))
+    
     # Tiempo de espera entre usuarios (en segundos)
     # Por defecto: 5 segundos
     USER_DELAY = int(os.getenv('AUTO_SYNC_USER_DELAY', 5))
@@ -32,8 +40,12 @@ class AutoSyncConfig:
     MAX_RETRIES = int(os.getenv('AUTO_SYNC_MAX_RETRIES', 5))
     
     # Tiempo de espera entre reintentos (en segundos)
+    # Es la espera del primer reintento; se duplica en cada uno con desfase aleatorio
     RETRY_DELAY = int(os.getenv('AUTO_SYNC_RETRY_DELAY', 30))
     
+    # Espera máxima entre reintentos (en segundos)
+    RETRY_MAX_DELAY = int(os.getenv('AUTO_SYNC_RETRY_MAX_DELAY', 300))
+    
     # Timeout para requests HTTP (en segundos)
     HTTP_TIMEOUT = int(os.getenv('AUTO_SYNC_HTTP_TIMEOUT', 30))
     
@@ -61,9 +73,34 @@ class AutoSyncConfig:
     MAX_CYCLE_DURATION = int(os.getenv('AUTO_SYNC_MAX_CYCLE_DURATION', 1800))  # 30 minutos
     
     # Número máximo de usuarios a procesar en un ciclo
-    # (0 = sin límite)
+    # (en cualquier ventana de CYCLE_INTERVAL segundos; 0 = sin límite)
     MAX_USERS_PER_CYCLE = int(os.getenv('AUTO_SYNC_MAX_USERS_PER_CYCLE', 0))
     
+    # Número de hilos que sincronizan usuarios en paralelo
+    # (1 = modo secuencial, un usuario detrás de otro)
+    WORKERS = int(os.getenv('AUTO_SYNC_WORKERS', 1))
+    
+    # Límite de peticiones por segundo contra el servidor SITA (token bucket)
+    # (0 = sin límite)
+    SITA_RATE_LIMIT = float(os.getenv('AUTO_SYNC_SITA_RATE_LIMIT', 2))
+    
+    # Ráfaga máxima de peticiones permitidas contra SITA
+    SITA_RATE_BURST = int(os.getenv('AUTO_SYNC_SITA_RATE_BURST', 4))
+    
+    # Encolar los usuarios en la cola de sincronización (carril automático)
+    # en lugar de sincronizarlos desde este proceso
+    USE_QUEUE = os.getenv('AUTO_SYNC_USE_QUEUE', 'false').lower() == 'true'
+    
+    # Repartir los usuarios entre varios procesos de sincronización mediante
+    # concesiones en la tabla sync_leases (requiere MySQL 8.0+)
+    LEASES = os.getenv('AUTO_SYNC_LEASES', 'false').lower() == 'true'
+    
+    # Duración de una concesión sin latido antes de que otro proceso la reclame (en segundos)
+    LEASE_TTL = int(os.getenv('AUTO_SYNC_LEASE_TTL', 300))
+    
+    # Espera máxima entre búsquedas de usuarios vencidos (en segundos)
+    LEASE_POLL = int(os.getenv('AUTO_SYNC_LEASE_POLL', 30))
+    
     # ============================================
     # CONFIGURACIÓN DE NOTIFICACIONES
     # ============================================
@@ -111,15 +148,21 @@ class AutoSyncConfig:
         """Devuelve un resumen de la configuración actual"""
         return {
             'cycle_interval_minutes': cls.CYCLE_INTERVAL // 60,
+            'max_interval_factor': cls.MAX_INTERVAL_FACTOR,
             'user_delay_seconds': cls.USER_DELAY,
             'max_retries': cls.MAX_RETRIES,
-            'retry_delay_seconds': cls.RETRY_DELAY,
+            'retry_delay_seconds': f"{cls.RETRY_DELAY} a {cls.RETRY_MAX_DELAY} (exponencial)",
             'http_timeout_seconds': cls.HTTP_TIMEOUT,
             'log_file': cls.LOG_FILE,
             'log_level': cls.LOG_LEVEL,
             'max_users_per_cycle': cls.MAX_USERS_PER_CYCLE if cls.MAX_USERS_PER_CYCLE > 0 else 'Sin límite',
+            'workers': cls.WORKERS,
+            'sita_rate_limit': f"{cls.SITA_RATE_LIMIT} peticiones/s (ráfaga {cls.SITA_RATE_BURST})" if cls.SITA_RATE_LIMIT > 0 else 'Sin límite',
+            'use_queue': cls.USE_QUEUE,
+            'leases': f"Sí (concesión {cls.LEASE_TTL}s)" if cls.LEASES else 'No',
             'email_notifications': cls.EMAIL_NOTIFICATIONS,
             'excluded_users_count': len(cls.EXCLUDED_USERS),
+            'last_login_days': cls.LAST_LOGIN_DAYS if cls.LAST_LOGIN_DAYS > 0 else 'Todos',
             'sync_range': f"{cls.DAYS_BACK} días atrás a {cls.DAYS_FORWARD} días adelante"
         }
     
@@ -133,6 +176,12 @@ class AutoSyncConfig:
         if cls.CYCLE_INTERVAL < 300:  # Menos de 5 minutos
             warnings.append(f"Intervalo de ciclo muy corto: {cls.CYCLE_INTERVAL}s (mínimo recomendado: 300s)")
         
+        if cls.MAX_INTERVAL_FACTOR < 1:
+            errors.append(f"AUTO_SYNC_MAX_INTERVAL_FACTOR debe ser al menos 1: {cls.MAX_INTERVAL_FACTOR}")
+        
+        if cls.SCHEDULER_REFRESH < 30:
+            warnings.append(f"Refresco del planificador muy corto: {cls.SCHEDULER_REFRESH}s (mínimo recomendado: 30s)")
+        
         if cls.USER_DELAY < 1:
             warnings.append(f"Delay entre usuarios muy corto: {cls.USER_DELAY}s (mínimo recomendado: 1s)")
         
@@ -143,10 +192,36 @@ class AutoSyncConfig:
         if cls.RETRY_DELAY < 5:
             warnings.append(f"Delay de reintento muy corto: {cls.RETRY_DELAY}s (mínimo recomendado: 5s)")
         
+        if cls.RETRY_MAX_DELAY < cls.RETRY_DELAY:
+            warnings.append(f"AUTO_SYNC_RETRY_MAX_DELAY ({cls.RETRY_MAX_DELAY}s) es menor que AUTO_SYNC_RETRY_DELAY ({cls.RETRY_DELAY}s)")
+        
         # Validar timeouts
         if cls.HTTP_TIMEOUT < 10:
             warnings.append(f"Timeout HTTP muy corto: {cls.HTTP_TIMEOUT}s (mínimo recomendado: 10s)")
         
+        # Validar concurrencia
+        if cls.WORKERS < 1:
+            errors.append(f"AUTO_SYNC_WORKERS debe ser al menos 1: {cls.WORKERS}")
+        elif cls.WORKERS > 20:
+            warnings.append(f"Demasiados hilos de sincronización: {cls.WORKERS} (máximo recomendado: 20)")
+        
+        if cls.WORKERS > 1 and cls.SITA_RATE_LIMIT <= 0:
+            warnings.append("Sincronización en paralelo sin límite de peticiones a SITA")
+        
+        if cls.SITA_RATE_BURST < 1:
+            errors.append(f"AUTO_SYNC_SITA_RATE_BURST debe ser al menos 1: {cls.SITA_RATE_BURST}")
+        
+        # Validar concesiones
+        if cls.LEASES:
+            if cls.USE_QUEUE:
+                warnings.append("AUTO_SYNC_LEASES y AUTO_SYNC_USE_QUEUE activos: se usarán las concesiones")
+            if cls.LEASE_TTL < 60:
+                warnings.append(f"Concesión muy corta: {cls.LEASE_TTL}s (mínimo recomendado: 60s)")
+            if cls.LEASE_TTL < cls.HTTP_TIMEOUT * 2:
+                warnings.append(f"La concesión ({cls.LEASE_TTL}s) debería durar al menos dos timeouts HTTP")
+            if cls.LEASE_POLL < 1:
+                errors.append(f"AUTO_SYNC_LEASE_POLL debe ser al menos 1: {cls.LEASE_POLL}")
+        
         # Validar notificaciones por email
         if cls.EMAIL_NOTIFICATIONS and not cls.ADMIN_EMAIL:
             errors.append("Email de notificaciones habilitado pero no se especificó ADMIN_EMAIL")
@@ -175,12 +250,18 @@ ENV_EXAMPLE = """
 # 3600 = 1 hora, 1800 = 30 minutos, 7200 = 2 horas
 AUTO_SYNC_CYCLE_INTERVAL=3600
 
+# Planificador: intervalo máximo (en múltiplos del anterior) para usuarios inactivos
+# y frecuencia de recarga de la lista de usuarios (en segundos)
+AUTO_SYNC_MAX_INTERVAL_FACTOR=6
+AUTO_SYNC_SCHEDULER_REFRESH=300
+
 # Delay entre usuarios (en segundos)
 AUTO_SYNC_USER_DELAY=5
 
 # Configuración de reintentos
 AUTO_SYNC_MAX_RETRIES=5
 AUTO_SYNC_RETRY_DELAY=30
+AUTO_SYNC_RETRY_MAX_DELAY=300
 AUTO_SYNC_HTTP_TIMEOUT=30
 
 # Configuración de logs
@@ -193,6 +274,19 @@ AUTO_SYNC_LOG_BACKUP_COUNT=5
 AUTO_SYNC_MAX_CYCLE_DURATION=1800
 AUTO_SYNC_MAX_USERS_PER_CYCLE=0
 
+# Sincronización en paralelo (1 = secuencial)
+AUTO_SYNC_WORKERS=1
+AUTO_SYNC_SITA_RATE_LIMIT=2
+AUTO_SYNC_SITA_RATE_BURST=4
+
+# Encolar usuarios en la cola de sincronización (carril automático)
+AUTO_SYNC_USE_QUEUE=false
+
+# Repartir usuarios entre varios procesos con concesiones (MySQL 8.0+)
+AUTO_SYNC_LEASES=false
+AUTO_SYNC_LEASE_TTL=300
+AUTO_SYNC_LEASE_POLL=30
+
 # Notificaciones por email
 AUTO_SYNC_EMAIL_NOTIFICATIONS=false
 AUTO_SYNC_ADMIN_EMAIL=admin@tuempresa.com
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 """
 Sistema de Sincronización Automática de Turnos
-Sincroniza todos los usuarios automáticamente cada hora
+Sincroniza los usuarios automáticamente, con más frecuencia los más activos
 """
 
 import threading
@@ -9,16 +9,26 @@ import time
 import logging
 import traceback
 import requests
+import pymysql
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple, Optional
 import signal
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Importar módulos de la aplicación
 from database import get_db_connection, execute_query, close_db_connection
 from models.credencial_sita import CredencialSita
 from routes.sincronizacion_routes import obtener_turnos_sita, insertar_turnos_en_bd
+from auto_sync_config import AutoSyncConfig
+from rate_limiter import TokenBucket
+from sita_client import sita_client, SitaError, SitaNoDisponible, SitaCancelada
+from circuit_breaker import espera_exponencial
+from sync_queue import sync_queue
+from sync_leases import SyncLeases
+from sync_scheduler import SyncScheduler
+from sync_eventos import sync_eventos
 
 # Configurar logging específico para el sincronizador
 logging.basicConfig(
@@ -34,16 +44,36 @@ logger = logging.getLogger("AutoSyncTurnos")
 class AutoSyncManager:
     """Gestor de sincronización automática de turnos"""
     
-    def __init__(self):
+    def __init__(self, workers=None):
         self.running = False
         self.thread = None
+        # Número de hilos de sincronización (1 = secuencial)
+        self.workers = max(1, workers if workers is not None else AutoSyncConfig.WORKERS)
+        # Limitador compartido de peticiones contra el servidor SITA
+        self.rate_limiter = TokenBucket(AutoSyncConfig.SITA_RATE_LIMIT, AutoSyncConfig.SITA_RATE_BURST)
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        # Concesiones para repartir los usuarios entre varios procesos (None = este proceso sincroniza a todos)
+        self.leases = SyncLeases(AutoSyncConfig.CYCLE_INTERVAL, AutoSyncConfig.LEASE_TTL) if AutoSyncConfig.LEASES else None
+        self._lease_threads = []
+        # Cola de prioridad con la próxima sincronización de cada usuario
+        self.scheduler = SyncScheduler(
+            AutoSyncConfig.CYCLE_INTERVAL,
+            AutoSyncConfig.MAX_INTERVAL_FACTOR,
+            AutoSyncConfig.MAX_USERS_PER_CYCLE,
+            AutoSyncConfig.SCHEDULER_REFRESH
+        )
         self.stats = {
             'cycle_count': 0,
             'total_users_synced': 0,
             'total_errors': 0,
             'last_cycle_start': None,
             'last_cycle_end': None,
-            'current_user': None
+            'last_user_sync_end': None,
+            'last_user_sync_seconds': None,
+            'current_user': None,
+            'total_postponed': 0,
+            'workers': {}
         }
         
     def start(self):
@@ -53,8 +83,12 @@ class AutoSyncManager:
             return
             
         self.running = True
-        self.thread = threading.Thread(target=self._sync_loop, daemon=True)
-        self.thread.start()
+        self._stop_event.clear()
+        if self.leases:
+            self._start_lease_workers()
+        else:
+            self.thread = threading.Thread(target=self._sync_loop, daemon=True)
+            self.thread.start()
         logger.info("🚀 Sincronizador automático iniciado")
         
     def stop(self):
@@ -63,108 +97,376 @@ class AutoSyncManager:
             return
             
         self.running = False
+        self._stop_event.set()
         if self.thread and self.thread.is_alive():
             logger.info("⏹️ Deteniendo sincronizador automático...")
             self.thread.join(timeout=30)
+        for thread in self._lease_threads:
+            thread.join(timeout=30)
+        self._lease_threads = []
+        if self.leases:
+            # Las concesiones que queden se liberan para que otro proceso las tome enseguida
+            self.leases.stop()
         logger.info("✅ Sincronizador automático detenido")
         
     def get_stats(self) -> Dict:
         """Obtiene estadísticas del sincronizador"""
-        return self.stats.copy()
+        with self._stats_lock:
+            stats = self.stats.copy()
+            stats['workers'] = {name: info.copy() for name, info in self.stats['workers'].items()}
+        if self.leases:
+            stats['mode'] = 'concesiones'
+            stats['leases'] = self.leases.get_stats()
+        else:
+            stats['mode'] = 'concurrente' if self.workers > 1 else 'secuencial'
+            stats['scheduler'] = self.scheduler.get_stats()
+        stats['max_workers'] = self.workers
+        stats['rate_limiter'] = self.rate_limiter.get_stats()
+        stats['sita_client'] = sita_client.get_stats()
+        stats['sita_breaker'] = stats['sita_client']['breaker']
+        return stats
+    
+    def _update_stats(self, **changes):
+        """Actualiza contadores de forma segura entre hilos (los enteros se suman)"""
+        with self._stats_lock:
+            for key, value in changes.items():
+                if isinstance(value, int) and not isinstance(value, bool) and isinstance(self.stats.get(key), int):
+                    self.stats[key] += value
+                else:
+                    self.stats[key] = value
+    
+    def _set_worker_activity(self, worker_name: str, user: Optional[Dict], result: Optional[bool] = None):
+        """Registra qué usuario está sincronizando cada hilo y su resultado"""
+        with self._stats_lock:
+            info = self.stats['workers'].setdefault(worker_name, {
+                'current_user': None,
+                'users_synced': 0,
+                'errors': 0,
+                'last_activity': None
+            })
+            info['current_user'] = f"{user['nombre_completo']} ({user['numero_empleado']})" if user else None
+            info['last_activity'] = datetime.now()
+            if result is True:
+                info['users_synced'] += 1
+            elif result is False:
+                info['errors'] += 1
+            
+            activos = [w['current_user'] for w in self.stats['workers'].values() if w['current_user']]
+            self.stats['current_user'] = ", ".join(activos) if activos else None
         
     def _sync_loop(self):
-        """Bucle principal de sincronización"""
+        """
+        Bucle principal de sincronización
+        
+        Cada vuelta sincroniza los usuarios vencidos según el planificador (de mayor a
+        menor prioridad) y espera hasta el siguiente vencimiento.
+        """
         logger.info("🔄 Iniciando bucle de sincronización automática")
         
         while self.running:
             try:
-                cycle_start = datetime.now()
-                self.stats['cycle_count'] += 1
-                self.stats['last_cycle_start'] = cycle_start
-                
-                logger.info(f"📅 Iniciando ciclo de sincronización #{self.stats['cycle_count']}")
+                # Recargar usuarios, accesos e historial de cambios cada SCHEDULER_REFRESH segundos
+                if self.scheduler.necesita_refresco():
+                    users = self._get_active_users_with_credentials()
+                    atrasados = self.scheduler.actualizar(users)
+                    if not users:
+                        logger.warning("⚠️ No se encontraron usuarios activos con credenciales SITA")
+                    elif atrasados:
+                        logger.info(f"🗓️ {atrasados} usuarios pendientes repartidos en los próximos "
+                                    f"{AutoSyncConfig.CYCLE_INTERVAL // 60} minutos")
                 
-                # Obtener usuarios activos con credenciales SITA
-                users = self._get_active_users_with_credentials()
-                
-                if not users:
-                    logger.warning("⚠️ No se encontraron usuarios activos con credenciales SITA")
-                else:
-                    logger.info(f"👥 Sincronizando {len(users)} usuarios")
+                users = self.scheduler.vencidos()
+                if users:
+                    cycle_start = datetime.now()
+                    self._update_stats(cycle_count=1, last_cycle_start=cycle_start)
                     
-                    # Sincronizar cada usuario secuencialmente
-                    for user in users:
-                        if not self.running:  # Verificar si se debe detener
-                            break
-                            
-                        self.stats['current_user'] = f"{user['nombre_completo']} ({user['numero_empleado']})"
-                        success = self._sync_user_with_retries(user)
+                    if AutoSyncConfig.USE_QUEUE:
+                        self._enqueue_users(users)
+                        for user in users:
+                            self.scheduler.reprogramar(user)
+                    elif self.workers > 1:
+                        logger.info(f"👥 Sincronizando {len(users)} usuarios con {self.workers} hilos")
+                        self._sync_users_concurrently(users)
+                    else:
+                        logger.info(f"👥 Sincronizando {len(users)} usuarios")
                         
-                        if success:
-                            self.stats['total_users_synced'] += 1
-                        else:
-                            self.stats['total_errors'] += 1
-                            
-                        # Pequeña pausa entre usuarios para no sobrecargar
-                        if self.running:
-                            time.sleep(5)
-                
-                self.stats['last_cycle_end'] = datetime.now()
-                self.stats['current_user'] = None
-                
-                cycle_duration = (self.stats['last_cycle_end'] - cycle_start).total_seconds()
-                logger.info(f"✅ Ciclo #{self.stats['cycle_count']} completado en {cycle_duration:.1f}s")
+                        # Sincronizar cada usuario secuencialmente
+                        for user in users:
+                            if not self.running:  # Verificar si se debe detener
+                                break
+                                
+                            if self._sync_user_worker(user) is None:
+                                continue  # Aplazado sin llamar a SITA (cortacircuitos abierto)
+                                
+                            # Pequeña pausa entre usuarios para no sobrecargar
+                            if self.running:
+                                self._wait_with_interruption(AutoSyncConfig.USER_DELAY)
+                    
+                    self._update_stats(last_cycle_end=datetime.now(), current_user=None)
+                    
+                    cycle_duration = (self.stats['last_cycle_end'] - cycle_start).total_seconds()
+                    logger.info(f"✅ Ciclo #{self.stats['cycle_count']} completado en {cycle_duration:.1f}s")
                 
-                # Esperar 1 hora antes del siguiente ciclo
+                # Esperar al siguiente vencimiento (o a la próxima recarga de usuarios)
                 if self.running:
-                    logger.info("⏰ Esperando 1 hora hasta el próximo ciclo...")
-                    self._wait_with_interruption(3600)  # 1 hora = 3600 segundos
+                    espera = self.scheduler.segundos_hasta_proximo()
+                    if espera is None or espera > AutoSyncConfig.SCHEDULER_REFRESH:
+                        espera = AutoSyncConfig.SCHEDULER_REFRESH
+                    if espera >= 60:
+                        logger.info(f"⏰ Próxima sincronización en {espera / 60:.0f} minutos")
+                    self._wait_with_interruption(max(1, espera))
                     
             except Exception as e:
                 logger.error(f"❌ Error crítico en el bucle de sincronización: {e}")
                 logger.error(traceback.format_exc())
-                self.stats['total_errors'] += 1
+                self._update_stats(total_errors=1)
                 
                 # Esperar un poco antes de reintentar
                 if self.running:
                     logger.info("⏳ Esperando 5 minutos antes de reintentar...")
                     self._wait_with_interruption(300)  # 5 minutos
+            finally:
+                close_db_connection()
                     
         logger.info("🏁 Bucle de sincronización terminado")
         
-    def _wait_with_interruption(self, seconds: int):
-        """Espera con capacidad de interrupción"""
-        start_time = time.time()
-        while self.running and (time.time() - start_time) < seconds:
-            time.sleep(1)
+    def _sync_users_concurrently(self, users: List[Dict]):
+        """
+        Reparte los usuarios entre un pool acotado de hilos
+        Los reintentos de un usuario solo ocupan su hilo, el resto sigue avanzando
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="AutoSyncWorker") as executor:
+            futures = [executor.submit(self._sync_user_worker, user) for user in users]
+            
+            # Esperar al ciclo completo, atendiendo a la señal de parada
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=1)
+                if not self.running:
+                    for future in pending:
+                        future.cancel()
+                    break
+    
+    def _start_lease_workers(self):
+        """Arranca el latido de las concesiones y los hilos que reclaman usuarios"""
+        try:
+            nuevos = self.leases.registrar_empleados()
+            logger.info(f"🔐 Concesiones como {self.leases.instancia} ({nuevos} usuarios registrados)")
+        except Exception as e:
+            logger.error(f"❌ Error registrando usuarios en sync_leases: {e}")
+        finally:
+            close_db_connection()
+        
+        self.leases.start()
+        self._lease_threads = [
+            threading.Thread(target=self._lease_loop, name=f"AutoSyncLease-{i + 1}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._lease_threads:
+            thread.start()
+    
+    def _lease_loop(self):
+        """
+        Bucle de un hilo en modo concesiones: reclama un usuario vencido, lo sincroniza y
+        libera la concesión dejando la siguiente sincronización a un intervalo
+        
+        Con varios procesos apuntando a la misma base de datos cada usuario lo sincroniza
+        solo uno de ellos; si un proceso muere sus concesiones caducan y las recupera otro.
+        """
+        while self.running:
+            empleado_id = None
+            try:
+                # Con SITA caído no se reclaman usuarios: quedan para cuando se recupere
+                if not sita_client.breaker.disponible():
+                    espera = min(AutoSyncConfig.LEASE_POLL, sita_client.breaker.segundos_para_reintento())
+                    self._wait_with_interruption(max(1, espera))
+                    continue
+                
+                ids = self.leases.reclamar(1)
+                if not ids:
+                    # Nada vencido: registrar usuarios nuevos y esperar al siguiente vencimiento
+                    self.leases.registrar_empleados()
+                    espera = self.leases.segundos_hasta_proxima()
+                    if espera is None or espera > AutoSyncConfig.LEASE_POLL:
+                        espera = AutoSyncConfig.LEASE_POLL
+                    close_db_connection()
+                    self._wait_with_interruption(max(1, espera))
+                    continue
+                
+                empleado_id = ids[0]
+                users = self._get_active_users_with_credentials([empleado_id])
+                if not users:
+                    # Sin credenciales o excluido: se aplaza un intervalo como si se hubiera sincronizado
+                    self.leases.liberar(empleado_id)
+                    continue
+                
+                # Sin ciclos en este modo: se registra la duración de cada usuario
+                inicio = time.monotonic()
+                resultado = self._sync_user_worker(users[0])
+                self._update_stats(last_user_sync_end=datetime.now(),
+                                   last_user_sync_seconds=round(time.monotonic() - inicio, 1))
+                # Si se está parando a medias o SITA no está disponible, queda vencido
+                # para que lo retome otro hilo o proceso sin esperar al intervalo
+                self.leases.liberar(empleado_id, sincronizado=self.running and resultado is not None,
+                                    intervalo=self.scheduler.intervalo_para(users[0]))
+                
+            except Exception as e:
+                logger.error(f"❌ Error en el bucle de concesiones: {e}")
+                logger.error(traceback.format_exc())
+                self._update_stats(total_errors=1)
+                if empleado_id is not None:
+                    try:
+                        self.leases.liberar(empleado_id, sincronizado=False)
+                    except Exception:
+                        pass  # La concesión caducará sola
+                if self.running:
+                    self._wait_with_interruption(AutoSyncConfig.LEASE_POLL)
+            finally:
+                close_db_connection()
+        
+        logger.info(f"🏁 {threading.current_thread().name} terminado")
+    
+    def _enqueue_users(self, users: List[Dict]):
+        """Encola los usuarios en el carril automático de la cola de sincronización"""
+        nuevos = 0
+        for user in users:
+            if not self.running:
+                break
+            try:
+                _, nuevo = sync_queue.encolar(user['id'], 'auto')
+                nuevos += int(nuevo)
+            except Exception as e:
+                logger.error(f"❌ Error encolando a {user.get('numero_empleado')}: {e}")
+                self._update_stats(total_errors=1)
+        logger.info(f"📥 {nuevos} usuarios encolados ({len(users) - nuevos} ya tenían un trabajo activo)")
+    
+    def _sync_user_worker(self, user: Dict) -> Optional[bool]:
+        """
+        Sincroniza un usuario registrando la actividad del hilo que lo procesa
+        
+        Devuelve None si se aplaza porque el cortacircuitos de SITA está abierto; en ese
+        caso no se llama a SITA y el usuario se reprograma para cuando pueda reintentarse.
+        """
+        worker_name = threading.current_thread().name
+        if not self.running:
+            return False
+        
+        if not sita_client.breaker.disponible():
+            self._postpone_user(user)
+            return None
+        
+        self._set_worker_activity(worker_name, user)
+        success = False
+        try:
+            success = self._sync_user_with_retries(user)
+        except Exception as e:
+            logger.error(f"❌ Error no controlado sincronizando {user.get('numero_empleado')}: {e}")
+            logger.error(traceback.format_exc())
+        finally:
+            if success:
+                self._update_stats(total_users_synced=1)
+            elif success is not None:
+                self._update_stats(total_errors=1)
+            self._set_worker_activity(worker_name, None, success)
+            if success is None:
+                self._postpone_user(user)
+            else:
+                # Siguiente sincronización a un intervalo propio según su prioridad
+                self.scheduler.reprogramar(user)
+            # Devolver al pool cualquier conexión que haya quedado prestada en este hilo
+            close_db_connection()
+        return success
+    
+    def _postpone_user(self, user: Dict):
+        """Reprograma un usuario para cuando el cortacircuitos de SITA deje reintentar"""
+        self._update_stats(total_postponed=1)
+        espera = max(sita_client.breaker.segundos_para_reintento(), AutoSyncConfig.RETRY_DELAY)
+        self.scheduler.aplazar(user, espera)
+    
+    def _wait_with_interruption(self, seconds: float) -> bool:
+        """Espera con capacidad de interrupción (devuelve True si se ha pedido parar)"""
+        return self._stop_event.wait(seconds)
             
-    def _get_active_users_with_credentials(self) -> List[Dict]:
-        """Obtiene usuarios activos que tienen credenciales SITA configuradas"""
+    def _get_active_users_with_credentials(self, empleado_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Obtiene usuarios activos que tienen credenciales SITA configuradas
+        (solo los indicados en empleado_ids, si se pasan)
+        
+        Aplica AUTO_SYNC_LAST_LOGIN_DAYS y AUTO_SYNC_EXCLUDED_USERS e incluye los datos
+        que usa el planificador (último acceso, media de cambios y próximo turno). Si aún
+        no existen las tablas sync_actividad o turno_shift se leen los usuarios sin esos
+        datos (todos con la misma prioridad) en lugar de dejar de sincronizar.
+        Las credenciales de todo el ciclo se leen en la misma consulta y se dejan
+        desencriptadas en la caché de CredencialSita para los reintentos
+        """
         try:
-            query = """
-                SELECT e.id, e.numero_empleado, e.nombre_completo, e.email,
-                       c.sita_username, c.site_id, c.cvation_tenantid, c.roster_url
-                FROM empleados e
-                INNER JOIN credenciales_sita c ON e.id = c.empleado_id
-                WHERE e.activo = 1
-                ORDER BY e.id
-            """
+            filtros = []
+            params = []
+            if empleado_ids:
+                filtros.append(f"AND e.id IN ({', '.join(['%s'] * len(empleado_ids))})")
+                params.extend(empleado_ids)
+            if AutoSyncConfig.LAST_LOGIN_DAYS > 0:
+                filtros.append("AND e.ultimo_acceso >= NOW() - INTERVAL %s DAY")
+                params.append(AutoSyncConfig.LAST_LOGIN_DAYS)
+            if AutoSyncConfig.EXCLUDED_USERS:
+                filtros.append(f"AND e.numero_empleado NOT IN ({', '.join(['%s'] * len(AutoSyncConfig.EXCLUDED_USERS))})")
+                params.extend(AutoSyncConfig.EXCLUDED_USERS)
             
-            users = execute_query(query)
-            logger.info(f"📊 Encontrados {len(users)} usuarios activos con credenciales SITA")
+            def consulta(planificador):
+                if planificador:
+                    # Los turnos se guardan en UTC: el próximo se busca desde UTC_TIMESTAMP()
+                    columnas = """a.cambios_media,
+                           (SELECT MIN(ts.inicio) FROM turno_shift ts
+                            WHERE ts.empleado_id = e.id AND ts.inicio >= UTC_TIMESTAMP()) AS proximo_turno"""
+                    union = "LEFT JOIN sync_actividad a ON a.empleado_id = e.id"
+                else:
+                    columnas = "NULL AS cambios_media, NULL AS proximo_turno"
+                    union = ""
+                return f"""
+                    SELECT e.id, e.numero_empleado, e.nombre_completo, e.email,
+                           e.ultimo_acceso, e.ultima_sincronizacion,
+                           {columnas},
+                           c.id AS credencial_id, c.empleado_id, c.sita_username, c.sita_password_encrypted,
+                           c.site_id, c.cvation_tenantid, c.roster_url, c.fecha_actualizacion
+                    FROM empleados e
+                    INNER JOIN credenciales_sita c ON e.id = c.empleado_id
+                    {union}
+                    WHERE e.activo = 1 {' '.join(filtros)}
+                    ORDER BY e.id
+                """
+            
+            try:
+                users = execute_query(consulta(True), params or None)
+            except pymysql.ProgrammingError as e:
+                # 1146: la tabla no existe (migraciones del planificador sin aplicar)
+                if e.args[0] != 1146:
+                    raise
+                logger.warning(f"⚠️ {e.args[1]}: se sincroniza sin prioridades. Ejecutar "
+                               f"scripts/setup_sync_actividad.py y scripts/setup_turno_shift.py")
+                users = execute_query(consulta(False), params or None)
+            CredencialSita.precargar(users, id_columna='credencial_id')
+            for user in users:
+                del user['sita_password_encrypted']
+            if not empleado_ids:
+                logger.info(f"📊 Encontrados {len(users)} usuarios activos con credenciales SITA")
             return users
             
         except Exception as e:
             logger.error(f"❌ Error obteniendo usuarios: {e}")
             return []
             
-    def _sync_user_with_retries(self, user: Dict) -> bool:
-        """Sincroniza un usuario con lógica de reintentos para timeouts"""
+    def _sync_user_with_retries(self, user: Dict) -> Optional[bool]:
+        """
+        Sincroniza un usuario con lógica de reintentos para timeouts y errores del servidor
+        
+        Entre intentos se espera de forma exponencial con desfase aleatorio a partir de
+        AUTO_SYNC_RETRY_DELAY. Si el cortacircuitos de SITA se abre no se sigue
+        reintentando y se devuelve None para aplazar al usuario.
+        """
         user_id = user['id']
         user_name = f"{user['nombre_completo']} ({user['numero_empleado']})"
         
-        max_retries = 5
-        retry_delay = 30  # 30 segundos entre reintentos
+        max_retries = max(1, AutoSyncConfig.MAX_RETRIES)
         
         for attempt in range(1, max_retries + 1):
             if not self.running:
@@ -173,7 +475,7 @@ class AutoSyncManager:
             try:
                 logger.info(f"🔄 [{attempt}/{max_retries}] Sincronizando: {user_name}")
                 
-                # Obtener credenciales completas del usuario
+                # Obtener credenciales completas del usuario (precargadas en el ciclo)
                 credenciales = CredencialSita.obtener_por_empleado(user_id)
                 if not credenciales:
                     logger.error(f"❌ No se encontraron credenciales para {user_name}")
@@ -183,8 +485,12 @@ class AutoSyncManager:
                 self._set_sync_status(user_id, True, None)
                 
                 # Realizar sincronización
-                turnos = obtener_turnos_sita(credenciales)
+                sync_eventos.publicar_seguro(user_id, 'fetch')
+                turnos = obtener_turnos_sita(
+                    credenciales, rate_limiter=self.rate_limiter, stop_event=self._stop_event
+                )
                 if turnos:
+                    sync_eventos.publicar_seguro(user_id, 'diff')
                     updated_days = insertar_turnos_en_bd(user_id, turnos)
                     logger.info(f"✅ {user_name}: {updated_days} días actualizados")
                 else:
@@ -194,27 +500,42 @@ class AutoSyncManager:
                 self._set_sync_status(user_id, False, None)
                 return True
                 
-            except requests.exceptions.ReadTimeout as e:
-                error_msg = f"Timeout de lectura (intento {attempt}/{max_retries})"
-                logger.warning(f"⏰ {user_name}: {error_msg}")
+            except SitaNoDisponible as e:
+                logger.warning(f"🔌 {user_name}: {e}")
+                self._set_sync_status(user_id, False, str(e), completed=False)
+                return None
                 
-                if attempt < max_retries:
-                    logger.info(f"⏳ Esperando {retry_delay}s antes del siguiente intento...")
-                    self._wait_with_interruption(retry_delay)
+            except SitaCancelada:
+                # stop() mientras se esperaba al limitador: no es un error del usuario
+                logger.info(f"⏹️ {user_name}: sincronización interrumpida por la parada")
+                self._set_sync_status(user_id, False, None, completed=False)
+                return False
+                
+            except (requests.exceptions.Timeout, SitaError) as e:
+                # Timeouts y errores del servidor (5xx, 429) se reintentan; el resto de
+                # errores de SITA (credenciales, 4xx) no
+                if isinstance(e, SitaError) and not (e.status_code and (e.status_code >= 500 or e.status_code == 429)):
+                    logger.error(f"❌ {user_name}: {e}")
+                    self._set_sync_status(user_id, False, f"Error: {str(e)[:200]}")
+                    break
+                
+                if isinstance(e, requests.exceptions.ConnectTimeout):
+                    error_msg = "Timeout de conexión"
+                elif isinstance(e, requests.exceptions.Timeout):
+                    error_msg = "Timeout de lectura"
                 else:
-                    logger.error(f"❌ {user_name}: Máximo de reintentos alcanzado por timeout")
-                    self._set_sync_status(user_id, False, "Timeout después de 5 intentos")
-                    
-            except requests.exceptions.ConnectTimeout as e:
-                error_msg = f"Timeout de conexión (intento {attempt}/{max_retries})"
-                logger.warning(f"⏰ {user_name}: {error_msg}")
+                    error_msg = f"Error del servidor SITA ({e.status_code})"
+                logger.warning(f"⏰ {user_name}: {error_msg} (intento {attempt}/{max_retries})")
                 
                 if attempt < max_retries:
-                    logger.info(f"⏳ Esperando {retry_delay}s antes del siguiente intento...")
-                    self._wait_with_interruption(retry_delay)
+                    retry_delay = espera_exponencial(attempt - 1, AutoSyncConfig.RETRY_DELAY, AutoSyncConfig.RETRY_MAX_DELAY)
+                    logger.info(f"⏳ Esperando {retry_delay:.0f}s antes del siguiente intento...")
+                    if self._wait_with_interruption(retry_delay):
+                        self._set_sync_status(user_id, False, None, completed=False)
+                        return False
                 else:
-                    logger.error(f"❌ {user_name}: Máximo de reintentos alcanzado por timeout de conexión")
-                    self._set_sync_status(user_id, False, "Timeout de conexión después de 5 intentos")
+                    logger.error(f"❌ {user_name}: Máximo de reintentos alcanzado ({error_msg})")
+                    self._set_sync_status(user_id, False, f"{error_msg} después de {max_retries} intentos")
                     
             except requests.exceptions.ConnectionError as e:
                 logger.error(f"❌ {user_name}: Error de conexión: {e}")
@@ -229,8 +550,11 @@ class AutoSyncManager:
                 
         return False
         
-    def _set_sync_status(self, user_id: int, in_progress: bool, error_msg: Optional[str]):
-        """Actualiza el estado de sincronización del usuario"""
+    def _set_sync_status(self, user_id: int, in_progress: bool, error_msg: Optional[str], completed: bool = True):
+        """
+        Actualiza el estado de sincronización del usuario
+        (con completed=False se quita la marca de en curso sin dar por hecha la sincronización)
+        """
         try:
             if in_progress:
                 query = """
@@ -241,10 +565,10 @@ class AutoSyncManager:
                 """
                 execute_query(query, (user_id,), commit=True)
             else:
-                query = """
+                query = f"""
                     UPDATE empleados
                     SET sincronizacion_en_progreso = 0,
-                        ultima_sincronizacion = NOW(),
+                        {'ultima_sincronizacion = NOW(),' if completed else ''}
                         ultimo_error_sincronizacion = %s
                     WHERE id = %s
                 """
@@ -252,6 +576,12 @@ class AutoSyncManager:
                 
         except Exception as e:
             logger.error(f"❌ Error actualizando estado de sincronización: {e}")
+        
+        # Publicar el cambio de estado para los clientes conectados
+        if in_progress:
+            sync_eventos.publicar_seguro(user_id, 'auth')
+        else:
+            sync_eventos.publicar_seguro(user_id, 'error' if error_msg else 'done', error_msg)
 
 
 # Instancia global del gestor
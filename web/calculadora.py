@@ -1,9 +1,112 @@
 from datetime import datetime, date, timedelta
+from itertools import groupby
 import json
 from database import parse_turno_json
-from config import DIAS_FESTIVOS, TARIFAS
+from config import TARIFAS
+from festivos import calendario_festivos, CalendarioFestivos
+from nomina_cache import nomina_cache, hash_turnos
+from tabla_tarifas import obtener_tabla
 
-def calcular_nomina_desde_json(day_json, dias_festivos, start_date=None, end_date=None):
+def _como_conjunto(dias_festivos):
+    """Devuelve los días festivos como calendario o conjunto para búsquedas O(1)"""
+    if isinstance(dias_festivos, (CalendarioFestivos, set, frozenset)):
+        return dias_festivos
+    return frozenset(dias_festivos or ())
+
+def calcular_horas_pluses(inicio, fin, dias_festivos, tabla=None):
+    """
+    Calcula las horas de cada plus horario de un turno con la tabla precalculada
+    por hora de la semana (diferencia de acumulados) y la capa de festivos
+    
+    Args:
+        inicio: datetime de inicio del turno
+        fin: datetime de fin del turno
+        dias_festivos: Conjunto (o lista) de días festivos en formato YYYY-MM-DD
+        tabla: TablaTarifas a usar (por defecto la de las tarifas vigentes)
+    
+    Returns:
+        tuple: (horas por plus, días con horas por plus)
+    """
+    tabla = tabla or obtener_tabla()
+    return tabla.horas_pluses(inicio, fin, _como_conjunto(dias_festivos))
+
+def desglosar_turno(turno, idx, num_turnos, dias_festivos, tabla=None):
+    """
+    Calcula el desglose económico de un turno
+    
+    Args:
+        turno: Diccionario con las claves start y end en ISO 8601
+        idx: Posición del turno dentro del día (empezando en 1)
+        num_turnos: Número de turnos del día (más de uno es jornada partida)
+        dias_festivos: Conjunto (o lista) de días festivos
+        tabla: TablaTarifas con tarifas alternativas (opcional, p. ej. el simulador)
+    
+    Returns:
+        dict: Desglose del turno (horas, pluses, dietas y totales)
+    """
+    tabla = tabla or obtener_tabla()
+    tarifas = tabla.tarifas
+    inicio = datetime.fromisoformat(turno["start"].replace("Z", "+00:00"))
+    fin = datetime.fromisoformat(turno["end"].replace("Z", "+00:00"))
+    
+    # Calcular horas y sueldo base
+    total_horas = (fin - inicio).total_seconds() / 3600
+    sueldo_base = total_horas * tarifas["precio_hora"]
+    
+    # Horas por tipo de plus
+    contadores, dias_pluses = calcular_horas_pluses(inicio, fin, dias_festivos, tabla)
+    
+    # Calcular importes de pluses horarios
+    plus_importes = {
+        'madrugue': contadores['madrugue'] * tarifas["plus_madrugue"],
+        'nocturnidad': contadores['nocturnidad'] * tarifas["plus_nocturnidad"],
+        'festividad': contadores['festividad'] * tarifas["plus_festividad"],
+        'domingo': contadores['domingo'] * tarifas["plus_domingo"]
+    }
+    
+    # Pluses fijos
+    plus_fijos = {}
+    if idx == 1 and num_turnos > 1:
+        plus_fijos['jornada_partida'] = tarifas["plus_jornada_partida"]
+    if idx == 1:
+        plus_fijos['transporte'] = tarifas["plus_transporte"]
+    
+    # Dietas
+    dietas = {}
+    if inicio.hour <= 14 and fin.hour >= 16 and total_horas >= 6:
+        dietas['comida'] = tarifas["dieta_comida"]
+    if inicio.hour <= 21 and fin.hour >= 23 and total_horas >= 6:
+        dietas['cena'] = tarifas["dieta_cena"]
+    
+    # Total del turno
+    total_pluses = sum(plus_importes.values()) + sum(plus_fijos.values())
+    total_dietas = sum(dietas.values())
+    
+    return {
+        'idx': idx,
+        'inicio': inicio,
+        'fin': fin,
+        'total_horas': total_horas,
+        'sueldo_base': sueldo_base,
+        'contadores': contadores,
+        'dias_pluses': dias_pluses,
+        'plus_importes': plus_importes,
+        'plus_fijos': plus_fijos,
+        'dietas': dietas,
+        'total_pluses': total_pluses,
+        'total_dietas': total_dietas,
+        'total_turno': sueldo_base + total_pluses + total_dietas
+    }
+
+def desglosar_turnos(shifts, dias_festivos, tabla=None):
+    """Devuelve el desglose de cada turno de un día"""
+    festivos = _como_conjunto(dias_festivos)
+    return [
+        desglosar_turno(turno, idx, len(shifts), festivos, tabla)
+        for idx, turno in enumerate(shifts, start=1)
+    ]
+
+def calcular_nomina_desde_json(day_json, dias_festivos, start_date=None, end_date=None, tabla=None):
     """
     Calcula la nómina para un día específico, incluyendo todos los conceptos
     
@@ -12,21 +115,25 @@ def calcular_nomina_desde_json(day_json, dias_festivos, start_date=None, end_dat
         dias_festivos: Lista de días festivos
         start_date: Fecha de inicio del rango (opcional)
         end_date: Fecha fin del rango (opcional)
+        tabla: TablaTarifas con tarifas alternativas (opcional)
     
     Returns:
         tuple: (total del día, detalles por concepto)
     """
-    precio_medio_hora = TARIFAS["precio_hora"]
-    plus_madrugue = TARIFAS["plus_madrugue"]
-    plus_festividad = TARIFAS["plus_festividad"]
-    plus_domingo = TARIFAS["plus_domingo"]
-    plus_nocturnidad = TARIFAS["plus_nocturnidad"]
-    plus_jornada_partida = TARIFAS["plus_jornada_partida"]
-    plus_transporte = TARIFAS["plus_transporte"]
-    dieta_comida = TARIFAS["dieta_comida"]
-    dieta_cena = TARIFAS["dieta_cena"]
+    tabla = tabla or obtener_tabla()
+    tarifas = tabla.tarifas
+    precio_medio_hora = tarifas["precio_hora"]
+    plus_madrugue = tarifas["plus_madrugue"]
+    plus_festividad = tarifas["plus_festividad"]
+    plus_domingo = tarifas["plus_domingo"]
+    plus_nocturnidad = tarifas["plus_nocturnidad"]
+    plus_jornada_partida = tarifas["plus_jornada_partida"]
+    plus_transporte = tarifas["plus_transporte"]
+    dieta_comida = tarifas["dieta_comida"]
+    dieta_cena = tarifas["dieta_cena"]
 
     shifts = day_json[0].get("shifts", [])
+    festivos = _como_conjunto(dias_festivos)
     total_day = 0.0
     
     # Detalles para cada concepto de nómina
@@ -42,124 +149,115 @@ def calcular_nomina_desde_json(day_json, dias_festivos, start_date=None, end_dat
         "cena": {"nombre": "Dieta Cena", "total": 0, "unidades": 0, "tarifa": dieta_cena, "dias": []}
     }
     
+    # Conceptos por horas: clave del plus en el desglose -> código de nómina
+    conceptos_horarios = {
+        "madrugue": "SE126",
+        "nocturnidad": "SE106",
+        "festividad": "festividad",
+        "domingo": "SE023"
+    }
+    # Conceptos por unidades: clave en el desglose -> código de nómina
+    conceptos_fijos = {
+        "jornada_partida": "SE013",
+        "transporte": "SE055"
+    }
+    
+    # Convertir el rango una sola vez si se especifica
+    if start_date and end_date:
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+    
     for idx, turno in enumerate(shifts, start=1):
-        inicio = datetime.fromisoformat(turno["start"].replace("Z", "+00:00"))
-        fin = datetime.fromisoformat(turno["end"].replace("Z", "+00:00"))
+        desglose = desglosar_turno(turno, idx, len(shifts), festivos, tabla)
+        inicio = desglose["inicio"]
         
         # Registrar el día del turno
         fecha_turno = inicio.strftime("%Y-%m-%d")
         
         # Filtrar por rango de fechas si se especifican
         if start_date and end_date:
-            if isinstance(start_date, str):
-                start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-            if isinstance(end_date, str):
-                end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-                
             fecha_turno_dt = inicio.date()
             if fecha_turno_dt < start_date or fecha_turno_dt > end_date:
                 continue
-                
-        total_horas = (fin - inicio).total_seconds() / 3600
-        sueldo_base = total_horas * precio_medio_hora
         
         # Registrar sueldo base
-        detalles["SE001"]["total"] += sueldo_base
-        detalles["SE001"]["horas"] += total_horas
+        detalles["SE001"]["total"] += desglose["sueldo_base"]
+        detalles["SE001"]["horas"] += desglose["total_horas"]
         if fecha_turno not in detalles["SE001"]["dias"]:
             detalles["SE001"]["dias"].append(fecha_turno)
         
-        # Inicializar contadores de pluses
-        count_madrugue = 0
-        count_nocturnidad = 0
-        count_festividad = 0
-        count_domingo = 0
-        
-        # Calcular horas para cada plus
-        hora_iter = inicio
-        while hora_iter < fin:
-            current_date = hora_iter.strftime('%Y-%m-%d')
-            
-            # Verificar el día de la semana y si es festivo
-            if current_date in dias_festivos:
-                count_festividad += 1
-                if current_date not in detalles["festividad"]["dias"]:
-                    detalles["festividad"]["dias"].append(current_date)
-                    
-            if hora_iter.weekday() == 6:  # Domingo
-                count_domingo += 1
-                if current_date not in detalles["SE023"]["dias"]:
-                    detalles["SE023"]["dias"].append(current_date)
-            
-            # Lógica para plus de madrugue y nocturnidad
-            if 4 <= hora_iter.hour < 7:
-                count_madrugue += 1
-                if current_date not in detalles["SE126"]["dias"]:
-                    detalles["SE126"]["dias"].append(current_date)
-            elif hora_iter.hour >= 22 or hora_iter.hour < 4:
-                count_nocturnidad += 1
-                if current_date not in detalles["SE106"]["dias"]:
-                    detalles["SE106"]["dias"].append(current_date)
-                
-            hora_iter += timedelta(hours=1)
-        
-        # Calcular pluses por horas específicas
-        plus_madrugue_total = plus_madrugue * count_madrugue
-        detalles["SE126"]["total"] += plus_madrugue_total
-        detalles["SE126"]["horas"] += count_madrugue
-        
-        plus_nocturnidad_total = plus_nocturnidad * count_nocturnidad
-        detalles["SE106"]["total"] += plus_nocturnidad_total
-        detalles["SE106"]["horas"] += count_nocturnidad
-            
-        plus_festividad_total = plus_festividad * count_festividad
-        detalles["festividad"]["total"] += plus_festividad_total
-        detalles["festividad"]["horas"] += count_festividad
-        
-        plus_domingo_total = plus_domingo * count_domingo
-        detalles["SE023"]["total"] += plus_domingo_total
-        detalles["SE023"]["horas"] += count_domingo
+        # Pluses por horas específicas
+        for plus, concepto in conceptos_horarios.items():
+            detalles[concepto]["total"] += desglose["plus_importes"][plus]
+            detalles[concepto]["horas"] += desglose["contadores"][plus]
+            for dia in desglose["dias_pluses"][plus]:
+                if dia not in detalles[concepto]["dias"]:
+                    detalles[concepto]["dias"].append(dia)
         
-        # Calcular pluses fijos
-        plus_fijos = 0.0
-        if idx == 1 and len(shifts) > 1:
-            detalles["SE013"]["total"] += plus_jornada_partida
-            detalles["SE013"]["unidades"] += 1
-            if fecha_turno not in detalles["SE013"]["dias"]:
-                detalles["SE013"]["dias"].append(fecha_turno)
-            plus_fijos += plus_jornada_partida
-                
-        if idx == 1:
-            detalles["SE055"]["total"] += plus_transporte
-            detalles["SE055"]["unidades"] += 1
-            if fecha_turno not in detalles["SE055"]["dias"]:
-                detalles["SE055"]["dias"].append(fecha_turno)
-            plus_fijos += plus_transporte
+        # Pluses fijos
+        for plus, concepto in conceptos_fijos.items():
+            if plus in desglose["plus_fijos"]:
+                detalles[concepto]["total"] += desglose["plus_fijos"][plus]
+                detalles[concepto]["unidades"] += 1
+                if fecha_turno not in detalles[concepto]["dias"]:
+                    detalles[concepto]["dias"].append(fecha_turno)
         
-        # Calcular dietas
-        dietas = 0.0
-        if inicio.hour <= 14 and fin.hour >= 16 and total_horas >= 6:
-            detalles["comida"]["total"] += dieta_comida
-            detalles["comida"]["unidades"] += 1
-            if fecha_turno not in detalles["comida"]["dias"]:
-                detalles["comida"]["dias"].append(fecha_turno)
-            dietas += dieta_comida
-                
-        if inicio.hour <= 21 and fin.hour >= 23 and total_horas >= 6:
-            detalles["cena"]["total"] += dieta_cena
-            detalles["cena"]["unidades"] += 1
-            if fecha_turno not in detalles["cena"]["dias"]:
-                detalles["cena"]["dias"].append(fecha_turno)
-            dietas += dieta_cena
+        # Dietas
+        for dieta, importe in desglose["dietas"].items():
+            detalles[dieta]["total"] += importe
+            detalles[dieta]["unidades"] += 1
+            if fecha_turno not in detalles[dieta]["dias"]:
+                detalles[dieta]["dias"].append(fecha_turno)
         
         # Sumar total del turno
-        total_turno = sueldo_base + plus_madrugue_total + plus_nocturnidad_total + \
-                      plus_festividad_total + plus_domingo_total + plus_fijos + dietas
-        total_day += total_turno
+        total_day += desglose["total_turno"]
         
     return total_day, detalles
 
-def compute_salaries_for_days(rows, pluses_range_start=None, pluses_range_end=None):
+def _dia_str(dia_value):
+    """Día de una fila de turnos como 'YYYY-MM-DD'"""
+    if isinstance(dia_value, date):
+        return dia_value.strftime("%Y-%m-%d")
+    return str(dia_value)
+
+def _salario_dia(day_str, turnos_list, contenido, pluses_range_start, pluses_range_end, empleado_id):
+    """
+    Total y detalles de un día con sus turnos (con la caché de nómina)
+    
+    Returns:
+        tuple: (total del día, detalles por concepto)
+    """
+    # Verificar si este día está dentro del rango para pluses
+    incluir_pluses = True
+    if pluses_range_start and pluses_range_end:
+        day_date = datetime.strptime(day_str, "%Y-%m-%d").date()
+        incluir_pluses = pluses_range_start <= day_date <= pluses_range_end
+
+    # Resultado cacheado para este mismo contenido, o cálculo completo
+    clave = nomina_cache.clave_dia(empleado_id, day_str, hash_turnos(contenido), incluir_pluses)
+    cacheado = nomina_cache.obtener_dia(empleado_id, day_str, clave)
+    if cacheado is not None:
+        return cacheado
+
+    day_json = [{"shifts": turnos_list}]
+    day_total, day_detalles = calcular_nomina_desde_json(day_json, calendario_festivos())
+
+    if not incluir_pluses:
+        # Eliminar valores de pluses para días fuera del rango
+        for key in ["SE126", "SE106", "SE013", "SE023", "festividad", "SE055", "comida", "cena"]:
+            day_detalles[key]["total"] = 0
+            day_detalles[key]["horas"] = 0
+            day_detalles[key]["dias"] = []
+            if "unidades" in day_detalles[key]:
+                day_detalles[key]["unidades"] = 0
+        day_total = day_detalles["SE001"]["total"]  # Solo sueldo base
+
+    nomina_cache.guardar_dia(empleado_id, day_str, clave, (day_total, day_detalles))
+    return day_total, day_detalles
+
+def compute_salaries_for_days(rows, pluses_range_start=None, pluses_range_end=None, empleado_id=None):
     """
     Calcula los salarios para cada día, agrupando los turnos por día
     Con opción de especificar un rango para los pluses (del 16 al 15)
@@ -168,48 +266,30 @@ def compute_salaries_for_days(rows, pluses_range_start=None, pluses_range_end=No
         rows: Filas de turnos de la base de datos
         pluses_range_start: Fecha inicio para calcular pluses (opcional)
         pluses_range_end: Fecha fin para calcular pluses (opcional)
+        empleado_id: Empleado dueño de los turnos, para la caché de nómina (opcional)
     
     Returns:
         list: Lista de diccionarios con resultados por día
     """
     grouped = {}
+    contenido = {}
     for r in rows:
-        dia_value = r["dia"]
-        if isinstance(dia_value, date):
-            dia = dia_value.strftime("%Y-%m-%d")
-        else:
-            dia = str(dia_value)
-            
+        dia = _dia_str(r["dia"])
         shift_list = parse_turno_json(r["turno"])
             
         if dia not in grouped:
             grouped[dia] = []
+            contenido[dia] = []
         grouped[dia].extend(shift_list)
+        contenido[dia].append(r["turno"])
     
     # Calcular el salario para cada día
     results = []
     for day_str, turnos_list in grouped.items():
-        day_json = [{"shifts": turnos_list}]
-        day_total, day_detalles = calcular_nomina_desde_json(day_json, DIAS_FESTIVOS)
-        
-        # Verificar si este día está dentro del rango para pluses
-        incluir_pluses = True
-        if pluses_range_start and pluses_range_end:
-            day_date = datetime.strptime(day_str, "%Y-%m-%d").date()
-            if not (pluses_range_start <= day_date <= pluses_range_end):
-                # Eliminar valores de pluses para días fuera del rango
-                for key in ["SE126", "SE106", "SE013", "SE023", "festividad", "SE055", "comida", "cena"]:
-                    day_detalles[key]["total"] = 0
-                    day_detalles[key]["horas"] = 0
-                    day_detalles[key]["dias"] = []
-                    if "unidades" in day_detalles[key]:
-                        day_detalles[key]["unidades"] = 0
-                incluir_pluses = False
-        
-        # Recalcular el total si es necesario
-        if not incluir_pluses:
-            day_total = day_detalles["SE001"]["total"]  # Solo sueldo base
-            
+        day_total, day_detalles = _salario_dia(
+            day_str, turnos_list, contenido[day_str],
+            pluses_range_start, pluses_range_end, empleado_id
+        )
         results.append({
             "date": day_str,
             "shifts": turnos_list,
@@ -219,6 +299,72 @@ def compute_salaries_for_days(rows, pluses_range_start=None, pluses_range_end=No
     
     return results
 
+def iter_salaries_for_days(rows, pluses_range_start=None, pluses_range_end=None, empleado_id=None):
+    """
+    Versión en flujo de compute_salaries_for_days
+    
+    Las filas deben llegar ordenadas por día (p. ej. de stream_query con ORDER BY dia):
+    se agrupan las consecutivas del mismo día y se produce el resultado de cada día
+    sin guardar los anteriores.
+    
+    Yields:
+        dict: Resultado del día con el mismo formato que compute_salaries_for_days
+    """
+    for day_str, filas in groupby(rows, key=lambda r: _dia_str(r["dia"])):
+        turnos_list = []
+        contenido = []
+        for r in filas:
+            turnos_list.extend(parse_turno_json(r["turno"]))
+            contenido.append(r["turno"])
+
+        day_total, day_detalles = _salario_dia(
+            day_str, turnos_list, contenido,
+            pluses_range_start, pluses_range_end, empleado_id
+        )
+        yield {
+            "date": day_str,
+            "shifts": turnos_list,
+            "total": day_total,
+            "detalles": day_detalles
+        }
+
+class AcumuladorSalarios:
+    """
+    Totales acumulados de una secuencia de días (importe, días, turnos y total, horas
+    y unidades de cada concepto) sin guardar los días
+    """
+    
+    def __init__(self):
+        self.total = 0
+        self.dias = 0
+        self.turnos = 0
+        self.conceptos = {}
+    
+    def agregar(self, day_data):
+        """Suma un resultado diario a los totales"""
+        self.total += day_data["total"]
+        self.dias += 1
+        self.turnos += len(day_data["shifts"])
+        for concepto, detalles in day_data["detalles"].items():
+            acumulado = self.conceptos.setdefault(concepto, {"total": 0})
+            acumulado["total"] += detalles["total"]
+            for medida in ("horas", "unidades"):
+                if medida in detalles:
+                    acumulado[medida] = acumulado.get(medida, 0) + detalles[medida]
+    
+    def resumir(self, dias):
+        """
+        Recorre los resultados diarios sumándolos y produce un resumen ligero de cada
+        día (fecha, importe y número de turnos) para mostrarlo
+        """
+        for day_data in dias:
+            self.agregar(day_data)
+            yield {
+                "date": day_data["date"],
+                "total": day_data["total"],
+                "num_turnos": len(day_data["shifts"])
+            }
+
 def compute_salaries_for_period(start_date, end_date):
     """
     Calcula los salarios para un periodo de nómina especificado
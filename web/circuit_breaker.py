@@ -0,0 +1,131 @@
+"""
+Cortacircuitos para servicios externos (SITA)
+Si el servidor falla de forma continuada se deja de llamarle durante un tiempo creciente,
+en lugar de que cada usuario agote sus reintentos contra un servidor caído
+"""
+
+import random
+import threading
+import time
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+SEMIABIERTO = 'semiabierto'
+
+
+def espera_exponencial(intento, base, maximo):
+    """
+    Espera exponencial con desfase aleatorio (la mitad fija y la otra mitad al azar)
+    para que los clientes que fallan a la vez no reintenten todos a la vez
+
+    Args:
+        intento: Número de intento, empezando en 0
+        base: Espera del primer intento (en segundos)
+        maximo: Espera máxima (en segundos)
+    """
+    tope = min(maximo, base * (2 ** intento))
+    return tope / 2 + random.uniform(0, tope / 2)
+
+
+class CircuitBreaker:
+    """
+    Cortacircuitos seguro entre hilos
+
+    - cerrado: las peticiones pasan; tras 'umbral' fallos seguidos se abre
+    - abierto: las peticiones se rechazan sin llamar al servidor hasta que pasa la espera,
+      que se duplica (con desfase aleatorio) cada vez que se vuelve a abrir
+    - semiabierto: pasa una única petición de prueba; si va bien se cierra y si falla
+      se vuelve a abrir
+    """
+
+    def __init__(self, umbral=5, espera=30, espera_max=600, reloj=time.monotonic):
+        self.umbral = max(1, int(umbral))
+        self.espera = espera
+        self.espera_max = max(espera, espera_max)
+        self._reloj = reloj  # Reloj monótono en segundos (se sustituye en las pruebas)
+        self._lock = threading.Lock()
+        self._estado = CERRADO
+        self._fallos = 0
+        self._aperturas = 0
+        self._reabrir_en = 0.0
+        self._prueba_en_curso = False
+        self._stats = {
+            'rechazadas': 0,
+            'fallos': 0,
+            'aperturas': 0,
+            'ultima_apertura': None
+        }
+
+    def _estado_actual(self, ahora):
+        """Pasa de abierto a semiabierto al acabar la espera (requiere tener el lock)"""
+        if self._estado == ABIERTO and ahora >= self._reabrir_en:
+            self._estado = SEMIABIERTO
+            self._prueba_en_curso = False
+        return self._estado
+
+    def permitir(self):
+        """
+        Indica si se puede llamar al servidor; en semiabierto solo concede la petición
+        de prueba (quien la recibe debe registrar después el éxito o el fallo)
+        """
+        with self._lock:
+            estado = self._estado_actual(self._reloj())
+            if estado == CERRADO:
+                return True
+            if estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            self._stats['rechazadas'] += 1
+            return False
+
+    def disponible(self):
+        """Como permitir() pero sin consumir la petición de prueba ni contar rechazos"""
+        with self._lock:
+            estado = self._estado_actual(self._reloj())
+            return estado == CERRADO or (estado == SEMIABIERTO and not self._prueba_en_curso)
+
+    def registrar_exito(self):
+        """La petición ha llegado al servidor y este ha respondido con normalidad"""
+        with self._lock:
+            self._estado = CERRADO
+            self._fallos = 0
+            self._aperturas = 0
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        """La petición ha fallado por el servidor (timeout, conexión, 5xx...)"""
+        with self._lock:
+            ahora = self._reloj()
+            self._stats['fallos'] += 1
+            self._fallos += 1
+            estado = self._estado_actual(ahora)
+            if estado == SEMIABIERTO or (estado == CERRADO and self._fallos >= self.umbral):
+                self._estado = ABIERTO
+                self._reabrir_en = ahora + espera_exponencial(self._aperturas, self.espera, self.espera_max)
+                self._aperturas += 1
+                self._prueba_en_curso = False
+                self._stats['aperturas'] += 1
+                self._stats['ultima_apertura'] = time.time()
+
+    def cancelar(self):
+        """Libera la petición de prueba sin valorar el estado del servidor"""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def segundos_para_reintento(self):
+        """Segundos hasta que se pueda volver a intentar (0 si ya se puede)"""
+        with self._lock:
+            ahora = self._reloj()
+            if self._estado_actual(ahora) == ABIERTO:
+                return max(0.0, self._reabrir_en - ahora)
+            return 0.0
+
+    def get_stats(self):
+        """Estado y contadores del cortacircuitos"""
+        with self._lock:
+            ahora = self._reloj()
+            stats = dict(self._stats)
+            stats['estado'] = self._estado_actual(ahora)
+            stats['fallos_seguidos'] = self._fallos
+            stats['reintento_en_segundos'] = round(max(0.0, self._reabrir_en - ahora), 1) if stats['estado'] == ABIERTO else 0
+        return stats
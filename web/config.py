@@ -13,12 +13,10 @@ DB_NAME = os.getenv("DB_NAME")
 # Puerto de la aplicación
 APP_PORT = 5680
 
-# Definir días festivos
-DIAS_FESTIVOS = [
-    "2025-01-01", "2025-01-06", "2025-04-18", "2025-04-21", "2025-05-01",
-    "2025-06-09", "2025-06-24", "2025-08-15", "2025-09-11", "2025-09-29",
-    "2025-11-01", "2025-12-06", "2025-12-08", "2025-12-25", "2025-12-26"
-]
+# Días festivos (ver festivos.py): región, fuente ('archivo' o 'bd') y archivo JSON
+FESTIVOS_REGION = os.getenv("FESTIVOS_REGION", "el_prat")
+FESTIVOS_FUENTE = os.getenv("FESTIVOS_FUENTE", "archivo")
+FESTIVOS_ARCHIVO = os.getenv("FESTIVOS_ARCHIVO", "festivos.json")
 
 # Tarifas y pluses
 TARIFAS = {
@@ -1,37 +1,27 @@
 import pymysql
-from pymysql.cursors import DictCursor
+from pymysql.cursors import DictCursor, SSDictCursor
 from datetime import datetime, date, timedelta
 import json
 import time
 import os
 import threading
+from collections import deque
+from contextlib import contextmanager
+from pymysql.constants import SERVER_STATUS
 from dotenv import load_dotenv
+from perf_monitor import perf_monitor, CursorInstrumentado
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Variable local para almacenar conexiones por hilo
+# Códigos de error de MySQL que indican una conexión caída o inalcanzable
+CONNECTION_ERROR_CODES = (2002, 2003, 2006, 2013)
+
+# Variable local para recordar la conexión que tiene prestada cada hilo
 _thread_local = threading.local()
 
-def get_db_connection(max_retries=3, retry_delay=2):
-    """
-    Establece conexión con la base de datos con reintentos
-    Cada hilo tiene su propia conexión para evitar problemas de concurrencia
-    """
-    # Comprobar si ya existe una conexión para este hilo
-    if hasattr(_thread_local, 'connection'):
-        try:
-            # Verificar que la conexión sigue siendo válida
-            _thread_local.connection.ping(reconnect=True)
-            return _thread_local.connection
-        except:
-            # Si hay algún error, cerrar la conexión y crear una nueva
-            try:
-                _thread_local.connection.close()
-            except:
-                pass
-            
-    # Crear nueva conexión
+def _create_connection(max_retries=3, retry_delay=2):
+    """Abre una conexión nueva con la base de datos con reintentos"""
     for attempt in range(max_retries):
         try:
             conn = pymysql.connect(
@@ -46,17 +36,10 @@ def get_db_connection(max_retries=3, retry_delay=2):
                 autocommit=False,
                 charset='utf8mb4'
             )
-            # Probar la conexión con una consulta simple
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT 1")
-                cursor.fetchone()
-            
-            # Guardar la conexión en la variable local del hilo
-            _thread_local.connection = conn
             return conn
         except pymysql.OperationalError as e:
             error_code = e.args[0]
-            if error_code in (2002, 2003, 2006, 2013) and attempt < max_retries - 1:
+            if error_code in CONNECTION_ERROR_CODES and attempt < max_retries - 1:
                 print(f"Error de conexión a la base de datos (intento {attempt+1}/{max_retries}): {e}")
                 print(f"Reintentando en {retry_delay} segundos...")
                 time.sleep(retry_delay)
@@ -67,14 +50,340 @@ def get_db_connection(max_retries=3, retry_delay=2):
             print(f"Error inesperado al conectar a la base de datos: {e}")
             raise
 
+class PoolTimeoutError(Exception):
+    """No se pudo obtener una conexión del pool dentro del tiempo de espera"""
+    pass
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión prestada por el pool
+    close() devuelve la conexión al pool en lugar de cerrarla
+    
+    Cuando el mismo hilo la pide varias veces, solo quien la obtuvo primero (nivel 1)
+    confirma o deshace la transacción: un commit() anidado se aplaza hasta que la
+    devuelve ese primer titular (que lo confirma si no ha llamado antes a rollback())
+    y un rollback() anidado no hace nada, porque el error llega igualmente al titular.
+    """
+    
+    def __init__(self, pool, raw, exclusive=False):
+        self._pool = pool
+        self._raw = raw
+        self._exclusive = exclusive
+        self._depth = 1
+        self._released = False
+        self._commit_pendiente = False
+        self._ultimo_uso = time.monotonic()
+    
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+    
+    def cursor(self, *args, **kwargs):
+        """Cursor de la conexión, instrumentado si el monitor de rendimiento está activo"""
+        self._ultimo_uso = time.monotonic()
+        cursor = self._raw.cursor(*args, **kwargs)
+        if perf_monitor.enabled:
+            return CursorInstrumentado(cursor, perf_monitor)
+        return cursor
+    
+    def commit(self):
+        """Confirma la transacción (si es un préstamo anidado, al devolverla el titular)"""
+        if self._depth > 1:
+            self._commit_pendiente = True
+            return
+        self._commit_pendiente = False
+        self._raw.commit()
+    
+    def rollback(self):
+        """Deshace la transacción (solo el titular; en un préstamo anidado no hace nada)"""
+        if self._depth > 1:
+            return
+        self._commit_pendiente = False
+        self._raw.rollback()
+    
+    def en_transaccion(self):
+        """Indica si la conexión tiene una transacción abierta"""
+        return bool(self._raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+    
+    def close(self):
+        """Devuelve la conexión al pool (las llamadas anidadas del mismo hilo solo restan un nivel)"""
+        if self._released:
+            return
+        self._depth -= 1
+        if self._depth <= 0:
+            self._released = True
+            self._pool._release(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL acotado y con contadores
+    
+    - Tamaño máximo configurable y tiempo máximo de espera para obtener una conexión
+    - Las conexiones inactivas demasiado tiempo se cierran
+    - Solo se hace ping a las conexiones que llevan un rato sin usarse, también a la que
+      un hilo conserva prestada entre llamadas (si no tiene una transacción abierta)
+    - Un mismo hilo reutiliza la conexión que ya tiene prestada
+    - Las conexiones exclusivas (lecturas en flujo) están limitadas a max_streams: quien
+      recorre un flujo necesita otra conexión para sus consultas auxiliares, y si todas
+      estuvieran ocupadas por flujos esperando esa segunda conexión nadie avanzaría
+    """
+    
+    def __init__(self, max_size=10, checkout_timeout=30, idle_timeout=300, ping_after=30, max_streams=None):
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        # Cada flujo puede retener dos conexiones (la del flujo y la del hilo)
+        self.max_streams = max(1, min(max_streams or max_size // 2, max_size - 1))
+        self._streams = threading.BoundedSemaphore(self.max_streams)
+        self._streams_activos = 0
+        self._idle = deque()  # (conexión, instante de devolución)
+        self._size = 0
+        self._lock = threading.Condition(threading.Lock())
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'created': 0,
+            'reconnects': 0,
+            'evicted': 0,
+            'discarded': 0
+        }
+    
+    def get_connection(self, exclusive=False):
+        """
+        Presta una conexión del pool (o la que ya tiene el hilo actual)
+        
+        Con exclusive=True siempre se presta una conexión distinta que no se asocia al
+        hilo, para lecturas en flujo que conviven con otras consultas del mismo hilo
+        (como mucho max_streams a la vez)
+        """
+        current = getattr(_thread_local, 'connection', None)
+        if not exclusive and current is not None and not current._released:
+            if (time.monotonic() - current._ultimo_uso >= self.ping_after
+                    and not current.en_transaccion()):
+                try:
+                    current._raw = self._check_health(current._raw)
+                except Exception:
+                    # _check_health ya ha descontado la conexión del pool
+                    current._released = True
+                    _thread_local.connection = None
+                    raise
+                current._ultimo_uso = time.monotonic()
+            current._depth += 1
+            return current
+        
+        if exclusive:
+            self._reservar_stream()
+        try:
+            raw, idle_since = self._checkout()
+            if idle_since is not None and time.monotonic() - idle_since >= self.ping_after:
+                raw = self._check_health(raw)
+        except Exception:
+            if exclusive:
+                self._liberar_stream()
+            raise
+        
+        pooled = PooledConnection(self, raw, exclusive)
+        if not exclusive:
+            _thread_local.connection = pooled
+        perf_monitor.registrar_checkout()
+        return pooled
+    
+    def _reservar_stream(self):
+        """Ocupa un hueco de lectura en flujo o falla tras checkout_timeout"""
+        if not self._streams.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeoutError(
+                f"No hay hueco para más lecturas en flujo tras {self.checkout_timeout}s (máximo {self.max_streams})"
+            )
+        with self._lock:
+            self._streams_activos += 1
+    
+    def _liberar_stream(self):
+        with self._lock:
+            self._streams_activos -= 1
+        self._streams.release()
+    
+    def _checkout(self):
+        """Obtiene una conexión libre, crea una nueva si hay hueco o espera a que se libere"""
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        with self._lock:
+            self._stats['checkouts'] += 1
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    raw, idle_since = self._idle.pop()
+                    return raw, idle_since
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No hay conexiones libres tras {self.checkout_timeout}s (máximo {self.max_size})"
+                    )
+                if not waited:
+                    self._stats['waits'] += 1
+                    waited = True
+                self._lock.wait(remaining)
+        
+        # Abrir la conexión fuera del lock para no bloquear al resto de hilos
+        try:
+            raw = _create_connection()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._stats['created'] += 1
+        return raw, None
+    
+    def _check_health(self, raw):
+        """Verifica una conexión que llevaba tiempo inactiva y la sustituye si está caída"""
+        try:
+            raw.ping(reconnect=False)
+            return raw
+        except Exception:
+            try:
+                raw.close()
+            except Exception:
+                pass
+        try:
+            new_raw = _create_connection()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._stats['reconnects'] += 1
+        return new_raw
+    
+    def _evict_idle(self):
+        """Cierra las conexiones inactivas más antiguas (requiere tener el lock)"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] >= self.idle_timeout:
+            raw, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['evicted'] += 1
+            try:
+                raw.close()
+            except Exception:
+                pass
+    
+    def _release(self, pooled):
+        """Devuelve una conexión al pool, descartándola si ha quedado inservible"""
+        if getattr(_thread_local, 'connection', None) is pooled:
+            _thread_local.connection = None
+        
+        raw = pooled._raw
+        reusable = raw.open
+        if reusable and pooled._commit_pendiente and pooled.en_transaccion():
+            # Un préstamo anidado pidió commit y el titular no ha deshecho la transacción
+            try:
+                raw.commit()
+            except Exception as e:
+                print(f"Error al confirmar la transacción aplazada al devolver la conexión: {e}")
+                reusable = False
+        if reusable and pooled.en_transaccion():
+            # No dejar transacciones (ni snapshots de lectura) abiertas entre préstamos
+            try:
+                raw.rollback()
+            except Exception:
+                reusable = False
+        
+        with self._lock:
+            if reusable:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats['discarded'] += 1
+            self._lock.notify()
+        
+        if not reusable:
+            try:
+                raw.close()
+            except Exception:
+                pass
+        
+        if pooled._exclusive:
+            self._liberar_stream()
+    
+    def close_all(self):
+        """Cierra todas las conexiones inactivas del pool"""
+        with self._lock:
+            while self._idle:
+                raw, _ = self._idle.popleft()
+                self._size -= 1
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+            self._lock.notify_all()
+    
+    def get_stats(self):
+        """Devuelve los contadores del pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+            stats['streams'] = self._streams_activos
+            stats['max_streams'] = self.max_streams
+        return stats
+
+# Filas por lote de las lecturas en flujo (stream_query)
+STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", 500))
+
+# Pool global de la aplicación
+_pool = ConnectionPool(
+    max_size=int(os.getenv("DB_POOL_SIZE", 10)),
+    checkout_timeout=int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    idle_timeout=int(os.getenv("DB_POOL_IDLE_TIMEOUT", 300)),
+    ping_after=int(os.getenv("DB_POOL_PING_AFTER", 30)),
+    max_streams=int(os.getenv("DB_POOL_MAX_STREAMS", 0)) or None
+)
+
+def get_db_connection():
+    """
+    Obtiene una conexión del pool
+    Llamar a close() (o usarla con 'with') la devuelve al pool
+    """
+    return _pool.get_connection()
+
+@contextmanager
+def db_connection():
+    """Context manager que presta una conexión del pool y la devuelve al terminar"""
+    conn = _pool.get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
 def close_db_connection():
-    """Cierra la conexión a la base de datos para el hilo actual"""
-    if hasattr(_thread_local, 'connection'):
+    """Devuelve al pool la conexión que tenga prestada el hilo actual"""
+    conn = getattr(_thread_local, 'connection', None)
+    if conn is not None and not conn._released:
+        conn._depth = 1
         try:
-            _thread_local.connection.close()
-            delattr(_thread_local, 'connection')
+            conn.close()
         except:
             pass
+
+def get_pool_stats():
+    """Devuelve los contadores del pool de conexiones"""
+    return _pool.get_stats()
             
 # Decorador para manejo de errores en consultas a la base de datos
 def db_error_handler(max_retries=3, retry_delay=2):
@@ -86,7 +395,7 @@ def db_error_handler(max_retries=3, retry_delay=2):
                     return func(*args, **kwargs)
                 except pymysql.OperationalError as e:
                     error_code = e.args[0]
-                    if error_code in (2002, 2003, 2006, 2013) and attempt < max_retries - 1:
+                    if error_code in CONNECTION_ERROR_CODES and attempt < max_retries - 1:
                         print(f"Error de BD en {func.__name__} (intento {attempt+1}/{max_retries}): {e}")
                         print(f"Reintentando en {retry_delay} segundos...")
                         time.sleep(retry_delay)
@@ -101,29 +410,51 @@ def db_error_handler(max_retries=3, retry_delay=2):
 # Función segura para ejecutar consultas
 def execute_query(query, params=None, fetchone=False, commit=False):
     """Ejecuta una consulta de forma segura con manejo de errores y reconexión"""
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(query, params)
-            
-            if fetchone:
-                result = cursor.fetchone()
-            else:
-                result = cursor.fetchall()
-                
-            if commit:
-                conn.commit()
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
                 
-            return result
-    except Exception as e:
-        if conn:
+                if fetchone:
+                    result = cursor.fetchone()
+                else:
+                    result = cursor.fetchall()
+                    
+                if commit:
+                    conn.commit()
+                    
+                return result
+        except Exception as e:
             try:
                 conn.rollback()
             except:
                 pass
-        print(f"Error al ejecutar consulta: {e}")
-        raise
+            print(f"Error al ejecutar consulta: {e}")
+            raise
+
+def stream_query(query, params=None, batch_size=None):
+    """
+    Ejecuta una consulta de lectura con un cursor de servidor sin buffer y devuelve
+    las filas una a una, leyéndolas de la red por lotes
+    
+    La memoria no crece con el número de filas. Usa una conexión exclusiva del pool
+    (el hilo puede seguir haciendo otras consultas mientras se recorre) que se devuelve
+    al agotar el generador o al cerrarlo. Solo puede haber DB_POOL_MAX_STREAMS flujos a
+    la vez, para que siempre queden conexiones para esas otras consultas. Las filas deben consumirse sin pausas largas:
+    el servidor corta la conexión tras net_write_timeout sin leer.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    conn = _pool.get_connection(exclusive=True)
+    try:
+        with conn.cursor(SSDictCursor) as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+    finally:
+        conn.close()
 
 # Mantener el resto de funciones existentes pero actualizarlas para usar el nuevo sistema
 def get_turnos_by_month(year, month):
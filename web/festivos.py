@@ -0,0 +1,194 @@
+"""
+Calendario de días festivos por año y región
+
+Los festivos se cargan de la tabla festivos (FESTIVOS_FUENTE=bd) o del archivo
+festivos.json (por defecto), con todos los años disponibles para la región
+configurada (FESTIVOS_REGION). En la tabla, las filas con región '*' aplican a todas.
+
+En memoria se guardan como un mapa de bits por día (ordinal) con sumas acumuladas:
+- ¿Es festivo un día? -> un acceso al array
+- Segundos festivos en [inicio, fin) -> diferencia de dos acumulados, sin recorrer días
+
+El calendario tiene una versión (hash de las fechas) que forma parte de las claves de
+caché de nómina; recargar() lo vuelve a leer y descarta las tablas de tarifas.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import date, datetime
+from config import FESTIVOS_REGION, FESTIVOS_FUENTE, FESTIVOS_ARCHIVO
+
+# Día de referencia de los segundos locales (mismo que tabla_tarifas)
+_EPOCA = datetime(1970, 1, 5)
+_ORDINAL_EPOCA = _EPOCA.toordinal()
+
+
+def _a_fecha(valor):
+    """Convierte date/datetime/'YYYY-MM-DD...' en date"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+class CalendarioFestivos:
+    """Conjunto de festivos indexado por día"""
+
+    def __init__(self, fechas, region=None, fuente=None):
+        dias = sorted({_a_fecha(f) for f in fechas})
+        self.region = region
+        self.fuente = fuente
+        self.fechas = [d.isoformat() for d in dias]
+        self.anios = sorted({d.year for d in dias})
+        self.version = hashlib.sha1(
+            json.dumps([region, self.fechas]).encode("utf-8")
+        ).hexdigest()[:12]
+
+        # Mapa de bits desde el 1 de enero del primer año hasta el 31 de diciembre del último
+        if dias:
+            self._base = date(dias[0].year, 1, 1).toordinal()
+            longitud = date(dias[-1].year, 12, 31).toordinal() - self._base + 1
+        else:
+            self._base, longitud = 0, 0
+        self._bits = bytearray(longitud)
+        for d in dias:
+            self._bits[d.toordinal() - self._base] = 1
+        # _acumulado[i] = festivos en los días [0, i) del mapa
+        self._acumulado = [0] * (longitud + 1)
+        for i, bit in enumerate(self._bits):
+            self._acumulado[i + 1] = self._acumulado[i] + bit
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def es_ordinal(self, ordinal):
+        """Indica si el día con ese ordinal es festivo"""
+        i = ordinal - self._base
+        return 0 <= i < len(self._bits) and self._bits[i] == 1
+
+    def es_festivo(self, dia):
+        """Indica si un día (date, datetime o 'YYYY-MM-DD') es festivo"""
+        return self.es_ordinal(_a_fecha(dia).toordinal())
+
+    def __contains__(self, dia):
+        try:
+            return self.es_festivo(dia)
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self):
+        return iter(self.fechas)
+
+    def __len__(self):
+        return len(self.fechas)
+
+    def _festivos_antes(self, ordinal):
+        """Festivos en los días anteriores al ordinal"""
+        i = min(max(ordinal - self._base, 0), len(self._bits))
+        return self._acumulado[i]
+
+    def segundos_festivos(self, s0, s1):
+        """
+        Segundos festivos en [s0, s1), en segundos locales desde la época de tabla_tarifas
+
+        Días completos por diferencia de acumulados más los extremos de los días parciales.
+        """
+        if s1 <= s0:
+            return 0
+        d0, r0 = divmod(s0, 86400)
+        d1, r1 = divmod(s1, 86400)
+        o0, o1 = _ORDINAL_EPOCA + d0, _ORDINAL_EPOCA + d1
+        total = (self._festivos_antes(o1) - self._festivos_antes(o0)) * 86400
+        if self.es_ordinal(o0):
+            total -= r0
+        if self.es_ordinal(o1):
+            total += r1
+        return total
+
+    def horas_festivas(self, inicio, fin):
+        """Horas del intervalo [inicio, fin) que caen en días festivos (hora local)"""
+        s0 = int((inicio.replace(tzinfo=None) - _EPOCA).total_seconds())
+        s1 = int((fin.replace(tzinfo=None) - _EPOCA).total_seconds())
+        return self.segundos_festivos(s0, s1) / 3600
+
+    def por_anio(self, anio):
+        """Festivos de un año"""
+        return [f for f in self.fechas if f.startswith(f"{anio}-")]
+
+
+# ----------------------------------------------------------------------
+# Carga
+# ----------------------------------------------------------------------
+
+def ruta_archivo():
+    """Ruta del archivo de festivos (relativa al directorio web si no es absoluta)"""
+    if os.path.isabs(FESTIVOS_ARCHIVO):
+        return FESTIVOS_ARCHIVO
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), FESTIVOS_ARCHIVO)
+
+
+def cargar_desde_archivo(region=FESTIVOS_REGION):
+    """Festivos de la región en el archivo JSON ({region: {año: [fechas]}})"""
+    with open(ruta_archivo(), encoding="utf-8") as f:
+        datos = json.load(f)
+    fechas = []
+    for clave in ("*", region):
+        for lista in datos.get(clave, {}).values():
+            fechas.extend(lista)
+    return CalendarioFestivos(fechas, region, "archivo")
+
+
+def cargar_desde_bd(region=FESTIVOS_REGION):
+    """Festivos de la región (y los comunes '*') en la tabla festivos"""
+    from database import execute_query
+
+    rows = execute_query(
+        "SELECT fecha FROM festivos WHERE region IN (%s, '*') ORDER BY fecha",
+        (region,)
+    )
+    return CalendarioFestivos([row["fecha"] for row in rows], region, "bd")
+
+
+_calendario = None
+_lock = threading.Lock()
+
+
+def cargar(region=FESTIVOS_REGION, fuente=FESTIVOS_FUENTE):
+    """Carga el calendario de la fuente configurada (con el archivo como respaldo)"""
+    if fuente == "bd":
+        try:
+            calendario = cargar_desde_bd(region)
+            if len(calendario):
+                return calendario
+            print(f"La tabla festivos no tiene fechas para la región {region}, usando el archivo")
+        except Exception as e:
+            print(f"Error al cargar festivos de la base de datos, usando el archivo: {e}")
+    return cargar_desde_archivo(region)
+
+
+def calendario_festivos():
+    """Calendario de festivos vigente (se carga la primera vez que se pide)"""
+    global _calendario
+    calendario = _calendario
+    if calendario is None:
+        with _lock:
+            if _calendario is None:
+                _calendario = cargar()
+            calendario = _calendario
+    return calendario
+
+
+def recargar():
+    """Vuelve a leer los festivos y descarta las tablas de tarifas construidas"""
+    global _calendario
+    calendario = cargar()
+    with _lock:
+        _calendario = calendario
+
+    from tabla_tarifas import reconstruir
+    reconstruir()
+    return calendario
@@ -0,0 +1,200 @@
+"""
+Caché HTTP de las vistas de calendario, detalle de día y nómina
+
+Cada vista calcula un token de versión (ETag) antes de hacer ningún cálculo de nómina:
+- Última modificación y número de filas de turnos_empleado del empleado en el rango
+  (las sincronizaciones desactivan e insertan filas, así que ambos cambian)
+- Versión de tarifas y festivos
+- Usuario de la sesión, día actual y arranque del proceso (plantillas desplegadas)
+
+Si el navegador envía el mismo ETag en If-None-Match se responde 304 sin renderizar.
+Opcionalmente (VISTAS_CACHE_SIZE > 0) se guarda el HTML renderizado por ETag para
+servirlo a otros clientes; las escrituras de la sincronización lo invalidan.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from flask import request, session, make_response
+from database import execute_query
+from nomina_cache import version_tarifas
+
+# Cambia en cada arranque: un despliegue con plantillas nuevas invalida los ETag
+_ARRANQUE = str(int(time.time()))
+
+# Cabecera para que el navegador revalide siempre con el servidor
+CACHE_CONTROL = "private, no-cache"
+
+
+def _fecha_str(valor):
+    """Normaliza un día (date/datetime/str) a 'YYYY-MM-DD'"""
+    if isinstance(valor, date):
+        return valor.strftime("%Y-%m-%d")
+    return str(valor)[:10]
+
+
+def version_turnos(empleado_id, start_date, end_date):
+    """
+    Versión de los turnos guardados de un empleado en un rango
+
+    Returns:
+        str: 'max(fecha_actualizacion)|filas' (incluye las filas desactivadas)
+    """
+    result = execute_query(
+        """
+        SELECT MAX(fecha_actualizacion) AS ultima, COUNT(*) AS filas
+        FROM turnos_empleado
+        WHERE empleado_id = %s AND dia >= %s AND dia < %s + INTERVAL 1 DAY
+        """,
+        (empleado_id, _fecha_str(start_date), _fecha_str(end_date)),
+        fetchone=True
+    )
+    if not result:
+        return "0|0"
+    return f"{result['ultima']}|{result['filas']}"
+
+
+class VistasCache:
+    """LRU en memoria del HTML renderizado, indexado por ETag y por empleado"""
+
+    def __init__(self, max_size=0):
+        self.max_size = max_size
+        self._entradas = OrderedDict()  # {etag: (empleado_id, html)}
+        self._por_empleado = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'no_modificado': 0,
+            'aciertos': 0,
+            'fallos': 0,
+            'invalidaciones': 0
+        }
+
+    @property
+    def activa(self):
+        return self.max_size > 0
+
+    def obtener(self, etag):
+        """HTML guardado para un ETag o None"""
+        if not self.activa:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(etag)
+            if entrada is None:
+                self.stats['fallos'] += 1
+                return None
+            self._entradas.move_to_end(etag)
+            self.stats['aciertos'] += 1
+            return entrada[1]
+
+    def guardar(self, etag, empleado_id, html):
+        """Guarda el HTML de una vista"""
+        if not self.activa:
+            return
+        with self._lock:
+            self._entradas[etag] = (empleado_id, html)
+            self._entradas.move_to_end(etag)
+            self._por_empleado.setdefault(empleado_id, set()).add(etag)
+            while len(self._entradas) > self.max_size:
+                viejo, (emp_id, _) = self._entradas.popitem(last=False)
+                claves = self._por_empleado.get(emp_id)
+                if claves:
+                    claves.discard(viejo)
+                    if not claves:
+                        del self._por_empleado[emp_id]
+
+    def invalidar_empleado(self, empleado_id):
+        """Descarta todas las vistas guardadas de un empleado"""
+        with self._lock:
+            for etag in self._por_empleado.pop(empleado_id, ()):
+                self._entradas.pop(etag, None)
+            self.stats['invalidaciones'] += 1
+
+    def contar_no_modificado(self):
+        with self._lock:
+            self.stats['no_modificado'] += 1
+
+    def get_stats(self):
+        """Estadísticas de la caché"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entradas'] = len(self._entradas)
+        stats['max_size'] = self.max_size
+        return stats
+
+
+vistas_cache = VistasCache(
+    max_size=int(os.getenv('VISTAS_CACHE_SIZE', '0'))
+)
+
+
+def etag_vista(nombre, empleado_id, start_date, end_date, *extra):
+    """
+    Token de versión de una vista
+
+    Args:
+        nombre: Nombre de la vista
+        empleado_id: Empleado cuyos turnos se muestran
+        start_date, end_date: Rango de días que usa la vista
+        *extra: Parámetros adicionales que cambian el resultado
+
+    Returns:
+        str o None: ETag, o None si la respuesta no debe cachearse
+    """
+    from flask_login import current_user
+
+    # Con mensajes flash pendientes la página no es reutilizable
+    if session.get('_flashes'):
+        return None
+
+    try:
+        version = version_turnos(empleado_id, start_date, end_date)
+    except Exception as e:
+        print(f"Error al calcular la versión de la vista {nombre}: {e}")
+        return None
+
+    partes = [
+        nombre, empleado_id, version, version_tarifas(), _ARRANQUE,
+        date.today().isoformat(),
+        current_user.id, current_user.nombre_completo, current_user.numero_empleado,
+        current_user.es_admin, current_user.es_demo
+    ] + list(extra)
+    datos = "|".join(str(p) for p in partes)
+    return hashlib.sha1(datos.encode("utf-8")).hexdigest()
+
+
+def respuesta_cacheada(etag):
+    """
+    Respuesta para una vista ya conocida
+
+    Returns:
+        Response o None: 304 si el cliente tiene la versión actual, la página
+        guardada si está en la caché de vistas, o None si hay que renderizar
+    """
+    if etag is None:
+        return None
+
+    if etag in request.if_none_match:
+        vistas_cache.contar_no_modificado()
+        respuesta = make_response("", 304)
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = CACHE_CONTROL
+        return respuesta
+
+    html = vistas_cache.obtener(etag)
+    if html is not None:
+        return responder(etag, None, html)
+    return None
+
+
+def responder(etag, empleado_id, html):
+    """Construye la respuesta de una vista con su ETag (y la guarda si procede)"""
+    respuesta = make_response(html)
+    if etag is not None:
+        if empleado_id is not None:
+            vistas_cache.guardar(etag, empleado_id, html)
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = CACHE_CONTROL
+    return respuesta
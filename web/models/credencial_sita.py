@@ -2,23 +2,97 @@ from database import get_db_connection, execute_query
 from cryptography.fernet import Fernet
 import os
 import base64
+import threading
+import time
 import requests
 import logging
+from sita_client import sita_client, SitaAuthError
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("CredencialSita")
 
+# Caché de credenciales desencriptadas: {empleado_id: (expira, credenciales)}
+CREDENCIALES_CACHE_TTL = float(os.getenv('CREDENCIALES_CACHE_TTL', '900'))
+_credenciales_cache = {}
+_credenciales_lock = threading.Lock()
+
+# Cifrador compartido para la clave vigente: (clave, Fernet)
+_cifrador_actual = (None, None)
+
+COLUMNAS = """
+    id, empleado_id, sita_username, sita_password_encrypted,
+    site_id, cvation_tenantid, roster_url, fecha_actualizacion
+"""
+
+def _cifrador():
+    """Instancia de Fernet para ENCRYPTION_KEY (se crea una vez por clave) o None"""
+    global _cifrador_actual
+    encryption_key = os.getenv('ENCRYPTION_KEY')
+    if not encryption_key:
+        return None
+    clave, cipher_suite = _cifrador_actual
+    if clave != encryption_key:
+        cipher_suite = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+        _cifrador_actual = (encryption_key, cipher_suite)
+    return cipher_suite
+
 class CredencialSita:
     """Clase para manejar las credenciales de SITA de los usuarios"""
     
+    @staticmethod
+    def desencriptar(encrypted_password):
+        """Desencripta una contraseña guardada (None si no hay clave o no se puede)"""
+        cipher_suite = _cifrador()
+        if not cipher_suite or not encrypted_password:
+            return None
+        try:
+            if isinstance(encrypted_password, str):
+                encrypted_password = encrypted_password.encode()
+            return cipher_suite.decrypt(encrypted_password).decode()
+        except Exception as e:
+            logger.error(f"Error al desencriptar: {e}")
+            return None
+    
+    @staticmethod
+    def _desde_fila(result, id_columna='id'):
+        """Diccionario de credenciales (con la contraseña desencriptada) a partir de una fila"""
+        return {
+            'id': result[id_columna],
+            'empleado_id': result['empleado_id'],
+            'sita_username': result['sita_username'],
+            'sita_password': CredencialSita.desencriptar(result['sita_password_encrypted']),
+            'sita_password_encrypted': result['sita_password_encrypted'],
+            'site_id': result['site_id'],
+            'cvation_tenantid': result['cvation_tenantid'],
+            'roster_url': result['roster_url'],
+            'fecha_actualizacion': result['fecha_actualizacion']
+        }
+    
+    @staticmethod
+    def _cachear(credenciales):
+        if CREDENCIALES_CACHE_TTL > 0:
+            with _credenciales_lock:
+                _credenciales_cache[credenciales['empleado_id']] = (
+                    time.monotonic() + CREDENCIALES_CACHE_TTL, credenciales
+                )
+    
     @staticmethod
     def obtener_por_empleado(empleado_id):
-        """Obtiene las credenciales de SITA de un empleado por su ID"""
+        """
+        Obtiene las credenciales de SITA de un empleado por su ID
+        
+        Se sirven de la caché de credenciales desencriptadas mientras no caduquen;
+        cada llamada devuelve un diccionario nuevo.
+        """
+        with _credenciales_lock:
+            entrada = _credenciales_cache.get(empleado_id)
+        if entrada and entrada[0] > time.monotonic():
+            return dict(entrada[1])
+        
         try:
-            query = """
-                SELECT id, empleado_id, sita_username, sita_password_encrypted,
-                       site_id, cvation_tenantid, roster_url, fecha_actualizacion
+            query = f"""
+                SELECT {COLUMNAS}
                 FROM credenciales_sita
                 WHERE empleado_id = %s
             """
@@ -26,40 +100,40 @@ class CredencialSita:
             result = execute_query(query, (empleado_id,), fetchone=True)
             
             if result:
-                # Desencriptar contraseña
-                encryption_key = os.getenv('ENCRYPTION_KEY')
-                if encryption_key and result['sita_password_encrypted']:
-                    try:
-                        cipher_suite = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
-                        encrypted_password = result['sita_password_encrypted']
-                        
-                        if isinstance(encrypted_password, str):
-                            encrypted_password = encrypted_password.encode()
-                        
-                        sita_password = cipher_suite.decrypt(encrypted_password).decode()
-                    except Exception as e:
-                        logger.error(f"Error al desencriptar: {e}")
-                        sita_password = None
-                else:
-                    sita_password = None
-                
-                # Devolver diccionario con credenciales
-                return {
-                    'id': result['id'],
-                    'empleado_id': result['empleado_id'],
-                    'sita_username': result['sita_username'],
-                    'sita_password': sita_password,
-                    'sita_password_encrypted': result['sita_password_encrypted'],
-                    'site_id': result['site_id'],
-                    'cvation_tenantid': result['cvation_tenantid'],
-                    'roster_url': result['roster_url'],
-                    'fecha_actualizacion': result['fecha_actualizacion']
-                }
+                credenciales = CredencialSita._desde_fila(result)
+                CredencialSita._cachear(credenciales)
+                return dict(credenciales)
         except Exception as e:
             logger.error(f"Error al obtener credenciales SITA: {e}")
         
         return None
     
+    @staticmethod
+    def precargar(filas, id_columna='id'):
+        """
+        Desencripta y guarda en la caché las credenciales de varias filas ya leídas
+        (p. ej. las de todo un ciclo de sincronización, obtenidas en una sola consulta)
+        
+        Args:
+            filas: Filas con las columnas de credenciales_sita
+            id_columna: Columna con el id de la credencial en las filas
+        
+        Returns:
+            int: Credenciales cargadas
+        """
+        for fila in filas:
+            CredencialSita._cachear(CredencialSita._desde_fila(fila, id_columna))
+        return len(filas)
+    
+    @staticmethod
+    def invalidar_cache(empleado_id=None):
+        """Elimina las credenciales de un empleado (o todas) de la caché"""
+        with _credenciales_lock:
+            if empleado_id is None:
+                _credenciales_cache.clear()
+            else:
+                _credenciales_cache.pop(empleado_id, None)
+    
     @staticmethod
     def guardar(empleado_id, sita_username, sita_password, site_id, cvation_tenantid, roster_url, validar=False):
         """
@@ -86,15 +160,12 @@ class CredencialSita:
                 if not success:
                     return False, message
             
-            # Obtener o generar clave de encriptación
-            encryption_key = os.getenv('ENCRYPTION_KEY')
-            if not encryption_key:
-                encryption_key = Fernet.generate_key().decode()
+            # Cifrador compartido, o uno con una clave nueva si no hay ENCRYPTION_KEY
+            cipher_suite = _cifrador()
+            if not cipher_suite:
+                cipher_suite = Fernet(Fernet.generate_key())
                 logger.warning(f"ENCRYPTION_KEY no encontrada. Se ha generado una nueva.")
             
-            # Crear cifrador
-            cipher_suite = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
-            
             # Encriptar contraseña
             encrypted_password = cipher_suite.encrypt(sita_password.encode()).decode()
             
@@ -126,6 +197,9 @@ class CredencialSita:
                 execute_query(query, (empleado_id, sita_username, encrypted_password,
                                     site_id, cvation_tenantid, roster_url), commit=True)
             
+            CredencialSita.invalidar_cache(empleado_id)
+            # El token anterior corresponde a las credenciales antiguas
+            sita_client.invalidar_token(empleado_id)
             return True, "Credenciales guardadas correctamente"
         except Exception as e:
             logger.error(f"Error al guardar credenciales: {e}")
@@ -152,47 +226,20 @@ class CredencialSita:
             if not all([sita_username, sita_password, site_id, cvation_tenantid, roster_url]):
                 return False, "Todos los campos son obligatorios"
             
-            # Cabeceras para la solicitud
-            headers = {
-                "accept": "application/json",
-                "accept-language": "es-ES,es;q=0.9",
-                "authorization": "Bearer",
-                "content-type": "application/json",
-                "cvation_tenantid": cvation_tenantid,
-                "origin": "https://sitaess-prod-frontdoor.azurefd.net",
-                "referer": "https://sitaess-prod-frontdoor.azurefd.net/",
-                "sec-ch-ua": '"Chromium";v="116", "Not:A-Brand";v="24"',
-                "sec-ch-ua-mobile": "?0",
-                "sec-ch-ua-platform": '"Windows"',
-                "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            }
-
-            # Datos de autenticación
-            payload = {
-                "username": sita_username,
-                "password": sita_password,
-                "siteId": site_id
-            }
-
-            # URL de autenticación
-            auth_url = "https://sitaess-prod-frontdoor.azurefd.net/api/v1/auth/signin"
-            
             logger.info(f"Intentando validar credenciales para usuario: {sita_username}")
             
             try:
-                # Realizar solicitud de autenticación con timeout ampliado
-                response = requests.post(auth_url, headers=headers, json=payload, timeout=timeout)
-                
-                # Verificar si la autenticación fue exitosa
-                if response.status_code == 200:
-                    data = response.json()
-                    if "sessionToken" in data:
-                        logger.info(f"Credenciales validadas correctamente para usuario: {sita_username}")
-                        return True, "Credenciales válidas"
-                
-                # Si llegamos aquí, hubo un error
-                logger.warning(f"Error de autenticación: {response.status_code} - {response.text}")
-                return False, f"Error de autenticación: {response.status_code} - {response.text}"
+                # Autenticarse con el cliente compartido (sin empleado: no usa ni guarda tokens en caché)
+                sita_client.iniciar_sesion(
+                    sita_username, sita_password, site_id, cvation_tenantid,
+                    timeout=timeout
+                )
+                logger.info(f"Credenciales validadas correctamente para usuario: {sita_username}")
+                return True, "Credenciales válidas"
+            
+            except SitaAuthError as e:
+                logger.warning(str(e))
+                return False, str(e)
             
             except requests.exceptions.ConnectTimeout:
                 logger.warning(f"Timeout al conectar con SITA")
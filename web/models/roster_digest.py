@@ -0,0 +1,70 @@
+from database import execute_query
+import hashlib
+import json
+
+
+def _sha1(texto):
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class RosterDigest:
+    """
+    Huellas de contenido de los turnos sincronizados
+
+    - turnos_empleado.contenido_hash: hash del JSON canónico de turnos y ausencias de
+      cada día, calculado una vez al escribir la fila
+    - turnos_digest: huella de toda la respuesta de SITA de la última sincronización
+      guardada de cada empleado; si la siguiente respuesta coincide no hay nada que hacer
+    """
+
+    @staticmethod
+    def hash_dia(shifts_str, absences_str):
+        """Hash del contenido de un día a partir de sus JSON canónicos (o None)"""
+        return _sha1(f"{shifts_str or ''}\n{absences_str or ''}")
+
+    @staticmethod
+    def canonico(turno, ausencias):
+        """
+        JSON canónico de una fila guardada (MySQL reordena las claves del tipo JSON)
+
+        Returns:
+            tuple: (JSON de turnos o None, JSON de ausencias o None)
+        """
+        shifts_str = json.dumps(json.loads(turno), ensure_ascii=False, sort_keys=True) if turno else None
+        absences_str = json.dumps(json.loads(ausencias), ensure_ascii=False, sort_keys=True) if ausencias else None
+        return shifts_str, absences_str
+
+    @staticmethod
+    def hash_fila(row):
+        """Hash de una fila de turnos_empleado (el guardado o, en filas antiguas, recalculado)"""
+        if row.get("contenido_hash"):
+            return row["contenido_hash"]
+        return RosterDigest.hash_dia(*RosterDigest.canonico(row["turno"], row["ausencias"]))
+
+    @staticmethod
+    def digest(hashes_por_dia):
+        """Huella de una respuesta completa a partir de {dia: hash del día}"""
+        return _sha1("\n".join(f"{dia}|{hashes_por_dia[dia]}" for dia in sorted(hashes_por_dia)))
+
+    @staticmethod
+    def obtener(empleado_id):
+        """Huella de la última sincronización guardada del empleado o None"""
+        result = execute_query(
+            "SELECT digest FROM turnos_digest WHERE empleado_id = %s",
+            (empleado_id,),
+            fetchone=True
+        )
+        return result["digest"] if result else None
+
+    @staticmethod
+    def guardar(cursor, empleado_id, digest, dia_desde, dia_hasta):
+        """Guarda la huella dentro de la transacción del escritor (no hace commit)"""
+        cursor.execute(
+            """
+            INSERT INTO turnos_digest (empleado_id, digest, dia_desde, dia_hasta)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE digest = VALUES(digest), dia_desde = VALUES(dia_desde),
+                dia_hasta = VALUES(dia_hasta)
+            """,
+            (empleado_id, digest, dia_desde, dia_hasta)
+        )
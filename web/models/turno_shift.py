@@ -0,0 +1,164 @@
+from database import execute_query, parse_turno_json
+from datetime import datetime, date, timezone
+import json
+
+
+def _a_utc(valor):
+    """Convierte 'YYYY-MM-DDTHH:MM:SSZ' en datetime UTC sin zona (como se guarda en MySQL)"""
+    if not valor:
+        return None
+    momento = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    if momento.tzinfo:
+        momento = momento.astimezone(timezone.utc)
+    return momento.replace(tzinfo=None)
+
+
+class TurnoShift:
+    """
+    Tabla normalizada turno_shift: una fila por turno (inicio, fin, rol, área)
+    mantenida por el escritor de la sincronización junto a turnos_empleado.turno
+
+    Solo guarda la versión vigente de cada día: el historial queda en turnos_empleado.
+    Índices: (empleado_id, dia) para rangos, (empleado_id, inicio) para el próximo
+    turno y (inicio, fin) para saber quién trabaja en un instante.
+    """
+
+    COLUMNAS = "empleado_id, dia, inicio, fin, role_code, working_area"
+
+    @staticmethod
+    def filas_desde_turno(empleado_id, dia, turno):
+        """
+        Genera las filas de turno_shift de un día a partir del JSON de turnos
+
+        Args:
+            empleado_id: ID del empleado
+            dia: Día del turno (date, datetime o 'YYYY-MM-DD...')
+            turno: JSON de turnos (cadena o lista ya decodificada)
+
+        Returns:
+            list: Tuplas (empleado_id, dia, inicio, fin, role_code, working_area)
+        """
+        if isinstance(dia, date):
+            dia = dia.strftime("%Y-%m-%d")
+        else:
+            dia = str(dia)[:10]
+
+        shifts = turno if isinstance(turno, list) else parse_turno_json(turno)
+        filas = []
+        for shift in shifts:
+            inicio = _a_utc(shift.get("start"))
+            fin = _a_utc(shift.get("end"))
+            if not inicio or not fin:
+                continue
+            filas.append((
+                empleado_id, dia, inicio, fin,
+                shift.get("roleCode"), shift.get("workingArea")
+            ))
+        return filas
+
+    @staticmethod
+    def reemplazar_dias(cursor, empleado_id, dias_turnos):
+        """
+        Reemplaza los turnos normalizados de los días indicados dentro de la
+        transacción del escritor (no hace commit)
+
+        Args:
+            cursor: Cursor de la transacción en curso
+            empleado_id: ID del empleado
+            dias_turnos: Lista de (dia, JSON de turnos o None)
+        """
+        if not dias_turnos:
+            return
+
+        dias = sorted({str(dia)[:10] for dia, _ in dias_turnos})
+        placeholders = ", ".join(["%s"] * len(dias))
+        cursor.execute(
+            f"DELETE FROM turno_shift WHERE empleado_id = %s AND dia IN ({placeholders})",
+            [empleado_id] + dias
+        )
+
+        filas = []
+        for dia, turno in dias_turnos:
+            if turno:
+                filas.extend(TurnoShift.filas_desde_turno(empleado_id, dia, turno))
+        if filas:
+            cursor.executemany(
+                f"""
+                INSERT INTO turno_shift ({TurnoShift.COLUMNAS})
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                filas
+            )
+
+    @staticmethod
+    def obtener_por_rango(empleado_id, start_date, end_date):
+        """Turnos de un empleado cuyo día está en el rango, ordenados por inicio"""
+        query = f"""
+            SELECT id, {TurnoShift.COLUMNAS}
+            FROM turno_shift
+            WHERE empleado_id = %s AND dia >= %s AND dia <= %s
+            ORDER BY inicio
+        """
+        return execute_query(query, (empleado_id, start_date, end_date))
+
+    @staticmethod
+    def shifts_por_dia(empleado_id, start_date, end_date):
+        """
+        Turnos del rango agrupados por día con el formato de SITA ('start', 'end',
+        'roleCode', 'workingArea'), listos para la calculadora sin decodificar JSON
+
+        Returns:
+            dict: {date: [shift, ...]} con los turnos de cada día ordenados por inicio
+        """
+        por_dia = {}
+        for row in TurnoShift.obtener_por_rango(empleado_id, start_date, end_date):
+            shift = {
+                "start": row["inicio"].strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "end": row["fin"].strftime("%Y-%m-%dT%H:%M:%SZ")
+            }
+            if row["role_code"]:
+                shift["roleCode"] = row["role_code"]
+            if row["working_area"]:
+                shift["workingArea"] = row["working_area"]
+            por_dia.setdefault(row["dia"], []).append(shift)
+        return por_dia
+
+    @staticmethod
+    def obtener_como_turnos(empleado_id, start_date, end_date):
+        """
+        Turnos del rango con el mismo formato que las filas de turnos_empleado
+        ({'dia', 'turno'}), para los lectores que esperan el JSON
+        """
+        return [
+            {"dia": dia, "turno": json.dumps(shifts)}
+            for dia, shifts in sorted(TurnoShift.shifts_por_dia(empleado_id, start_date, end_date).items())
+        ]
+
+    @staticmethod
+    def horas_por_dia(empleado_id, start_date, end_date):
+        """Horas trabajadas por día calculadas en MySQL"""
+        query = """
+            SELECT dia, SUM(TIMESTAMPDIFF(SECOND, inicio, fin)) / 3600 AS horas, COUNT(*) AS turnos
+            FROM turno_shift
+            WHERE empleado_id = %s AND dia >= %s AND dia <= %s
+            GROUP BY dia
+            ORDER BY dia
+        """
+        return execute_query(query, (empleado_id, start_date, end_date))
+
+    @staticmethod
+    def trabajando_en(momento, working_area=None):
+        """Empleados con un turno en curso en el instante indicado (UTC)"""
+        query = """
+            SELECT ts.empleado_id, e.numero_empleado, e.nombre_completo,
+                   ts.inicio, ts.fin, ts.role_code, ts.working_area
+            FROM turno_shift ts
+            JOIN empleados e ON e.id = ts.empleado_id
+            WHERE ts.inicio <= %s AND ts.fin > %s
+        """
+        params = [momento, momento]
+        if working_area:
+            query += " AND ts.working_area = %s"
+            params.append(working_area)
+        query += " ORDER BY ts.inicio"
+        return execute_query(query, params)
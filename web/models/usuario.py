@@ -1,7 +1,16 @@
 from flask_login import UserMixin
 import bcrypt
+import os
+import threading
+import time
 from datetime import datetime
-from database import execute_query, get_db_connection, db_error_handler
+from database import execute_query, get_db_connection, db_connection, db_error_handler
+from ultimo_acceso_buffer import ultimo_acceso_buffer
+
+# Caché de identidad para el user_loader: {user_id: (expira, fila)}
+SESION_CACHE_TTL = float(os.getenv('USUARIO_CACHE_TTL', '60'))
+_sesion_cache = {}
+_sesion_lock = threading.Lock()
 
 class Usuario(UserMixin):
     """Clase para representar un usuario del sistema"""
@@ -70,6 +79,51 @@ class Usuario(UserMixin):
             )
         return None
     
+    @staticmethod
+    def cargar_sesion(user_id):
+        """
+        Recupera el usuario de la sesión (user_loader de Flask-Login)
+
+        Solo lee las columnas que usa la sesión (sin password_hash) y guarda la
+        fila en una caché con TTL corto. Cada llamada devuelve un objeto nuevo.
+        """
+        ahora = time.monotonic()
+        with _sesion_lock:
+            entrada = _sesion_cache.get(user_id)
+        if entrada and entrada[0] > ahora:
+            return Usuario(**entrada[1])
+
+        result = Usuario._leer_sesion(user_id)
+        if not result:
+            Usuario.invalidar_cache(user_id)
+            return None
+
+        if SESION_CACHE_TTL > 0:
+            with _sesion_lock:
+                _sesion_cache[user_id] = (ahora + SESION_CACHE_TTL, result)
+        return Usuario(**result)
+
+    @staticmethod
+    @db_error_handler()
+    def _leer_sesion(user_id):
+        """Columnas del usuario necesarias para la sesión"""
+        query = """
+            SELECT id, numero_empleado, nombre_completo, email,
+                   activo, es_admin, es_demo, vinculado_a_empleado_id
+            FROM empleados
+            WHERE id = %s
+        """
+        return execute_query(query, (user_id,), fetchone=True)
+
+    @staticmethod
+    def invalidar_cache(user_id=None):
+        """Elimina un usuario (o todos) de la caché de sesión"""
+        with _sesion_lock:
+            if user_id is None:
+                _sesion_cache.clear()
+            else:
+                _sesion_cache.pop(user_id, None)
+
     @staticmethod
     @db_error_handler()
     def obtener_por_numero_empleado(numero_empleado):
@@ -112,28 +166,36 @@ class Usuario(UserMixin):
                                  password_hash, es_admin, es_demo, vinculado_a_empleado_id)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
         """
-        execute_query(query, (numero_empleado, nombre_completo, email, password_hash,
-                             es_admin, es_demo, vinculado_a_empleado_id), commit=True)
+        # Insertar y leer el ID en la misma conexión del pool
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (numero_empleado, nombre_completo, email, password_hash,
+                                       es_admin, es_demo, vinculado_a_empleado_id))
+                conn.commit()
 
-        # Obtener el ID del usuario recién creado
-        query = "SELECT LAST_INSERT_ID() as id"
-        result = execute_query(query, fetchone=True)
-        return result['id'] if result else None
+                # Obtener el ID del usuario recién creado
+                return cursor.lastrowid
     
     def verificar_password(self, password):
         """Verifica si la contraseña proporcionada coincide con el hash almacenado"""
+        if self.password_hash is None:
+            # Usuario cargado desde la caché de sesión: leer el hash bajo demanda
+            result = execute_query(
+                "SELECT password_hash FROM empleados WHERE id = %s", (self.id,), fetchone=True
+            )
+            if not result:
+                return False
+            self.password_hash = result['password_hash']
         return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
     
     @db_error_handler()
     def actualizar_ultimo_acceso(self):
-        """Actualiza la marca de tiempo del último acceso"""
-        query = """
-            UPDATE empleados 
-            SET ultimo_acceso = CURRENT_TIMESTAMP
-            WHERE id = %s
         """
-        execute_query(query, (self.id,), commit=True)
+        Actualiza la marca de tiempo del último acceso
+        Se anota en el buffer de escritura diferida, que la vuelca por lotes
+        """
         self.ultimo_acceso = datetime.now()
+        ultimo_acceso_buffer.registrar(self.id, self.ultimo_acceso)
         
     @staticmethod
     @db_error_handler()
@@ -160,6 +222,7 @@ class Usuario(UserMixin):
         """
         execute_query(query, (1 if activo else 0, self.id), commit=True)
         self.activo = activo
+        Usuario.invalidar_cache(self.id)
         return True
         
     @staticmethod
@@ -0,0 +1,272 @@
+"""
+Motor de nómina vectorizado con NumPy para lotes grandes
+(muchos empleados y muchos meses a la vez, por ejemplo informes de administración)
+
+Los turnos se reciben como arrays de inicio y fin en segundos epoch UTC junto con el
+ID del empleado. Todos los conceptos se calculan con operaciones sobre arrays y se
+agregan por día y por mes con la misma semántica que los 'detalles' de calculadora.py,
+de modo que ambos cálculos se pueden contrastar.
+"""
+
+from datetime import datetime, date
+import numpy as np
+from config import TARIFAS
+from festivos import calendario_festivos
+from database import parse_turno_json
+
+SEGUNDOS_HORA = 3600
+SEGUNDOS_DIA = 86400
+
+# Código de concepto -> clave de tarifa en TARIFAS
+TARIFA_CONCEPTO = {
+    "SE001": "precio_hora",
+    "SE126": "plus_madrugue",
+    "SE106": "plus_nocturnidad",
+    "SE013": "plus_jornada_partida",
+    "SE023": "plus_domingo",
+    "festividad": "plus_festividad",
+    "SE055": "plus_transporte",
+    "comida": "dieta_comida",
+    "cena": "dieta_cena"
+}
+
+NOMBRE_CONCEPTO = {
+    "SE001": "Sueldo Base",
+    "SE126": "Plus de Madrugue",
+    "SE106": "Plus Nocturnidad",
+    "SE013": "Plus Jornada Partida",
+    "SE023": "Plus Domingo",
+    "festividad": "Plus Festividad",
+    "SE055": "Gastos Transporte",
+    "comida": "Dieta Comida",
+    "cena": "Dieta Cena"
+}
+
+# Conceptos que se pagan por horas y por unidades
+CONCEPTOS_HORAS = ("SE001", "SE126", "SE106", "SE023", "festividad")
+CONCEPTOS_UNIDADES = ("SE013", "SE055", "comida", "cena")
+
+# Conceptos que se anulan fuera de la ventana de pluses (todos salvo el sueldo base)
+CONCEPTOS_PLUSES = ("SE126", "SE106", "SE013", "SE023", "festividad", "SE055", "comida", "cena")
+
+
+def _festivos_a_dias(dias_festivos):
+    """Convierte fechas 'YYYY-MM-DD' en números de día desde epoch"""
+    return np.array(
+        sorted({(date.fromisoformat(d) - date(1970, 1, 1)).days for d in dias_festivos}),
+        dtype=np.int64
+    )
+
+
+def _solape(inicios, finales, desde, hasta):
+    """Segundos de solape entre cada turno y la ventana [desde, hasta)"""
+    return np.clip(np.minimum(finales, hasta) - np.maximum(inicios, desde), 0, None)
+
+
+def turnos_a_arrays(rows, empleado_id=None):
+    """
+    Convierte filas de turnos_empleado en arrays para el motor por lotes
+
+    Args:
+        rows: Filas con la columna 'turno' (y 'empleado_id' si no se pasa empleado_id)
+        empleado_id: ID a usar para todas las filas (opcional)
+
+    Returns:
+        tuple: (empleados, inicios, finales) como arrays int64
+    """
+    empleados, inicios, finales = [], [], []
+    for r in rows:
+        emp = empleado_id if empleado_id is not None else r["empleado_id"]
+        for turno in parse_turno_json(r["turno"]):
+            inicio = datetime.fromisoformat(turno["start"].replace("Z", "+00:00"))
+            fin = datetime.fromisoformat(turno["end"].replace("Z", "+00:00"))
+            empleados.append(emp)
+            inicios.append(int(inicio.timestamp()))
+            finales.append(int(fin.timestamp()))
+    return (
+        np.array(empleados, dtype=np.int64),
+        np.array(inicios, dtype=np.int64),
+        np.array(finales, dtype=np.int64)
+    )
+
+
+def calcular_turnos_lote(empleados, inicios, finales, dias_festivos=None, tarifas=TARIFAS):
+    """
+    Calcula horas, unidades e importes de cada turno de un lote
+
+    El día de un turno es el de su inicio (UTC). Como en calculadora.py, el primer
+    turno de cada día cobra el transporte y, si hay más de uno, la jornada partida.
+
+    Args:
+        empleados: Array con el ID de empleado de cada turno
+        inicios: Array con el inicio de cada turno en segundos epoch UTC
+        finales: Array con el fin de cada turno en segundos epoch UTC
+        dias_festivos: Días festivos 'YYYY-MM-DD' (por defecto el calendario vigente)
+        tarifas: Diccionario de tarifas (por defecto config.TARIFAS)
+
+    Returns:
+        dict: Arrays por turno ('empleado', 'dia', 'inicio', 'fin' y, por concepto,
+              'horas'/'unidades' y 'total')
+    """
+    empleados = np.asarray(empleados, dtype=np.int64)
+    inicios = np.asarray(inicios, dtype=np.int64)
+    finales = np.asarray(finales, dtype=np.int64)
+
+    # Ordenar por empleado, día e inicio para localizar el primer turno de cada día
+    dias = inicios // SEGUNDOS_DIA
+    orden = np.lexsort((inicios, dias, empleados))
+    empleados, inicios, finales, dias = empleados[orden], inicios[orden], finales[orden], dias[orden]
+    n = len(inicios)
+
+    festivos = _festivos_a_dias(calendario_festivos() if dias_festivos is None else dias_festivos)
+    segundos = {c: np.zeros(n, dtype=np.int64) for c in ("SE126", "SE106", "SE023", "festividad")}
+    segundos["SE001"] = finales - inicios
+
+    # Intersección con las ventanas de cada día que toca el turno (normalmente uno o dos)
+    max_dias = int(((np.maximum(finales, inicios + 1) - 1) // SEGUNDOS_DIA - dias).max()) if n else -1
+    for k in range(max_dias + 1):
+        dia_k = dias + k
+        ini_dia = dia_k * SEGUNDOS_DIA
+        tramo = _solape(inicios, finales, ini_dia, ini_dia + SEGUNDOS_DIA)
+        if not tramo.any():
+            continue
+
+        # 01/01/1970 fue jueves (weekday 3), así que domingo es (dia + 3) % 7 == 6
+        segundos["SE023"] += np.where((dia_k + 3) % 7 == 6, tramo, 0)
+        segundos["festividad"] += np.where(np.isin(dia_k, festivos), tramo, 0)
+        segundos["SE126"] += _solape(inicios, finales, ini_dia + 4 * SEGUNDOS_HORA, ini_dia + 7 * SEGUNDOS_HORA)
+        segundos["SE106"] += (
+            _solape(inicios, finales, ini_dia, ini_dia + 4 * SEGUNDOS_HORA)
+            + _solape(inicios, finales, ini_dia + 22 * SEGUNDOS_HORA, ini_dia + SEGUNDOS_DIA)
+        )
+
+    # Primer turno de cada día y número de turnos del día
+    nuevo_grupo = np.ones(n, dtype=bool)
+    if n:
+        nuevo_grupo[1:] = (empleados[1:] != empleados[:-1]) | (dias[1:] != dias[:-1])
+    grupo = np.cumsum(nuevo_grupo) - 1
+    turnos_del_dia = np.bincount(grupo, minlength=n)[grupo]
+
+    horas_turno = segundos["SE001"] / SEGUNDOS_HORA
+    hora_inicio = (inicios % SEGUNDOS_DIA) // SEGUNDOS_HORA
+    hora_fin = (finales % SEGUNDOS_DIA) // SEGUNDOS_HORA
+
+    unidades = {
+        "SE055": nuevo_grupo.astype(np.int64),
+        "SE013": (nuevo_grupo & (turnos_del_dia > 1)).astype(np.int64),
+        "comida": ((hora_inicio <= 14) & (hora_fin >= 16) & (horas_turno >= 6)).astype(np.int64),
+        "cena": ((hora_inicio <= 21) & (hora_fin >= 23) & (horas_turno >= 6)).astype(np.int64)
+    }
+
+    resultado = {
+        "empleado": empleados,
+        "dia": dias,
+        "inicio": inicios,
+        "fin": finales
+    }
+    for concepto in CONCEPTOS_HORAS:
+        horas = segundos[concepto] / SEGUNDOS_HORA
+        resultado[concepto] = {"horas": horas, "total": horas * tarifas[TARIFA_CONCEPTO[concepto]]}
+    for concepto in CONCEPTOS_UNIDADES:
+        resultado[concepto] = {
+            "unidades": unidades[concepto],
+            "total": unidades[concepto] * tarifas[TARIFA_CONCEPTO[concepto]]
+        }
+    resultado["total"] = sum(resultado[c]["total"] for c in TARIFA_CONCEPTO)
+    return resultado
+
+
+def _agregar(filas, claves, mascara_pluses=None):
+    """
+    Suma los conceptos de 'filas' (turnos o días) agrupando por las columnas de 'claves'.
+    'dias' cuenta las filas de cada grupo con importe en el concepto.
+    """
+    if len(filas["empleado"]) == 0:
+        unicas = np.zeros((0, len(claves)), dtype=np.int64)
+        inversa = np.zeros(0, dtype=np.int64)
+    else:
+        unicas, inversa = np.unique(np.column_stack(claves), axis=0, return_inverse=True)
+        inversa = inversa.reshape(-1)
+    num_grupos = len(unicas)
+
+    agregado = {"claves": unicas}
+    total = np.zeros(num_grupos)
+    for concepto in TARIFA_CONCEPTO:
+        medida = "horas" if concepto in CONCEPTOS_HORAS else "unidades"
+        valores = filas[concepto][medida]
+        importes = filas[concepto]["total"]
+        if mascara_pluses is not None and concepto in CONCEPTOS_PLUSES:
+            valores = np.where(mascara_pluses, valores, 0)
+            importes = np.where(mascara_pluses, importes, 0)
+        agregado[concepto] = {
+            medida: np.bincount(inversa, weights=valores, minlength=num_grupos),
+            "total": np.bincount(inversa, weights=importes, minlength=num_grupos),
+            "dias": np.bincount(inversa, weights=(importes > 0), minlength=num_grupos).astype(np.int64)
+        }
+        total += agregado[concepto]["total"]
+    agregado["total"] = total
+    return agregado
+
+
+def agregar_por_dia(turnos):
+    """
+    Totales por concepto para cada (empleado, día)
+
+    Returns:
+        dict: 'empleado', 'dia' (datetime64[D]) y, por concepto, horas/unidades y total
+    """
+    agregado = _agregar(turnos, (turnos["empleado"], turnos["dia"]))
+    for concepto in TARIFA_CONCEPTO:
+        agregado[concepto]["dias"] = np.minimum(agregado[concepto]["dias"], 1)
+    agregado["empleado"] = agregado["claves"][:, 0]
+    agregado["dia"] = agregado["claves"][:, 1].astype("datetime64[D]")
+    return agregado
+
+
+def agregar_por_mes(turnos, ventana_pluses=True):
+    """
+    Totales por concepto para cada (empleado, mes de nómina)
+
+    Args:
+        turnos: Resultado de calcular_turnos_lote
+        ventana_pluses: Si es True aplica la regla del 16 al 15: dentro de cada mes solo
+                        cuentan los pluses de los días 1 al 15 (como compute_salaries_for_period
+                        cuando se pide el mes completo)
+
+    Returns:
+        dict: 'empleado', 'mes' (datetime64[M]) y, por concepto, horas/unidades, total
+              y número de días con importe
+    """
+    # Se agrega primero por día para que 'dias' cuente días distintos y no turnos
+    por_dia = agregar_por_dia(turnos)
+    dias = por_dia["dia"]
+    meses = dias.astype("datetime64[M]")
+    mascara = None
+    if ventana_pluses:
+        dia_del_mes = (dias - meses.astype("datetime64[D]")).astype(np.int64) + 1
+        mascara = dia_del_mes <= 15
+
+    agregado = _agregar(por_dia, (por_dia["empleado"], meses.astype(np.int64)), mascara)
+    agregado["empleado"] = agregado["claves"][:, 0]
+    agregado["mes"] = agregado["claves"][:, 1].astype("datetime64[M]")
+    return agregado
+
+
+def a_detalles(agregado, indice, tarifas=TARIFAS):
+    """
+    Convierte una fila de un agregado diario en el diccionario 'detalles' de calculadora.py
+    para poder contrastar ambos motores
+    """
+    fecha = str(agregado["dia"][indice]) if "dia" in agregado else None
+    detalles = {}
+    for concepto, clave_tarifa in TARIFA_CONCEPTO.items():
+        medida = "horas" if concepto in CONCEPTOS_HORAS else "unidades"
+        valor = agregado[concepto][medida][indice]
+        detalles[concepto] = {
+            "nombre": NOMBRE_CONCEPTO[concepto],
+            "total": float(agregado[concepto]["total"][indice]),
+            medida: float(valor) if medida == "horas" else int(valor),
+            "tarifa": tarifas[clave_tarifa],
+            "dias": [fecha] if fecha and agregado[concepto]["total"][indice] > 0 else []
+        }
+    return detalles
@@ -0,0 +1,250 @@
+"""
+Caché de resultados de nómina
+
+Los cálculos de nómina solo cambian cuando cambia el turno guardado (una vez por
+sincronización) o las tarifas/festivos. La clave de cada entrada incluye el empleado,
+el día o periodo, un hash del JSON de los turnos y la versión de tarifas y festivos,
+así que un resultado cacheado nunca corresponde a datos distintos de los actuales.
+
+- En memoria: LRU acotado (NOMINA_CACHE_SIZE entradas)
+- Persistente (opcional, NOMINA_CACHE_PERSISTENTE=true): tabla nomina_cache con los
+  resultados por día, para que sobrevivan a un reinicio
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from config import TARIFAS
+from festivos import calendario_festivos
+from database import execute_query
+
+
+def _fecha_str(valor):
+    """Normaliza un día (date/datetime/str) a 'YYYY-MM-DD'"""
+    if isinstance(valor, date):
+        return valor.strftime("%Y-%m-%d")
+    return str(valor)[:10]
+
+
+_version = (None, None)
+
+
+def version_tarifas():
+    """
+    Versión de tarifas y festivos que forma parte de cada clave
+    (cambia cuando se recarga el calendario de festivos)
+    """
+    global _version
+    calendario = calendario_festivos()
+    if _version[0] != calendario.version:
+        datos = json.dumps({"tarifas": TARIFAS, "festivos": calendario.version}, sort_keys=True)
+        _version = (calendario.version, hashlib.sha1(datos.encode("utf-8")).hexdigest()[:12])
+    return _version[1]
+
+
+def hash_turnos(turnos):
+    """
+    Hash del contenido de una lista de turnos tal como vienen de la base de datos
+    (cadenas JSON, bytes o estructuras ya decodificadas)
+    """
+    h = hashlib.sha1()
+    for turno in turnos:
+        if isinstance(turno, bytes):
+            turno = turno.decode("utf-8")
+        elif not isinstance(turno, str):
+            turno = json.dumps(turno, sort_keys=True)
+        h.update(turno.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class NominaCache:
+    """Caché LRU de resultados de nómina con persistencia opcional por día"""
+
+    def __init__(self, max_size=5000, persistente=False):
+        self.max_size = max_size
+        self.persistente = persistente
+        self._entradas = OrderedDict()  # clave -> (valor, dia_key, periodo)
+        self._indice_dias = {}          # (empleado_id, 'YYYY-MM-DD') -> {claves}
+        self._indice_periodos = {}      # empleado_id -> {clave: (inicio, fin)}
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "hits_persistentes": 0,
+            "evicciones": 0,
+            "invalidaciones": 0
+        }
+
+    # ------------------------------------------------------------------
+    # Claves
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def clave_dia(empleado_id, dia, hash_contenido, incluir_pluses=True):
+        """Clave de un resultado diario"""
+        datos = f"dia|{empleado_id}|{_fecha_str(dia)}|{hash_contenido}|{int(incluir_pluses)}|{version_tarifas()}"
+        return hashlib.sha1(datos.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def clave_periodo(empleado_id, inicio, fin, hash_contenido):
+        """Clave de un resultado de periodo"""
+        datos = f"periodo|{empleado_id}|{_fecha_str(inicio)}|{_fecha_str(fin)}|{hash_contenido}|{version_tarifas()}"
+        return hashlib.sha1(datos.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Memoria
+    # ------------------------------------------------------------------
+
+    def _leer(self, clave):
+        with self._lock:
+            if clave not in self._entradas:
+                return None
+            self._entradas.move_to_end(clave)
+            self._stats["hits"] += 1
+            return copy.deepcopy(self._entradas[clave][0])
+
+    def _escribir(self, clave, valor, dia_key=None, periodo=None):
+        with self._lock:
+            self._entradas[clave] = (copy.deepcopy(valor), dia_key, periodo)
+            self._entradas.move_to_end(clave)
+            if dia_key:
+                self._indice_dias.setdefault(dia_key, set()).add(clave)
+            if periodo:
+                empleado_id, inicio, fin = periodo
+                self._indice_periodos.setdefault(empleado_id, {})[clave] = (inicio, fin)
+
+            while len(self._entradas) > self.max_size:
+                vieja, (_, viejo_dia, viejo_periodo) = self._entradas.popitem(last=False)
+                self._desindexar(vieja, viejo_dia, viejo_periodo)
+                self._stats["evicciones"] += 1
+
+    def _desindexar(self, clave, dia_key, periodo):
+        """Quita una clave de los índices de invalidación (con el lock tomado)"""
+        if dia_key and dia_key in self._indice_dias:
+            self._indice_dias[dia_key].discard(clave)
+            if not self._indice_dias[dia_key]:
+                del self._indice_dias[dia_key]
+        if periodo:
+            self._indice_periodos.get(periodo[0], {}).pop(clave, None)
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def obtener_dia(self, empleado_id, dia, clave):
+        """Devuelve (total, detalles) cacheado o None"""
+        valor = self._leer(clave)
+        if valor is not None:
+            return valor
+
+        if self.persistente and empleado_id:
+            try:
+                row = execute_query(
+                    "SELECT resultado FROM nomina_cache WHERE clave = %s",
+                    (clave,), fetchone=True
+                )
+            except Exception as e:
+                print(f"Error leyendo caché de nómina: {e}")
+                row = None
+            if row:
+                resultado = row["resultado"]
+                valor = json.loads(resultado) if isinstance(resultado, (str, bytes)) else resultado
+                valor = tuple(valor)
+                self._escribir(clave, valor, dia_key=(empleado_id, _fecha_str(dia)))
+                with self._lock:
+                    self._stats["hits_persistentes"] += 1
+                return copy.deepcopy(valor)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def guardar_dia(self, empleado_id, dia, clave, valor):
+        """Guarda (total, detalles) de un día"""
+        self._escribir(clave, valor, dia_key=(empleado_id, _fecha_str(dia)))
+
+        if self.persistente and empleado_id:
+            try:
+                execute_query(
+                    """
+                    INSERT INTO nomina_cache (clave, empleado_id, dia, resultado)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE resultado = VALUES(resultado)
+                    """,
+                    (clave, empleado_id, _fecha_str(dia), json.dumps(list(valor))),
+                    commit=True
+                )
+            except Exception as e:
+                print(f"Error guardando caché de nómina: {e}")
+
+    def obtener_periodo(self, clave):
+        """Devuelve el resultado cacheado de un periodo o None (solo en memoria)"""
+        valor = self._leer(clave)
+        if valor is None:
+            with self._lock:
+                self._stats["misses"] += 1
+        return valor
+
+    def guardar_periodo(self, empleado_id, inicio, fin, clave, valor):
+        """Guarda el resultado de un periodo"""
+        self._escribir(clave, valor, periodo=(empleado_id, _fecha_str(inicio), _fecha_str(fin)))
+
+    def invalidar_dias(self, empleado_id, dias):
+        """
+        Elimina los resultados de los días indicados de un empleado y los periodos
+        que los contienen
+        """
+        dias = sorted({_fecha_str(d) for d in dias})
+        if not dias:
+            return
+
+        with self._lock:
+            for dia in dias:
+                for clave in self._indice_dias.pop((empleado_id, dia), ()):
+                    if self._entradas.pop(clave, None) is not None:
+                        self._stats["invalidaciones"] += 1
+
+            periodos = self._indice_periodos.get(empleado_id, {})
+            for clave, (inicio, fin) in list(periodos.items()):
+                if any(inicio <= dia <= fin for dia in dias):
+                    del periodos[clave]
+                    if self._entradas.pop(clave, None) is not None:
+                        self._stats["invalidaciones"] += 1
+
+        if self.persistente:
+            placeholders = ", ".join(["%s"] * len(dias))
+            try:
+                execute_query(
+                    f"DELETE FROM nomina_cache WHERE empleado_id = %s AND dia IN ({placeholders})",
+                    [empleado_id] + dias, commit=True
+                )
+            except Exception as e:
+                print(f"Error invalidando caché de nómina: {e}")
+
+    def limpiar(self):
+        """Vacía la caché en memoria"""
+        with self._lock:
+            self._entradas.clear()
+            self._indice_dias.clear()
+            self._indice_periodos.clear()
+
+    def get_stats(self):
+        """Estadísticas de la caché"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._entradas)
+        stats["max_size"] = self.max_size
+        stats["persistente"] = self.persistente
+        stats["version_tarifas"] = version_tarifas()
+        return stats
+
+
+nomina_cache = NominaCache(
+    max_size=int(os.getenv("NOMINA_CACHE_SIZE", "5000")),
+    persistente=os.getenv("NOMINA_CACHE_PERSISTENTE", "false").lower() == "true"
+)
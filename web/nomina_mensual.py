@@ -0,0 +1,337 @@
+"""
+Agregados mensuales de nómina materializados
+
+La tabla nomina_mensual guarda, por empleado y mes natural, la nómina del mes completo
+(pluses del 16 del mes anterior al 15): total, importe de cada día y total, horas,
+unidades y días de cada concepto. Cada fila lleva la versión de tarifas y festivos con
+la que se calculó; una fila de otra versión se trata como si no existiera.
+
+- insertar_turnos_en_bd borra en su transacción los meses de los días que cambia y,
+  tras el commit, los vuelve a calcular (recalcular_meses)
+- Las vistas leen de la tabla los meses completos del rango y calculan al vuelo los
+  demás; los meses completos que faltaban se guardan
+- scripts/setup_nomina_mensual.py reconstruye la tabla (p. ej. tras cambiar tarifas)
+"""
+
+import json
+from datetime import datetime, date, timedelta
+from config import TARIFAS
+from calculadora import compute_salaries_for_days
+from database import db_connection, execute_query
+from nomina_cache import version_tarifas
+
+# Conceptos de la nómina: (clave, nombre, tarifa, medida)
+CONCEPTOS = (
+    ("SE001", "Sueldo Base", "precio_hora", "horas"),
+    ("SE126", "Plus de Madrugue", "plus_madrugue", "horas"),
+    ("SE106", "Plus Nocturnidad", "plus_nocturnidad", "horas"),
+    ("SE013", "Plus Jornada Partida", "plus_jornada_partida", "unidades"),
+    ("SE023", "Plus Domingo", "plus_domingo", "horas"),
+    ("festividad", "Plus Festividad", "plus_festividad", "horas"),
+    ("SE055", "Gastos Transporte", "plus_transporte", "unidades"),
+    ("comida", "Dieta Comida", "dieta_comida", "unidades"),
+    ("cena", "Dieta Cena", "dieta_cena", "unidades")
+)
+
+
+def _a_fecha(valor):
+    """Convierte date/datetime/'YYYY-MM-DD' en date"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(str(valor)[:10], "%Y-%m-%d").date()
+
+
+def _ultimo_dia(anio, mes):
+    """Último día de un mes"""
+    if mes == 12:
+        return date(anio + 1, 1, 1) - timedelta(days=1)
+    return date(anio, mes + 1, 1) - timedelta(days=1)
+
+
+def ventana_pluses(dia):
+    """
+    Rango de pluses del mes de un día: del 16 del mes anterior al 15 si el día es de
+    la primera quincena, del 16 al 15 del mes siguiente si es de la segunda
+    """
+    if dia.day <= 15:
+        inicio = date(dia.year - 1 if dia.month == 1 else dia.year,
+                      12 if dia.month == 1 else dia.month - 1, 16)
+        return inicio, date(dia.year, dia.month, 15)
+    fin = date(dia.year + 1, 1, 15) if dia.month == 12 else date(dia.year, dia.month + 1, 15)
+    return date(dia.year, dia.month, 16), fin
+
+
+def meses_del_rango(start_date, end_date):
+    """
+    Meses de un rango con su ventana de pluses (la del primer día del rango en cada mes)
+
+    Returns:
+        list: [((año, mes), inicio_pluses, fin_pluses)]
+    """
+    meses = []
+    actual = start_date
+    while actual <= end_date:
+        meses.append(((actual.year, actual.month), *ventana_pluses(actual)))
+        actual = _ultimo_dia(actual.year, actual.month) + timedelta(days=1)
+    return meses
+
+
+def mes_completo(month_key, start_date, end_date):
+    """Indica si el rango cubre el mes natural entero"""
+    anio, mes = month_key
+    return start_date <= date(anio, mes, 1) and _ultimo_dia(anio, mes) <= end_date
+
+
+def conceptos_vacios():
+    """Totales a cero de cada concepto con su nombre y tarifa"""
+    return {
+        clave: {"nombre": nombre, "total": 0, medida: 0, "tarifa": TARIFAS[tarifa], "dias": []}
+        for clave, nombre, tarifa, medida in CONCEPTOS
+    }
+
+
+def calcular_mes(rows, plus_start, plus_end, empleado_id=None):
+    """
+    Nómina de un mes a partir de sus filas de turnos
+
+    Returns:
+        dict: days (fecha e importe de cada día), total_salary, conceptos y pluses_range
+    """
+    month_days = compute_salaries_for_days(rows, plus_start, plus_end, empleado_id)
+
+    # Agrupar por conceptos
+    total_conceptos = conceptos_vacios()
+    for day_data in month_days:
+        for concepto, detalles in day_data["detalles"].items():
+            total_conceptos[concepto]["total"] += detalles["total"]
+
+            # Verificar si la clave existe antes de sumar
+            if "horas" in detalles and "horas" in total_conceptos[concepto]:
+                total_conceptos[concepto]["horas"] += detalles["horas"]
+
+            if "unidades" in detalles and "unidades" in total_conceptos[concepto]:
+                total_conceptos[concepto]["unidades"] += detalles["unidades"]
+
+            for dia in detalles["dias"]:
+                if dia not in total_conceptos[concepto]["dias"]:
+                    total_conceptos[concepto]["dias"].append(dia)
+
+    return {
+        "days": [{"date": day["date"], "total": day["total"]} for day in month_days],
+        "total_salary": sum(day["total"] for day in month_days),
+        "conceptos": total_conceptos,
+        "pluses_range": (plus_start, plus_end)
+    }
+
+
+def _turnos_por_mes(empleado_id, desde, hasta):
+    """Filas activas del empleado en el rango agrupadas por (año, mes), en orden"""
+    rows = execute_query(
+        """
+        SELECT id, dia, turno
+        FROM turnos_empleado
+        WHERE dia >= %s AND dia <= %s AND activo = 1 AND empleado_id = %s
+        ORDER BY dia, id
+        """,
+        (desde.strftime("%Y-%m-%d"), hasta.strftime("%Y-%m-%d"), empleado_id)
+    )
+    por_mes = {}
+    for r in rows:
+        dia = _a_fecha(r["dia"])
+        por_mes.setdefault((dia.year, dia.month), []).append(r)
+    return por_mes
+
+
+# ----------------------------------------------------------------------
+# Tabla nomina_mensual
+# ----------------------------------------------------------------------
+
+def _filtro_meses(meses):
+    """Condición SQL y parámetros para una lista de (año, mes)"""
+    meses = sorted(set(meses))
+    condicion = "(anio, mes) IN (" + ", ".join(["(%s, %s)"] * len(meses)) + ")"
+    return condicion, [valor for month_key in meses for valor in month_key]
+
+
+def _json(valor):
+    return json.loads(valor) if isinstance(valor, (str, bytes)) else valor
+
+
+def leer_meses(empleado_id, meses):
+    """
+    Meses guardados con la versión de tarifas vigente
+
+    Returns:
+        dict: {(año, mes): datos del mes como calcular_mes}
+    """
+    if not meses:
+        return {}
+    condicion, params = _filtro_meses(meses)
+    rows = execute_query(
+        f"""
+        SELECT anio, mes, pluses_desde, pluses_hasta, total, conceptos, dias
+        FROM nomina_mensual
+        WHERE empleado_id = %s AND version_tarifas = %s AND {condicion}
+        """,
+        [empleado_id, version_tarifas()] + params
+    )
+    return {
+        (row["anio"], row["mes"]): {
+            "days": _json(row["dias"]),
+            "total_salary": row["total"],
+            "conceptos": _json(row["conceptos"]),
+            "pluses_range": (_a_fecha(row["pluses_desde"]), _a_fecha(row["pluses_hasta"]))
+        }
+        for row in rows
+    }
+
+
+def guardar_mes(cursor, empleado_id, month_key, datos, version, solo_si_falta=False):
+    """
+    Guarda un mes (no hace commit)
+
+    Con solo_si_falta no se sobrescribe una fila de la versión vigente: un lector que
+    calculó con turnos anteriores a una sincronización no pisa el recálculo de esta.
+    """
+    plus_start, plus_end = datos["pluses_range"]
+    valores = (
+        version, plus_start, plus_end, len(datos["days"]), datos["total_salary"],
+        json.dumps(datos["conceptos"], ensure_ascii=False), json.dumps(datos["days"])
+    )
+    if solo_si_falta:
+        cursor.execute(
+            """
+            UPDATE nomina_mensual
+            SET version_tarifas = %s, pluses_desde = %s, pluses_hasta = %s, num_dias = %s,
+                total = %s, conceptos = %s, dias = %s
+            WHERE empleado_id = %s AND anio = %s AND mes = %s AND version_tarifas <> %s
+            """,
+            valores + (empleado_id, *month_key, version)
+        )
+        if cursor.rowcount:
+            return
+        cursor.execute(
+            """
+            INSERT IGNORE INTO nomina_mensual
+                (empleado_id, anio, mes, version_tarifas, pluses_desde, pluses_hasta,
+                 num_dias, total, conceptos, dias)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (empleado_id, *month_key) + valores
+        )
+        return
+
+    cursor.execute(
+        """
+        INSERT INTO nomina_mensual
+            (empleado_id, anio, mes, version_tarifas, pluses_desde, pluses_hasta,
+             num_dias, total, conceptos, dias)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE version_tarifas = VALUES(version_tarifas),
+            pluses_desde = VALUES(pluses_desde), pluses_hasta = VALUES(pluses_hasta),
+            num_dias = VALUES(num_dias), total = VALUES(total),
+            conceptos = VALUES(conceptos), dias = VALUES(dias)
+        """,
+        (empleado_id, *month_key) + valores
+    )
+
+
+def borrar_meses(cursor, empleado_id, dias):
+    """
+    Borra los meses de los días indicados dentro de la transacción del escritor
+
+    Returns:
+        list: Meses (año, mes) afectados
+    """
+    meses = sorted({(d.year, d.month) for d in map(_a_fecha, dias)})
+    if meses:
+        condicion, params = _filtro_meses(meses)
+        cursor.execute(
+            f"DELETE FROM nomina_mensual WHERE empleado_id = %s AND {condicion}",
+            [empleado_id] + params
+        )
+    return meses
+
+
+def recalcular_meses(empleado_id, meses):
+    """Calcula y guarda los meses completos indicados de un empleado"""
+    meses = sorted(set(meses))
+    if not meses:
+        return 0
+
+    version = version_tarifas()
+    desde = date(meses[0][0], meses[0][1], 1)
+    turnos_por_mes = _turnos_por_mes(empleado_id, desde, _ultimo_dia(*meses[-1]))
+    calculados = [
+        (month_key, calcular_mes(turnos_por_mes.get(month_key, []),
+                                 *ventana_pluses(date(*month_key, 1)), empleado_id))
+        for month_key in meses
+    ]
+
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                for month_key, datos in calculados:
+                    guardar_mes(cursor, empleado_id, month_key, datos, version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return len(calculados)
+
+
+def salarios_por_mes(start_date, end_date, empleado_id):
+    """
+    Nómina de un rango organizada por mes natural
+
+    Los meses que el rango cubre enteros se leen de nomina_mensual (y se guardan si
+    faltan); los meses parciales se calculan al vuelo solo con los días del rango.
+
+    Returns:
+        dict: {(año, mes): datos del mes} solo para los meses con turnos
+    """
+    start_date, end_date = _a_fecha(start_date), _a_fecha(end_date)
+    meses = meses_del_rango(start_date, end_date)
+    completos = {m[0] for m in meses if mes_completo(m[0], start_date, end_date)}
+
+    try:
+        guardados = leer_meses(empleado_id, completos)
+    except Exception as e:
+        print(f"Error al leer nomina_mensual, se calcula al vuelo: {e}")
+        guardados = {}
+
+    pendientes = [m for m in meses if m[0] not in guardados]
+    calculados = {}
+    if pendientes:
+        primero, ultimo = pendientes[0][0], pendientes[-1][0]
+        turnos_por_mes = _turnos_por_mes(
+            empleado_id,
+            max(start_date, date(*primero, 1)),
+            min(end_date, _ultimo_dia(*ultimo))
+        )
+        for month_key, plus_start, plus_end in pendientes:
+            calculados[month_key] = calcular_mes(
+                turnos_por_mes.get(month_key, []), plus_start, plus_end, empleado_id
+            )
+
+        nuevos = [month_key for month_key, _, _ in pendientes if month_key in completos]
+        if nuevos:
+            version = version_tarifas()
+            try:
+                with db_connection() as conn:
+                    with conn.cursor() as cursor:
+                        for month_key in nuevos:
+                            guardar_mes(cursor, empleado_id, month_key, calculados[month_key],
+                                        version, solo_si_falta=True)
+                    conn.commit()
+            except Exception as e:
+                print(f"Error al guardar nomina_mensual: {e}")
+
+    resultados = {}
+    for month_key, _, _ in meses:
+        datos = guardados.get(month_key) or calculados.get(month_key)
+        if datos and datos["days"]:
+            resultados[month_key] = datos
+    return resultados
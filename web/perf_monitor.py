@@ -0,0 +1,272 @@
+"""
+Instrumentación de rendimiento por petición
+
+- Los hooks de Flask abren y cierran un contexto por petición (hilo actual)
+- Cada sentencia SQL ejecutada a través del pool suma al contexto: número de
+  consultas, tiempo en base de datos y checkouts de conexión
+- Se agregan por ruta: peticiones, histograma de latencias, consultas y tiempo de BD
+- Las últimas peticiones se guardan en un buffer circular y las sentencias más
+  lentas en un top N
+
+Todo se mantiene en memoria del proceso; /admin/perf lo muestra.
+"""
+
+import heapq
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Límites superiores (ms) de los cubos del histograma de latencia
+HISTOGRAMA_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_ESPACIOS = re.compile(r"\s+")
+_ESCRITURA = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+_contexto = threading.local()
+
+
+def _normalizar_sql(sql):
+    """Compacta espacios y recorta una sentencia para mostrarla"""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", errors="replace")
+    return _ESPACIOS.sub(" ", str(sql)).strip()[:300]
+
+
+def _cubo(duracion_ms):
+    """Índice del cubo del histograma para una duración"""
+    for i, limite in enumerate(HISTOGRAMA_MS):
+        if duracion_ms <= limite:
+            return i
+    return len(HISTOGRAMA_MS)
+
+
+class PerfMonitor:
+    """Acumulador en memoria de métricas de peticiones y consultas"""
+
+    def __init__(self, enabled=True, buffer_size=500, top_consultas=25):
+        self.enabled = enabled
+        self.buffer_size = buffer_size
+        self.top_consultas = top_consultas
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Vacía todas las métricas"""
+        with self._lock:
+            self._inicio = datetime.now()
+            self._peticiones = deque(maxlen=self.buffer_size)
+            self._rutas = {}
+            self._lentas = []  # heap (duracion_ms, contador, datos)
+            self._contador = 0
+            self._fuera_peticion = {'consultas': 0, 'tiempo_db_ms': 0.0}
+
+    # ------------------------------------------------------------------
+    # Hooks de petición
+    # ------------------------------------------------------------------
+
+    def iniciar_peticion(self):
+        """Abre el contexto de la petición del hilo actual"""
+        if not self.enabled:
+            return
+        _contexto.peticion = {
+            'inicio': time.perf_counter(),
+            'consultas': 0,
+            'escrituras': 0,
+            'filas_escritas': 0,
+            'tiempo_db_ms': 0.0,
+            'checkouts': 0,
+            'ruta': None
+        }
+
+    def finalizar_peticion(self, ruta, metodo, status):
+        """Cierra el contexto y agrega sus métricas a la ruta"""
+        peticion = getattr(_contexto, 'peticion', None)
+        if not self.enabled or peticion is None:
+            return None
+        _contexto.peticion = None
+
+        duracion_ms = (time.perf_counter() - peticion['inicio']) * 1000
+        registro = {
+            'fecha': datetime.now(),
+            'ruta': ruta,
+            'metodo': metodo,
+            'status': status,
+            'duracion_ms': round(duracion_ms, 2),
+            'consultas': peticion['consultas'],
+            'escrituras': peticion['escrituras'],
+            'filas_escritas': peticion['filas_escritas'],
+            'tiempo_db_ms': round(peticion['tiempo_db_ms'], 2),
+            'checkouts': peticion['checkouts']
+        }
+
+        with self._lock:
+            self._peticiones.append(registro)
+            agregado = self._rutas.get(ruta)
+            if agregado is None:
+                agregado = self._rutas[ruta] = {
+                    'peticiones': 0,
+                    'errores': 0,
+                    'tiempo_total_ms': 0.0,
+                    'tiempo_max_ms': 0.0,
+                    'consultas': 0,
+                    'consultas_max': 0,
+                    'tiempo_db_ms': 0.0,
+                    'histograma': [0] * (len(HISTOGRAMA_MS) + 1)
+                }
+            agregado['peticiones'] += 1
+            if status >= 500:
+                agregado['errores'] += 1
+            agregado['tiempo_total_ms'] += duracion_ms
+            agregado['tiempo_max_ms'] = max(agregado['tiempo_max_ms'], duracion_ms)
+            agregado['consultas'] += peticion['consultas']
+            agregado['consultas_max'] = max(agregado['consultas_max'], peticion['consultas'])
+            agregado['tiempo_db_ms'] += peticion['tiempo_db_ms']
+            agregado['histograma'][_cubo(duracion_ms)] += 1
+        return registro
+
+    # ------------------------------------------------------------------
+    # Hooks de base de datos
+    # ------------------------------------------------------------------
+
+    def registrar_checkout(self):
+        """Cuenta una conexión pedida al pool durante la petición"""
+        peticion = getattr(_contexto, 'peticion', None)
+        if self.enabled and peticion is not None:
+            peticion['checkouts'] += 1
+
+    def registrar_consulta(self, sql, duracion_ms, filas=None):
+        """Registra una sentencia ejecutada y su duración"""
+        if not self.enabled:
+            return
+        peticion = getattr(_contexto, 'peticion', None)
+        if peticion is not None:
+            peticion['consultas'] += 1
+            peticion['tiempo_db_ms'] += duracion_ms
+            if _ESCRITURA.match(sql if isinstance(sql, str) else str(sql)):
+                peticion['escrituras'] += 1
+                peticion['filas_escritas'] += max(0, filas or 0)
+
+        with self._lock:
+            if peticion is None:
+                self._fuera_peticion['consultas'] += 1
+                self._fuera_peticion['tiempo_db_ms'] += duracion_ms
+
+            # Solo se normaliza el SQL si entra en el top de lentas
+            if len(self._lentas) < self.top_consultas or duracion_ms > self._lentas[0][0]:
+                self._contador += 1
+                datos = {
+                    'sql': _normalizar_sql(sql),
+                    'duracion_ms': round(duracion_ms, 2),
+                    'filas': filas,
+                    'ruta': peticion['ruta'] if peticion else None,
+                    'hilo': threading.current_thread().name,
+                    'fecha': datetime.now()
+                }
+                entrada = (duracion_ms, self._contador, datos)
+                if len(self._lentas) < self.top_consultas:
+                    heapq.heappush(self._lentas, entrada)
+                else:
+                    heapq.heapreplace(self._lentas, entrada)
+
+    def marcar_ruta(self, ruta):
+        """Asocia la ruta a la petición en curso (para las sentencias lentas)"""
+        peticion = getattr(_contexto, 'peticion', None)
+        if peticion is not None:
+            peticion['ruta'] = ruta
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def get_stats(self):
+        """Instantánea de todas las métricas"""
+        with self._lock:
+            rutas = []
+            for ruta, agregado in self._rutas.items():
+                n = agregado['peticiones']
+                rutas.append({
+                    'ruta': ruta,
+                    'peticiones': n,
+                    'errores': agregado['errores'],
+                    'tiempo_medio_ms': round(agregado['tiempo_total_ms'] / n, 2),
+                    'tiempo_max_ms': round(agregado['tiempo_max_ms'], 2),
+                    'consultas_media': round(agregado['consultas'] / n, 2),
+                    'consultas_max': agregado['consultas_max'],
+                    'tiempo_db_medio_ms': round(agregado['tiempo_db_ms'] / n, 2),
+                    'percentiles': self._percentiles(agregado['histograma'], n),
+                    'histograma': list(agregado['histograma'])
+                })
+            rutas.sort(key=lambda r: r['tiempo_medio_ms'] * r['peticiones'], reverse=True)
+
+            return {
+                'enabled': self.enabled,
+                'desde': self._inicio,
+                'histograma_limites_ms': list(HISTOGRAMA_MS),
+                'rutas': rutas,
+                'peticiones_recientes': list(reversed(self._peticiones)),
+                'consultas_lentas': [d for _, _, d in sorted(self._lentas, reverse=True)],
+                'fuera_de_peticion': dict(self._fuera_peticion)
+            }
+
+    @staticmethod
+    def _percentiles(histograma, total):
+        """p50/p95/p99 aproximados (límite superior del cubo)"""
+        resultado = {}
+        for nombre, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            objetivo = p * total
+            acumulado = 0
+            valor = None
+            for i, cuenta in enumerate(histograma):
+                acumulado += cuenta
+                if acumulado >= objetivo:
+                    valor = HISTOGRAMA_MS[i] if i < len(HISTOGRAMA_MS) else f">{HISTOGRAMA_MS[-1]}"
+                    break
+            resultado[nombre] = valor
+        return resultado
+
+
+class CursorInstrumentado:
+    """Envoltorio de cursor que mide cada execute/executemany"""
+
+    def __init__(self, cursor, monitor):
+        self._cursor = cursor
+        self._monitor = monitor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def execute(self, query, args=None):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._monitor.registrar_consulta(
+                query, (time.perf_counter() - inicio) * 1000, self._cursor.rowcount
+            )
+
+    def executemany(self, query, args):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._monitor.registrar_consulta(
+                query, (time.perf_counter() - inicio) * 1000, self._cursor.rowcount
+            )
+
+
+perf_monitor = PerfMonitor(
+    enabled=os.getenv("PERF_MONITOR_ENABLED", "true").lower() == "true",
+    buffer_size=int(os.getenv("PERF_MONITOR_BUFFER", "500")),
+    top_consultas=int(os.getenv("PERF_MONITOR_TOP_CONSULTAS", "25"))
+)
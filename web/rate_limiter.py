@@ -0,0 +1,89 @@
+"""
+Limitador de peticiones tipo token bucket
+Se usa para no superar un ritmo máximo de peticiones contra el servidor SITA
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket seguro entre hilos
+    
+    Se reponen 'rate' fichas por segundo hasta un máximo de 'capacity'.
+    Cada petición consume una ficha; si no hay, se espera a que se reponga.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {
+            'acquired': 0,
+            'waits': 0,
+            'total_wait_seconds': 0.0
+        }
+    
+    def _refill(self):
+        """Repone las fichas según el tiempo transcurrido (requiere tener el lock)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+    
+    def acquire(self, tokens=1, timeout=None, stop_event=None):
+        """
+        Consume fichas esperando lo necesario
+        
+        Args:
+            tokens: Número de fichas a consumir
+            timeout: Tiempo máximo de espera en segundos (None = sin límite)
+            stop_event: threading.Event que interrumpe la espera si se activa
+        
+        Returns:
+            bool: True si se consumieron las fichas, False si se agotó el tiempo o se interrumpió
+        """
+        if self.rate <= 0:
+            # Limitador desactivado
+            return True
+        
+        deadline = None if timeout is None else time.monotonic() + timeout
+        started = time.monotonic()
+        waited = False
+        
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self._stats['acquired'] += tokens
+                    if waited:
+                        self._stats['waits'] += 1
+                        self._stats['total_wait_seconds'] += time.monotonic() - started
+                    return True
+                wait_time = (tokens - self._tokens) / self.rate
+            
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            
+            waited = True
+            if stop_event is not None:
+                if stop_event.wait(wait_time):
+                    return False
+            else:
+                time.sleep(wait_time)
+    
+    def get_stats(self):
+        """Devuelve los contadores del limitador"""
+        with self._lock:
+            self._refill()
+            stats = dict(self._stats)
+            stats['available_tokens'] = round(self._tokens, 2)
+            stats['rate_per_second'] = self.rate
+            stats['capacity'] = self.capacity
+        return stats
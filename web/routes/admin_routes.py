@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_required, current_user
 import bcrypt
 from models.usuario import Usuario
+from models.credencial_sita import CredencialSita
 from sandbox import sandbox_mode
 
 admin_bp = Blueprint('admin', __name__)
@@ -138,6 +139,7 @@ def editar_usuario(usuario_id):
                 
                 cursor.execute(update_query, params)
                 conn.commit()
+                Usuario.invalidar_cache(usuario_id)
                 
                 flash('Usuario actualizado correctamente.', 'success')
                 return redirect(url_for('admin.listar_usuarios'))
@@ -177,6 +179,7 @@ def cambiar_estado(usuario_id):
                 (nuevo_estado, usuario_id)
             )
             conn.commit()
+            Usuario.invalidar_cache(usuario_id)
             
             estado_str = "activado" if nuevo_estado else "desactivado"
             flash(f'Usuario {estado_str} correctamente.', 'success')
@@ -203,6 +206,8 @@ def eliminar_usuario(usuario_id):
         with conn.cursor() as cursor:
             cursor.execute("DELETE FROM empleados WHERE id = %s", (usuario_id,))
             conn.commit()
+            Usuario.invalidar_cache(usuario_id)
+            CredencialSita.invalidar_cache(usuario_id)
             flash('Usuario eliminado correctamente.', 'success')
     except Exception as e:
         flash(f'Error al eliminar usuario: {str(e)}', 'danger')
@@ -1,13 +1,15 @@
 from flask import jsonify
 from datetime import date, timedelta
+from flask_login import login_required, current_user
 from routes import api_bp
-from database import get_turnos_by_range
-from calculadora import compute_salaries_for_period
+from nomina_mensual import salarios_por_mes
 
 @api_bp.route("/api/detalle_concepto/<concepto_id>/<int:mes>/<int:anio>")
+@login_required
 def detalle_concepto(concepto_id, mes, anio):
     """
-    API para obtener los detalles de un concepto de nómina
+    API para obtener los detalles de un concepto de nómina del usuario
+    (o del usuario vinculado si es modo demo), leídos de nomina_mensual
     """
     # Calcular rango del mes
     first_day = date(anio, mes, 1)
@@ -16,15 +18,9 @@ def detalle_concepto(concepto_id, mes, anio):
     else:
         last_day = date(anio, mes+1, 1) - timedelta(days=1)
         
-    # Calcular rango de pluses (del 16 del mes anterior al 15 del mes actual)
-    if mes == 1:
-        plus_start = date(anio-1, 12, 16)
-    else:
-        plus_start = date(anio, mes-1, 16)
-    plus_end = date(anio, mes, 15)
-    
-    # Calcular nómina
-    month_data = compute_salaries_for_period(first_day, last_day)
+    # Nómina del mes completo
+    empleado_id = current_user.vinculado_a_empleado_id or current_user.id
+    month_data = salarios_por_mes(first_day, last_day, empleado_id)
     
     # Verificar si el mes existe en los datos
     month_key = (anio, mes)
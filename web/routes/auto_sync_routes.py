@@ -6,6 +6,7 @@ Rutas para controlar y monitorear la sincronización automática
 from flask import Blueprint, jsonify, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
 from routes.admin_routes import admin_required
+from sync_queue import sync_queue
 
 # Crear blueprint
 auto_sync_bp = Blueprint('auto_sync', __name__)
@@ -100,9 +101,29 @@ def status_auto_sync():
             'cycle_count': stats['cycle_count'],
             'total_users_synced': stats['total_users_synced'],
             'total_errors': stats['total_errors'],
+            'total_postponed': stats['total_postponed'],
             'last_cycle_start': stats['last_cycle_start'].isoformat() if stats['last_cycle_start'] else None,
             'last_cycle_end': stats['last_cycle_end'].isoformat() if stats['last_cycle_end'] else None,
-            'current_user': stats['current_user']
+            'last_user_sync_end': stats['last_user_sync_end'].isoformat() if stats['last_user_sync_end'] else None,
+            'last_user_sync_seconds': stats['last_user_sync_seconds'],
+            'current_user': stats['current_user'],
+            'mode': stats['mode'],
+            'max_workers': stats['max_workers'],
+            'workers': {
+                name: {
+                    'current_user': info['current_user'],
+                    'users_synced': info['users_synced'],
+                    'errors': info['errors'],
+                    'last_activity': info['last_activity'].isoformat() if info['last_activity'] else None
+                }
+                for name, info in stats['workers'].items()
+            },
+            'rate_limiter': stats['rate_limiter'],
+            'sita_client': stats['sita_client'],
+            'sita_breaker': stats['sita_breaker'],
+            'sync_queue': sync_queue.get_stats(),
+            'leases': stats.get('leases'),
+            'scheduler': stats.get('scheduler')
         }
     })
 
@@ -4,9 +4,10 @@ from datetime import datetime, date, timedelta
 import calendar
 import json
 from routes import calendario_bp
-from database import get_db_connection
+from database import db_connection
 from calculadora import compute_salaries_for_days
 from config import MONTH_TRANSLATION
+from http_cache import etag_vista, respuesta_cacheada, responder
 
 # Función auxiliar para obtener turnos de un usuario específico
 def get_turnos_by_month_and_user(year, month, empleado_id, vinculado_a_empleado_id=None):
@@ -14,9 +15,6 @@ def get_turnos_by_month_and_user(year, month, empleado_id, vinculado_a_empleado_
     Obtiene todos los turnos y ausencias de un usuario para un mes, ajustando para incluir semanas completas
     Si vinculado_a_empleado_id está presente, obtiene los turnos de ese usuario en su lugar
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     # Si el usuario está vinculado a otro, usar el ID del usuario vinculado
     empleado_id_efectivo = vinculado_a_empleado_id if vinculado_a_empleado_id else empleado_id
 
@@ -33,22 +31,21 @@ def get_turnos_by_month_and_user(year, month, empleado_id, vinculado_a_empleado_
     adjusted_end_date = end_date + timedelta(days=(6 - last_weekday))
 
     try:
-        # Buscar en la tabla turnos_empleado
-        cursor.execute("""
-            SELECT id, dia, turno, ausencias
-            FROM turnos_empleado
-            WHERE dia >= %s AND dia <= %s AND activo=1 AND empleado_id=%s
-        """, (adjusted_start_date.strftime("%Y-%m-%d"), adjusted_end_date.strftime("%Y-%m-%d"), empleado_id_efectivo))
+        # Buscar en la tabla turnos_empleado (la conexión vuelve al pool al salir)
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, dia, turno, ausencias
+                    FROM turnos_empleado
+                    WHERE dia >= %s AND dia <= %s AND activo=1 AND empleado_id=%s
+                """, (adjusted_start_date.strftime("%Y-%m-%d"), adjusted_end_date.strftime("%Y-%m-%d"), empleado_id_efectivo))
 
-        rows = cursor.fetchall()
+                rows = cursor.fetchall()
 
         return rows
     except Exception as e:
         print(f"Error al obtener turnos: {e}")
         return []
-    finally:
-        cursor.close()
-        conn.close()
         
 @calendario_bp.route("/")
 @login_required
@@ -65,9 +62,6 @@ def calendar_view(year, month):
     """
     Vista de calendario mensual con semanas completas
     """
-    # Obtener turnos del usuario actual (o del usuario vinculado si es modo demo)
-    rows = get_turnos_by_month_and_user(year, month, current_user.id, current_user.vinculado_a_empleado_id)
-    
     # Obtener el primer y último día del mes
     start_date = date(year, month, 1)
     if month == 12:
@@ -81,8 +75,18 @@ def calendar_view(year, month):
     adjusted_start_date = start_date - timedelta(days=first_weekday)
     adjusted_end_date = end_date + timedelta(days=(6 - last_weekday))
     
+    # Responder 304 (o la página guardada) si los turnos no han cambiado
+    empleado_id = current_user.vinculado_a_empleado_id or current_user.id
+    etag = etag_vista('calendar', empleado_id, adjusted_start_date, adjusted_end_date, year, month)
+    cacheada = respuesta_cacheada(etag)
+    if cacheada is not None:
+        return cacheada
+    
+    # Obtener turnos del usuario actual (o del usuario vinculado si es modo demo)
+    rows = get_turnos_by_month_and_user(year, month, current_user.id, current_user.vinculado_a_empleado_id)
+    
     # Calcular salarios para el rango completo, agrupados por día
-    salary_info = compute_salaries_for_days(rows)
+    salary_info = compute_salaries_for_days(rows, empleado_id=empleado_id)
     
     # Agrupar por día y calcular horas para cada día
     daily_map = {}
@@ -185,4 +189,4 @@ def calendar_view(year, month):
         'today': today  # Añadir el día actual al contexto
     }
     
-    return render_template('calendar.html', **context)
\ No newline at end of file
+    return responder(etag, empleado_id, render_template('calendar.html', **context))
\ No newline at end of file
@@ -3,141 +3,21 @@ from datetime import datetime, date, timedelta
 import calendar
 from flask_login import login_required, current_user
 from routes import nomina_bp
-from calculadora import compute_salaries_for_period
-from database import execute_query, get_turnos_by_range
+from nomina_mensual import salarios_por_mes
 from config import MONTH_TRANSLATION, COMPANY_INFO, EMPLOYEE_INFO
-
-# Función auxiliar para obtener turnos en un rango para un usuario específico
-def get_turnos_by_range_and_user(start_date, end_date, empleado_id, vinculado_a_empleado_id=None):
-    """Obtiene los turnos en un rango para un usuario específico"""
-    # Si el usuario está vinculado a otro, usar el ID del usuario vinculado
-    empleado_id_efectivo = vinculado_a_empleado_id if vinculado_a_empleado_id else empleado_id
-
-    # Convertir fechas a string si son objetos date
-    if isinstance(start_date, date):
-        start_str = start_date.strftime("%Y-%m-%d")
-    else:
-        start_str = start_date
-
-    if isinstance(end_date, date):
-        end_str = end_date.strftime("%Y-%m-%d")
-    else:
-        end_str = end_date
-
-    query = """
-        SELECT id, dia, turno
-        FROM turnos_empleado
-        WHERE dia >= %s AND dia <= %s AND activo=1 AND empleado_id=%s
-    """
-    params = (start_str, end_str, empleado_id_efectivo)
-    return execute_query(query, params)
+from http_cache import etag_vista, respuesta_cacheada, responder
 
 def compute_salaries_for_period_by_user(start_date, end_date, empleado_id, vinculado_a_empleado_id=None):
     """
     Calcula los salarios para un periodo de nómina especificado y un usuario específico
     Con pluses calculados del 16 del mes anterior al 15 del mes actual
-    """
-    # Convertir a objetos date si son strings
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-    if isinstance(end_date, str):
-        end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-    
-    # Determinar el rango para los pluses
-    # Pluses del 16 del mes anterior al 15 del mes actual para cada mes
-    months_in_range = []
-    current_date = start_date
-    while current_date <= end_date:
-        if current_date.day <= 15:  # Primera mitad del mes
-            pluses_start = date(current_date.year - 1 if current_date.month == 1 else current_date.year,
-                               12 if current_date.month == 1 else current_date.month - 1, 16)
-            pluses_end = date(current_date.year, current_date.month, 15)
-        else:  # Segunda mitad del mes
-            pluses_start = date(current_date.year, current_date.month, 16)
-            next_month = current_date.month + 1
-            next_year = current_date.year
-            if next_month > 12:
-                next_month = 1
-                next_year += 1
-            pluses_end = date(next_year, next_month, 15)
-        
-        month_key = (current_date.year, current_date.month)
-        if month_key not in [m[0] for m in months_in_range]:
-            months_in_range.append((month_key, pluses_start, pluses_end))
-        
-        # Avanzar al siguiente día
-        current_date += timedelta(days=1)
-    
-    # Obtener todos los turnos en el rango completo para el usuario específico
-    rows = get_turnos_by_range_and_user(start_date, end_date, empleado_id, vinculado_a_empleado_id)
-    
-    # Agrupar turnos por mes
-    turnos_por_mes = {}
-    for r in rows:
-        dia_value = r["dia"]
-        if isinstance(dia_value, date):
-            dia_date = dia_value
-        else:
-            dia_date = datetime.strptime(str(dia_value), "%Y-%m-%d").date()
-        
-        month_key = (dia_date.year, dia_date.month)
-        if month_key not in turnos_por_mes:
-            turnos_por_mes[month_key] = []
-        
-        turnos_por_mes[month_key].append(r)
-    
-    # Calcular salarios para cada mes con sus reglas de pluses específicas
-    from calculadora import compute_salaries_for_days, TARIFAS, DIAS_FESTIVOS
     
-    results_by_month = {}
-    
-    for month_key, plus_start, plus_end in months_in_range:
-        if month_key in turnos_por_mes:
-            # Filtrar días que están dentro del rango de fechas solicitado
-            month_rows = turnos_por_mes[month_key]
-            
-            # Calcular salarios para este mes con reglas de pluses
-            month_days = compute_salaries_for_days(month_rows, plus_start, plus_end)
-            
-            # Agrupar por conceptos
-            total_conceptos = {
-                "SE001": {"nombre": "Sueldo Base", "total": 0, "horas": 0, "tarifa": TARIFAS["precio_hora"], "dias": []},
-                "SE126": {"nombre": "Plus de Madrugue", "total": 0, "horas": 0, "tarifa": TARIFAS["plus_madrugue"], "dias": []},
-                "SE106": {"nombre": "Plus Nocturnidad", "total": 0, "horas": 0, "tarifa": TARIFAS["plus_nocturnidad"], "dias": []},
-                "SE013": {"nombre": "Plus Jornada Partida", "total": 0, "unidades": 0, "tarifa": TARIFAS["plus_jornada_partida"], "dias": []},
-                "SE023": {"nombre": "Plus Domingo", "total": 0, "horas": 0, "tarifa": TARIFAS["plus_domingo"], "dias": []},
-                "festividad": {"nombre": "Plus Festividad", "total": 0, "horas": 0, "tarifa": TARIFAS["plus_festividad"], "dias": []},
-                "SE055": {"nombre": "Gastos Transporte", "total": 0, "unidades": 0, "tarifa": TARIFAS["plus_transporte"], "dias": []},
-                "comida": {"nombre": "Dieta Comida", "total": 0, "unidades": 0, "tarifa": TARIFAS["dieta_comida"], "dias": []},
-                "cena": {"nombre": "Dieta Cena", "total": 0, "unidades": 0, "tarifa": TARIFAS["dieta_cena"], "dias": []}
-            }
-            
-            for day_data in month_days:
-                for concepto, detalles in day_data["detalles"].items():
-                    total_conceptos[concepto]["total"] += detalles["total"]
-                    
-                    # Verificar si la clave existe antes de sumar
-                    if "horas" in detalles and "horas" in total_conceptos[concepto]:
-                        total_conceptos[concepto]["horas"] += detalles["horas"]
-                    
-                    if "unidades" in detalles and "unidades" in total_conceptos[concepto]:
-                        total_conceptos[concepto]["unidades"] += detalles["unidades"]
-                    
-                    for dia in detalles["dias"]:
-                        if dia not in total_conceptos[concepto]["dias"]:
-                            total_conceptos[concepto]["dias"].append(dia)
-            
-            # Calcular total del mes
-            total_salary = sum(day["total"] for day in month_days)
-            
-            results_by_month[month_key] = {
-                "days": month_days,
-                "total_salary": total_salary,
-                "conceptos": total_conceptos,
-                "pluses_range": (plus_start, plus_end)
-            }
-    
-    return results_by_month
+    Los meses completos se leen de la tabla nomina_mensual; solo los meses parciales
+    del rango se calculan a partir de los turnos.
+    """
+    # Si el usuario está vinculado a otro, usar el ID del usuario vinculado
+    empleado_id_efectivo = vinculado_a_empleado_id if vinculado_a_empleado_id else empleado_id
+    return salarios_por_mes(start_date, end_date, empleado_id_efectivo)
 
 @nomina_bp.route("/nomina_form")
 @login_required
@@ -200,6 +80,15 @@ def nomina_view():
         flash("Formato de fecha inválido. Use YYYY-MM-DD.", "danger")
         return redirect(url_for("nomina.nomina_form"))
     
+    # Responder 304 (o la página guardada) si los turnos no han cambiado
+    # El rango se amplía un mes por cada lado para cubrir las ventanas de pluses (16 a 15)
+    empleado_id = current_user.vinculado_a_empleado_id or current_user.id
+    etag = etag_vista('nomina', empleado_id, start_date - timedelta(days=31), end_date + timedelta(days=31),
+                      start_date_str, end_date_str)
+    cacheada = respuesta_cacheada(etag)
+    if cacheada is not None:
+        return cacheada
+    
     # Calcular salario para el rango, organizado por mes (o del usuario vinculado si es modo demo)
     nomina_data = compute_salaries_for_period_by_user(start_date, end_date, current_user.id, current_user.vinculado_a_empleado_id)
     
@@ -208,7 +97,7 @@ def nomina_view():
             'start_date': start_date_str,
             'end_date': end_date_str
         }
-        return render_template('nomina_empty.html', **context)
+        return responder(etag, empleado_id, render_template('nomina_empty.html', **context))
     
     # Procesar fechas para cada mes en la nómina
     processed_data = {}
@@ -327,4 +216,4 @@ def nomina_view():
         'fecha_actual': fecha_actual
     }
     
-    return render_template('nomina_simplified.html', **context)
\ No newline at end of file
+    return responder(etag, empleado_id, render_template('nomina_simplified.html', **context))
\ No newline at end of file
@@ -0,0 +1,60 @@
+# web/routes/perf_routes.py
+"""
+Rutas para consultar las métricas de rendimiento por petición
+"""
+
+from flask import Blueprint, jsonify, render_template, redirect, url_for, flash
+from routes.admin_routes import admin_required
+from perf_monitor import perf_monitor
+from database import get_pool_stats
+from ultimo_acceso_buffer import ultimo_acceso_buffer
+from http_cache import vistas_cache
+
+# Crear blueprint
+perf_bp = Blueprint('perf', __name__)
+
+def _serializar(stats):
+    """Convierte las fechas de las métricas a ISO para JSON"""
+    stats = dict(stats)
+    stats['desde'] = stats['desde'].isoformat()
+    stats['peticiones_recientes'] = [
+        dict(p, fecha=p['fecha'].isoformat()) for p in stats['peticiones_recientes']
+    ]
+    stats['consultas_lentas'] = [
+        dict(c, fecha=c['fecha'].isoformat()) for c in stats['consultas_lentas']
+    ]
+    return stats
+
+def _stats_ultimo_acceso():
+    """Estadísticas del buffer de últimos accesos"""
+    stats = ultimo_acceso_buffer.get_stats()
+    if stats['ultimo_flush']:
+        stats['ultimo_flush'] = stats['ultimo_flush'].isoformat()
+    return stats
+
+@perf_bp.route('/admin/perf')
+@admin_required
+def panel_perf():
+    """Panel de rendimiento: latencia por ruta, consultas y sentencias lentas"""
+    return render_template('admin/perf.html',
+                         stats=perf_monitor.get_stats(),
+                         pool=get_pool_stats(),
+                         ultimo_acceso=_stats_ultimo_acceso())
+
+@perf_bp.route('/api/perf/stats')
+@admin_required
+def stats_perf():
+    """API con las métricas de rendimiento en JSON"""
+    stats = _serializar(perf_monitor.get_stats())
+    stats['pool'] = get_pool_stats()
+    stats['ultimo_acceso'] = _stats_ultimo_acceso()
+    stats['vistas_cache'] = vistas_cache.get_stats()
+    return jsonify(stats)
+
+@perf_bp.route('/admin/perf/reset', methods=['POST'])
+@admin_required
+def reset_perf():
+    """Reinicia las métricas acumuladas"""
+    perf_monitor.reset()
+    flash('Métricas de rendimiento reiniciadas.', 'success')
+    return redirect(url_for('perf.panel_perf'))
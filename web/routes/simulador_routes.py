@@ -2,8 +2,10 @@ from flask import render_template, request, redirect, url_for, flash
 from datetime import datetime, timedelta
 from flask_login import login_required, current_user
 from routes import simulador_bp
-from calculadora import calcular_nomina_desde_json
-from config import DIAS_FESTIVOS, TARIFAS, MONTH_TRANSLATION
+from calculadora import calcular_nomina_desde_json, desglosar_turnos
+from tabla_tarifas import obtener_tabla
+from config import TARIFAS, MONTH_TRANSLATION
+from festivos import calendario_festivos
 
 @simulador_bp.route("/simulador", methods=["GET", "POST"])
 @login_required
@@ -13,7 +15,8 @@ def simulador():
     """
     if request.method == "GET":
         context = {
-            'today': datetime.now().strftime('%Y-%m-%d')
+            'today': datetime.now().strftime('%Y-%m-%d'),
+            'tarifas': TARIFAS
         }
         return render_template('simulador_form.html', **context)
     else:
@@ -51,19 +54,37 @@ def simulador():
             flash("No se proporcionó ningún turno válido.", "danger")
             return redirect(url_for("simulador.simulador"))
 
+        # Tarifas alternativas opcionales (campos tarifa_<clave> del formulario)
+        tarifas = dict(TARIFAS)
+        for clave in TARIFAS:
+            valor = request.form.get(f"tarifa_{clave}")
+            if valor:
+                try:
+                    tarifas[clave] = float(valor.replace(",", "."))
+                except ValueError:
+                    flash(f"Tarifa no válida: {valor}", "danger")
+                    return redirect(url_for("simulador.simulador"))
+        tabla = obtener_tabla(tarifas) if tarifas != TARIFAS else None
+        
         # Calcular nómina para los turnos simulados
+        festivos = calendario_festivos()
         day_json = [{"shifts": shifts}]
-        total_day, detalles = calcular_nomina_desde_json(day_json, DIAS_FESTIVOS)
+        total_day, detalles = calcular_nomina_desde_json(day_json, festivos, tabla=tabla)
+        
+        # Desglose por turno con el mismo motor que el detalle del día
+        turnos_desglose = desglosar_turnos(shifts, festivos, tabla)
         
         # Datos para la plantilla
         context = {
             'day_date': datetime.strptime(day_input, "%Y-%m-%d").date(),
             'shifts': shifts,
+            'turnos_desglose': turnos_desglose,
             'total_day': total_day,
             'detalles': detalles,
-            'tarifas': TARIFAS,
+            'tarifas': tarifas,
+            'tarifas_alternativas': tabla is not None,
             'month_translation': MONTH_TRANSLATION,
-            'dias_festivos': DIAS_FESTIVOS
+            'dias_festivos': festivos.fechas
         }
         
-        return render_template('simulador_result.html', **context)
\ No newline at end of file
+        return render_template('simulador_results.html', **context)
\ No newline at end of file
@@ -1,14 +1,20 @@
-import threading
-from flask import Blueprint, jsonify, redirect, url_for, flash, render_template, session
+from flask import Blueprint, jsonify, redirect, url_for, flash, render_template, session, request, Response
 from flask_login import login_required, current_user
-import requests
 import json
 import time
 from datetime import datetime, timedelta
 import os
-from cryptography.fernet import Fernet
 from models.credencial_sita import CredencialSita
-from database import get_db_connection, execute_query, close_db_connection
+from models.turno_shift import TurnoShift
+from models.roster_digest import RosterDigest
+from database import db_connection, execute_query
+from sita_client import sita_client, SitaError
+from nomina_cache import nomina_cache
+from nomina_mensual import borrar_meses, recalcular_meses
+from http_cache import vistas_cache
+from sync_queue import sync_queue
+from sync_scheduler import SyncScheduler
+from sync_eventos import sync_eventos, SSE_HEARTBEAT, SSE_DURACION_MAX, LONG_POLL_TIMEOUT
 
 # Definir el blueprint aquí
 sincronizacion_bp = Blueprint('sincronizacion', __name__)
@@ -26,117 +32,132 @@ def sincronizar_turnos():
 @sincronizacion_bp.route('/iniciar_sincronizacion_bg')
 @login_required
 def iniciar_sincronizacion_bg():
-    """Inicia la sincronización en segundo plano y redirige inmediatamente al calendario"""
+    """Encola la sincronización en segundo plano y redirige inmediatamente al calendario"""
     # Verificar si el usuario tiene credenciales SITA
     credenciales = CredencialSita.obtener_por_empleado(current_user.id)
     if not credenciales:
         flash('No tienes credenciales SITA configuradas. Por favor, configúralas primero.', 'warning')
         return redirect(url_for('usuario.credenciales_sita'))
     
-    # Verificar si ya hay una sincronización en curso
-    query = """
-        SELECT sincronizacion_en_progreso, ultima_sincronizacion
-        FROM empleados
-        WHERE id = %s
-    """
-    result = execute_query(query, (current_user.id,), fetchone=True)
-    
-    if result and result['sincronizacion_en_progreso']:
-        # Ya hay una sincronización en curso
-        flash('Hay una sincronización en curso. Por favor, espera a que termine.', 'info')
-        return redirect(url_for('calendario.home'))
-    
-    # Obtener el ID del usuario actual y credenciales antes de iniciar el hilo
-    empleado_id = current_user.id
-    
-    # Hacer una copia de las credenciales para pasarlas al hilo
-    # Esto evita problemas con el current_user en el hilo
-    credenciales_copia = credenciales.copy() if isinstance(credenciales, dict) else credenciales
-    
-    # Marcar como sincronización en progreso antes de iniciar el hilo
-    conn = get_db_connection()
+    # Encolar el trabajo (si ya hay uno pendiente o en curso se reutiliza)
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                UPDATE empleados
-                SET sincronizacion_en_progreso = 1
-                WHERE id = %s
-            """, (empleado_id,))
-            conn.commit()
+        job_id, nuevo = sync_queue.encolar(current_user.id, 'manual')
     except Exception as e:
         flash(f'Error al iniciar sincronización: {str(e)}', 'danger')
         return redirect(url_for('calendario.home'))
-    finally:
-        conn.close()
     
-    # Iniciar sincronización en un hilo separado
-    def sync_thread(user_id, user_credentials):
-        try:
-            # Ejecutar sincronización usando las credenciales pasadas
-            logs = []
-            
-            try:
-                # Obtener turnos desde SITA
-                turnos = obtener_turnos_sita(user_credentials)
-                
-                if turnos:
-                    # Insertar turnos en la base de datos
-                    insertar_turnos_en_bd(user_id, turnos)
-                    print(f"Sincronización completada para usuario ID {user_id}")
-                else:
-                    print(f"No se encontraron turnos para el usuario ID {user_id}")
-            except Exception as e:
-                print(f"Error durante la sincronización para usuario ID {user_id}: {e}")
-                # Guardar un registro del error en la base de datos para mostrar en la UI
-                try:
-                    conn = get_db_connection()
-                    with conn.cursor() as cursor:
-                        cursor.execute("""
-                            UPDATE empleados
-                            SET ultimo_error_sincronizacion = %s
-                            WHERE id = %s
-                        """, (str(e)[:500], user_id))  # Limitar a 500 caracteres
-                        conn.commit()
-                except:
-                    pass
-                finally:
-                    if conn:
-                        conn.close()
-                
-        except Exception as e:
-            print(f"Error en sincronización en segundo plano: {e}")
-        finally:
-            # Marcar como sincronización completada
-            try:
-                conn = get_db_connection()
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        UPDATE empleados
-                        SET sincronizacion_en_progreso = 0,
-                            ultima_sincronizacion = NOW()
-                        WHERE id = %s
-                    """, (user_id,))
-                    conn.commit()
-            except Exception as e:
-                print(f"Error al actualizar estado de sincronización: {e}")
-            finally:
-                try:
-                    if conn:
-                        conn.close()
-                except:
-                    pass
-                # Asegurarnos de cerrar todas las conexiones de este hilo
-                close_db_connection()
+    session['sync_job_id'] = job_id
     
-    # Iniciar hilo de sincronización con el ID del usuario y sus credenciales
-    thread = threading.Thread(target=sync_thread, args=(empleado_id, credenciales_copia))
-    thread.daemon = True  # El hilo se cerrará cuando la aplicación principal termine
-    thread.start()
-    
-    # Redirigir inmediatamente al calendario
-    flash('Sincronización iniciada en segundo plano. El proceso puede tardar unos minutos en completarse, especialmente la primera vez.', 'info')
+    if not nuevo:
+        flash('Hay una sincronización en curso. Por favor, espera a que termine.', 'info')
+    else:
+        flash('Sincronización iniciada en segundo plano. El proceso puede tardar unos minutos en completarse, especialmente la primera vez.', 'info')
     return redirect(url_for('calendario.home'))
 
+@sincronizacion_bp.route('/trabajos/<int:job_id>')
+@login_required
+def estado_trabajo(job_id):
+    """Devuelve el progreso de un trabajo de sincronización del usuario"""
+    try:
+        trabajo = sync_queue.obtener_trabajo(job_id, None if current_user.es_admin else current_user.id)
+        if not trabajo:
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        return jsonify(_trabajo_a_json(trabajo))
+    except Exception as e:
+        print(f"Error al obtener trabajo de sincronización: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def _trabajo_a_json(trabajo):
+    """Serializa una fila de sync_jobs"""
+    datos = dict(trabajo)
+    for campo in ('fecha_creacion', 'fecha_inicio', 'fecha_fin', 'fecha_actualizacion'):
+        if datos.get(campo):
+            datos[campo] = datos[campo].isoformat()
+    datos['terminado'] = datos['estado'] in ('completado', 'error')
+    return datos
+
+def _desde_evento():
+    """ID del último evento recibido por el cliente (Last-Event-ID o ?desde=)"""
+    valor = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    try:
+        return int(valor) if valor else None
+    except ValueError:
+        return None
+
+def _formato_sse(evento, tipo='progreso'):
+    """Serializa un evento en formato Server-Sent Events"""
+    return f"id: {evento['id']}\nevent: {tipo}\ndata: {json.dumps(evento)}\n\n"
+
+@sincronizacion_bp.route('/eventos')
+@login_required
+def eventos_sincronizacion():
+    """
+    Flujo Server-Sent Events con el progreso de la sincronización del usuario
+    (auth, fetch, diff, write, done, error). No consulta la base de datos.
+
+    Al conectar sin Last-Event-ID se envía el último evento conocido como 'estado'.
+    El flujo se cierra con un evento 'fin' en cuanto llega 'done' o 'error', o pasados
+    SYNC_EVENTOS_SSE_MAX segundos; el cliente vuelve entonces a /sincronizacion/estado.
+    Cada flujo abierto ocupa un hilo del servidor: el cliente web usa /eventos/poll.
+    """
+    empleado_id = current_user.id
+    desde = _desde_evento()
+
+    def generar():
+        ultimo_id = desde
+        yield "retry: 5000\n\n"
+        if ultimo_id is None:
+            ultimo = sync_eventos.ultimo(empleado_id)
+            ultimo_id = ultimo['id'] if ultimo else 0
+            if ultimo:
+                yield _formato_sse(ultimo, 'estado')
+
+        limite = time.monotonic() + SSE_DURACION_MAX
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            eventos = sync_eventos.esperar(empleado_id, ultimo_id, min(SSE_HEARTBEAT, restante))
+            if not eventos:
+                # Comentario de keep-alive para proxies
+                yield ": ping\n\n"
+                continue
+            for evento in eventos:
+                ultimo_id = evento['id']
+                yield _formato_sse(evento)
+            if eventos[-1]['terminado']:
+                break
+        yield "event: fin\ndata: {}\n\n"
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@sincronizacion_bp.route('/eventos/poll')
+@login_required
+def eventos_sincronizacion_poll():
+    """
+    Alternativa long-poll al flujo SSE
+
+    Sin ?desde= devuelve al momento el último evento; con ?desde=<id> espera
+    hasta SYNC_EVENTOS_LONG_POLL segundos a que llegue uno nuevo.
+    """
+    empleado_id = current_user.id
+    desde = _desde_evento()
+    if desde is None:
+        ultimo = sync_eventos.ultimo(empleado_id)
+        return jsonify({
+            'eventos': [ultimo] if ultimo else [],
+            'ultimo_id': ultimo['id'] if ultimo else 0
+        })
+
+    eventos = sync_eventos.esperar(empleado_id, desde, LONG_POLL_TIMEOUT)
+    return jsonify({
+        'eventos': eventos,
+        'ultimo_id': eventos[-1]['id'] if eventos else desde
+    })
+
 @sincronizacion_bp.route('/ultimo-error')
 @login_required
 def ultimo_error_sincronizacion():
@@ -218,10 +239,13 @@ def estado_sincronizacion():
         else:
             session['sync_in_progress'] = result['sincronizacion_en_progreso'] if result else False
         
+        trabajo = sync_queue.ultimo_trabajo(current_user.id)
+        
         return jsonify({
             'en_progreso': result['sincronizacion_en_progreso'] if result else False,
             'ultima_sincronizacion': result['ultima_sincronizacion'].isoformat() if result and result['ultima_sincronizacion'] else None,
-            'recien_completado': recien_completado
+            'recien_completado': recien_completado,
+            'trabajo': _trabajo_a_json(trabajo) if trabajo else None
         })
     except Exception as e:
         # Si ocurre algún error, devolver un estado predeterminado
@@ -236,7 +260,10 @@ def estado_sincronizacion():
 @sincronizacion_bp.route('/api/sincronizar', methods=['POST'])
 @login_required
 def api_sincronizar():
-    """API para sincronizar turnos del usuario actual"""
+    """
+    API para sincronizar turnos del usuario actual
+    Encola el trabajo y devuelve su ID al momento; el progreso se consulta en /trabajos/<id>
+    """
     logs = []
     
     def add_log(message):
@@ -271,64 +298,26 @@ def api_sincronizar():
                 'logs': logs
             })
         
-        # Verificar que hay al menos una forma de obtener la contraseña
-        if 'sita_password' not in credenciales and 'sita_password_encrypted' not in credenciales:
-            add_log("ERROR: No se encontró la contraseña SITA (ni encriptada ni en texto plano)")
-            return jsonify({
-                'success': False, 
-                'message': 'No se encontró la contraseña SITA (ni encriptada ni en texto plano)',
-                'logs': logs
-            })
-        
-        # Obtener turnos desde SITA
-        add_log(f"Conectando con SITA con usuario: {credenciales['sita_username']}...")
-        try:
-            turnos = obtener_turnos_sita(credenciales)
-            if turnos:
-                dias_totales = len(turnos)
-                add_log(f"Se obtuvieron datos de {dias_totales} días desde SITA")
-            else:
-                add_log("No se encontraron turnos en SITA para el rango especificado")
-                return jsonify({
-                    'success': False, 
-                    'message': 'No se encontraron turnos en SITA',
-                    'logs': logs
-                })
-        except Exception as e:
-            add_log(f"ERROR al obtener turnos de SITA: {str(e)}")
-            return jsonify({
-                'success': False, 
-                'message': f'Error al obtener turnos desde SITA: {str(e)}',
-                'logs': logs
-            })
-        
-        # Insertar turnos en la base de datos
-        add_log("Guardando turnos en la base de datos...")
-        try:
-            actualizados = insertar_turnos_en_bd(current_user.id, turnos)
-            add_log(f"Se actualizaron {actualizados} días con turnos en la base de datos")
-        except Exception as e:
-            add_log(f"ERROR al guardar turnos en la base de datos: {str(e)}")
-            return jsonify({
-                'success': False, 
-                'message': f'Error al guardar turnos: {str(e)}',
-                'logs': logs
-            })
+        # Encolar el trabajo
+        job_id, nuevo = sync_queue.encolar(current_user.id, 'manual')
+        session['sync_job_id'] = job_id
+        if nuevo:
+            add_log(f"Sincronización encolada (trabajo {job_id})")
+        else:
+            add_log(f"Ya había una sincronización pendiente o en curso (trabajo {job_id})")
         
-        add_log("Sincronización completada exitosamente")
         return jsonify({
             'success': True, 
-            'message': f'Sincronización completada. {actualizados} días actualizados.',
+            'message': 'Sincronización en cola.' if nuevo else 'Ya hay una sincronización en curso.',
+            'job_id': job_id,
+            'nuevo': nuevo,
+            'estado_url': url_for('sincronizacion.estado_trabajo', job_id=job_id),
             'redirect_url': url_for('calendario.home'),
-            'logs': logs,
-            'updated_days': actualizados
-        })
+            'logs': logs
+        }), 202
     
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        add_log(f"ERROR durante la sincronización: {str(e)}")
-        add_log(f"Detalles del error: {error_details}")
+        add_log(f"ERROR al encolar la sincronización: {str(e)}")
         
         return jsonify({
             'success': False, 
@@ -336,75 +325,34 @@ def api_sincronizar():
             'logs': logs
         })
 
-def obtener_turnos_sita(credenciales):
-    """Obtiene los turnos desde SITA para el usuario actual"""
+def obtener_turnos_sita(credenciales, rate_limiter=None, stop_event=None):
+    """
+    Obtiene los turnos desde SITA para el usuario actual
+    Si se pasa un rate_limiter (TokenBucket), cada petición HTTP consume una ficha; si
+    se activa stop_event mientras se espera una ficha se lanza SitaCancelada
+    """
     # Desencriptar contraseña SITA
     encryption_key = os.getenv('ENCRYPTION_KEY')
     if not encryption_key:
         raise ValueError("No se encontró ENCRYPTION_KEY en las variables de entorno")
     
     # Revisar qué clave contiene la contraseña
-    if 'sita_password' in credenciales:
+    if credenciales.get('sita_password'):
         # Si ya está desencriptada
         sita_password = credenciales['sita_password']
-    elif 'sita_password_encrypted' in credenciales:
-        # Si está encriptada
-        cipher_suite = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
-        password_encrypted = credenciales['sita_password_encrypted']
-        sita_password = cipher_suite.decrypt(
-            password_encrypted.encode() if isinstance(password_encrypted, str) else password_encrypted
-        ).decode()
+    elif credenciales.get('sita_password_encrypted'):
+        # Si está encriptada (con el cifrador compartido)
+        sita_password = CredencialSita.desencriptar(credenciales['sita_password_encrypted'])
+        if sita_password is None:
+            raise ValueError("No se pudo desencriptar la contraseña SITA")
     else:
         # No se encontró la contraseña
         raise ValueError("No se encontró la contraseña SITA en las credenciales")
     
-    # Definir cabeceras y payload para la autenticación
-    headers = {
-        "accept": "application/json",
-        "accept-language": "es-ES,es;q=0.9",
-        "authorization": "Bearer",
-        "content-type": "application/json",
-        "cvation_tenantid": credenciales['cvation_tenantid'],
-        "origin": "https://sitaess-prod-frontdoor.azurefd.net",
-        "priority": "u=1, i",
-        "referer": "https://sitaess-prod-frontdoor.azurefd.net/",
-        "sec-ch-ua": '"Chromium";v="116", "Not:A-Brand";v="24"',
-        "sec-ch-ua-mobile": "?0",
-        "sec-ch-ua-platform": '"Windows"',
-        "sec-fetch-dest": "empty",
-        "sec-fetch-mode": "cors",
-        "sec-fetch-site": "same-origin",
-        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
-    }
-    
-    payload = {
-        "username": credenciales['sita_username'],
-        "password": sita_password,
-        "siteId": credenciales['site_id']
-    }
-    
     # Log para depuración
     log_message = f"Intentando autenticar con: Usuario={credenciales['sita_username']}, SiteID={credenciales['site_id']}"
     print(log_message)
     
-    # URL de autenticación
-    auth_url = "https://sitaess-prod-frontdoor.azurefd.net/api/v1/auth/signin"
-    
-    # Autenticación
-    response = requests.post(auth_url, headers=headers, json=payload, timeout=30)
-    
-    if response.status_code != 200:
-        error_msg = f"Error de autenticación: {response.status_code} - {response.text}"
-        print(error_msg)
-        raise Exception(error_msg)
-    
-    data = response.json()
-    token = data.get("sessionToken")
-    if not token:
-        raise Exception("No se recibió token de autenticación")
-    
-    print(f"Autenticación exitosa. Token obtenido.")
-    
     # Definir rango de fechas para la consulta - desde el día 1 del mes actual
     hoy = datetime.now()
     fecha_inicio = datetime(hoy.year, hoy.month, 1)  # Día 1 del mes actual
@@ -415,9 +363,8 @@ def obtener_turnos_sita(credenciales):
     
     print(f"Obteniendo turnos desde {fecha_inicio.strftime('%d/%m/%Y')} hasta {fecha_fin.strftime('%d/%m/%Y')}")
     
-    # Obtener turnos
-    headers["authorization"] = f"Bearer {token}"
-    roster_url = credenciales['roster_url']
+    # La URL del cliente (SITA_ROSTER_URL) tiene preferencia sobre la de las credenciales
+    roster_url = sita_client.roster_url or credenciales['roster_url']
     
     # Asegurarse de que la URL del roster termine con el número de empleado
     if not roster_url.endswith(credenciales['sita_username']):
@@ -430,114 +377,164 @@ def obtener_turnos_sita(credenciales):
     
     print(f"URL de roster a usar: {roster_url}")
     
-    response = requests.get(roster_url, headers=headers, params=params, timeout=30)
-    if response.status_code != 200:
-        error_msg = f"Error al obtener turnos: {response.status_code} - {response.text}"
-        print(error_msg)
-        raise Exception(error_msg)
+    # Obtener turnos con el cliente compartido (reutiliza conexión y token si sigue vigente)
+    try:
+        turnos = sita_client.obtener_roster(
+            roster_url, params,
+            credenciales['sita_username'], sita_password,
+            credenciales['site_id'], credenciales['cvation_tenantid'],
+            rate_limiter=rate_limiter, empleado_id=credenciales.get('empleado_id'),
+            stop_event=stop_event
+        )
+    except SitaError as e:
+        print(str(e))
+        raise
     
     print(f"Turnos obtenidos correctamente.")
-    return response.json()
+    return turnos
+
+def _normalizar_dia_sita(turno):
+    """
+    Convierte un día de la respuesta de SITA en la fila que se guarda en turnos_empleado
+    
+    Returns:
+        tuple: (dia 'YYYY-MM-DD HH:MM:SS', JSON de turnos o None, JSON de ausencias o None,
+                hash del contenido)
+    """
+    # Normalizar la fecha
+    dia_iso = turno["date"]
+    if dia_iso.endswith("Z"):
+        dia_iso = dia_iso[:-1]
+    dia = datetime.fromisoformat(dia_iso).strftime("%Y-%m-%d %H:%M:%S")
+
+    # Procesar turnos
+    shifts = turno.get("shifts", [])
+    sorted_shifts = sorted(
+        shifts,
+        key=lambda x: (
+            x.get("start", ""),
+            x.get("end", ""),
+            x.get("roleCode", ""),
+            x.get("workingArea", "")
+        )
+    )
+    
+    # Procesar ausencias
+    full_day_absences = turno.get("fullDayAbsences", [])
+    part_day_absences = turno.get("partDayAbsences", [])
+    all_absences = full_day_absences + part_day_absences
+    
+    # Convertir a JSON canónico (claves ordenadas) y calcular su hash
+    shifts_str = json.dumps(sorted_shifts, ensure_ascii=False, sort_keys=True) if sorted_shifts else None
+    absences_str = json.dumps(all_absences, ensure_ascii=False, sort_keys=True) if all_absences else None
+    
+    return dia, shifts_str, absences_str, RosterDigest.hash_dia(shifts_str, absences_str)
+
+def _registrar_actividad(empleado_id, dias):
+    """Acumula los días actualizados para el planificador (si falla no afecta a la sincronización)"""
+    try:
+        SyncScheduler.registrar_cambios(empleado_id, dias)
+    except Exception as e:
+        print(f"Error al registrar la actividad de sincronización del usuario {empleado_id}: {e}")
 
 def insertar_turnos_en_bd(empleado_id, turnos_json):
-    """Inserta o actualiza los turnos en la base de datos usando execute_query"""
+    """
+    Inserta o actualiza los turnos en la base de datos
+    
+    Si la huella de la respuesta coincide con la de la última sincronización guardada
+    no se toca la base de datos. Si no, carga de una vez los turnos activos del rango
+    recibido, compara los hashes de contenido de cada día y aplica desactivaciones e
+    inserciones en una sola transacción. Devuelve el número de días actualizados.
+    """
     if not turnos_json:
         return 0
 
-    actualizados = 0
-
+    # Normalizar la respuesta (si un día aparece repetido, gana el último)
+    nuevos = {}
     for turno in turnos_json:
-        # Normalizar la fecha
-        dia_iso = turno["date"]
-        if dia_iso.endswith("Z"):
-            dia_iso = dia_iso[:-1]
-        dia = datetime.fromisoformat(dia_iso).strftime("%Y-%m-%d %H:%M:%S")
-
-        # Procesar turnos
-        shifts = turno.get("shifts", [])
-        sorted_shifts = sorted(
-            shifts,
-            key=lambda x: (
-                x.get("start", ""),
-                x.get("end", ""),
-                x.get("roleCode", ""),
-                x.get("workingArea", "")
-            )
-        )
-        
-        # Procesar ausencias
-        full_day_absences = turno.get("fullDayAbsences", [])
-        part_day_absences = turno.get("partDayAbsences", [])
-        all_absences = full_day_absences + part_day_absences
-        
-        # Convertir a JSON
-        shifts_str = json.dumps(sorted_shifts, ensure_ascii=False, sort_keys=True) if sorted_shifts else None
-        absences_str = json.dumps(all_absences, ensure_ascii=False) if all_absences else None
-
-        # Si no hay turnos ni ausencias, es un día libre
-        if not shifts_str and not absences_str:
-            # Desactivar todos los turnos activos para ese día
-            execute_query(
-                """
-                UPDATE turnos_empleado
-                SET activo = 0
-                WHERE dia = %s AND empleado_id = %s AND activo = 1
-                """,
-                (dia, empleado_id),
-                commit=True
-            )
-            # Insertar registro de día libre
-            execute_query(
-                """
-                INSERT INTO turnos_empleado (empleado_id, dia, turno, ausencias, activo, google_event_ids)
-                VALUES (%s, %s, NULL, NULL, 1, NULL)
-                """,
-                (empleado_id, dia),
-                commit=True
-            )
-            actualizados += 1
-            continue
-
-        # Verificar si ya existe un turno activo para este usuario y día
-        active_turno = execute_query(
-            """
-            SELECT id, turno, ausencias, activo, google_event_ids
-            FROM turnos_empleado
-            WHERE dia = %s AND empleado_id = %s AND activo = 1
-            """,
-            (dia, empleado_id),
-            fetchone=True
-        )
+        dia, shifts_str, absences_str, contenido_hash = _normalizar_dia_sita(turno)
+        nuevos[dia] = (shifts_str, absences_str, contenido_hash)
 
-        if active_turno:
-            # Si ya existe un turno activo, comparar
-            current_shifts = json.dumps(json.loads(active_turno["turno"]), ensure_ascii=False, sort_keys=True) if active_turno["turno"] else None
-            current_absences = json.dumps(json.loads(active_turno["ausencias"]), ensure_ascii=False) if active_turno["ausencias"] else None
+    # Respuesta idéntica a la última guardada: nada que comparar ni escribir
+    digest = RosterDigest.digest({dia: valores[2] for dia, valores in nuevos.items()})
+    if RosterDigest.obtener(empleado_id) == digest:
+        sync_eventos.publicar_seguro(empleado_id, 'write', dias=0, sin_cambios=True)
+        _registrar_actividad(empleado_id, 0)
+        return 0
 
-            if current_shifts == shifts_str and current_absences == absences_str:
-                # Turno idéntico, no hacer nada
-                continue
-            
-            # Si son diferentes, desactivar todos los turnos activos
-            execute_query(
-                """
-                UPDATE turnos_empleado
-                SET activo = 0
-                WHERE dia = %s AND empleado_id = %s AND activo = 1
-                """,
-                (dia, empleado_id),
-                commit=True
-            )
-
-        # Insertar el nuevo turno
-        execute_query(
-            """
-            INSERT INTO turnos_empleado (empleado_id, dia, turno, ausencias, activo, google_event_ids)
-            VALUES (%s, %s, %s, %s, 1, NULL)
-            """,
-            (empleado_id, dia, shifts_str, absences_str),
-            commit=True
-        )
-        actualizados += 1
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                # Turnos activos del empleado en el rango recibido, en una sola consulta
+                cursor.execute(
+                    """
+                    SELECT id, dia, turno, ausencias, contenido_hash
+                    FROM turnos_empleado
+                    WHERE empleado_id = %s AND dia >= %s AND dia <= %s AND activo = 1
+                    """,
+                    (empleado_id, min(nuevos), max(nuevos))
+                )
+                activos_por_dia = {}
+                for row in cursor.fetchall():
+                    dia_value = row["dia"]
+                    dia = dia_value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(dia_value, datetime) else str(dia_value)
+                    activos_por_dia.setdefault(dia, []).append(row)
+
+                # Diferencias en memoria por hash (las filas antiguas sin hash se recalculan)
+                ids_a_desactivar = []
+                filas_a_insertar = []
+                for dia, (shifts_str, absences_str, contenido_hash) in nuevos.items():
+                    activos = activos_por_dia.get(dia, [])
+
+                    # Turno idéntico (o día libre ya guardado), no hacer nada
+                    if len(activos) == 1 and RosterDigest.hash_fila(activos[0]) == contenido_hash:
+                        continue
+
+                    # Si son diferentes, desactivar todos los turnos activos e insertar el nuevo
+                    ids_a_desactivar.extend(row["id"] for row in activos)
+                    filas_a_insertar.append((empleado_id, dia, shifts_str, absences_str, contenido_hash))
+
+                # Aplicar los cambios en una única transacción
+                sync_eventos.publicar_seguro(empleado_id, 'write', dias=len(filas_a_insertar))
+                if ids_a_desactivar:
+                    placeholders = ", ".join(["%s"] * len(ids_a_desactivar))
+                    cursor.execute(
+                        f"UPDATE turnos_empleado SET activo = 0 WHERE id IN ({placeholders})",
+                        ids_a_desactivar
+                    )
+                if filas_a_insertar:
+                    cursor.executemany(
+                        """
+                        INSERT INTO turnos_empleado (empleado_id, dia, turno, ausencias, contenido_hash, activo, google_event_ids)
+                        VALUES (%s, %s, %s, %s, %s, 1, NULL)
+                        """,
+                        filas_a_insertar
+                    )
+                    # Mantener la tabla normalizada de turnos en la misma transacción
+                    TurnoShift.reemplazar_dias(
+                        cursor, empleado_id,
+                        [(dia, shifts_str) for _, dia, shifts_str, _, _ in filas_a_insertar]
+                    )
+                    # Los agregados de los meses modificados dejan de ser válidos
+                    meses_modificados = borrar_meses(
+                        cursor, empleado_id, [fila[1] for fila in filas_a_insertar]
+                    )
+                RosterDigest.guardar(cursor, empleado_id, digest, min(nuevos), max(nuevos))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    # Los días modificados dejan de ser válidos en la caché de nómina
+    if filas_a_insertar:
+        nomina_cache.invalidar_dias(empleado_id, [fila[1] for fila in filas_a_insertar])
+        vistas_cache.invalidar_empleado(empleado_id)
+
+        # Recalcular los agregados mensuales (si falla, la vista los calcula al leerlos)
+        try:
+            recalcular_meses(empleado_id, meses_modificados)
+        except Exception as e:
+            print(f"Error al recalcular nomina_mensual del usuario {empleado_id}: {e}")
 
-    return actualizados
\ No newline at end of file
+    _registrar_actividad(empleado_id, len(filas_a_insertar))
+    return len(filas_a_insertar)
@@ -71,6 +71,7 @@ def perfil():
                     flash('Contraseña actualizada correctamente.', 'success')
                 
                 conn.commit()
+                Usuario.invalidar_cache(current_user.id)
                 flash('Perfil actualizado correctamente.', 'success')
         except Exception as e:
             logger.error(f"Error al actualizar perfil: {e}")
@@ -0,0 +1,258 @@
+"""
+Cliente HTTP compartido para el servidor SITA
+- Una única sesión de requests con conexiones keep-alive reutilizables
+- Caché de sessionToken por empleado y contraseña con caducidad y renovación ante un 401
+- Cortacircuitos compartido: si SITA no responde se rechazan las peticiones sin esperar
+"""
+
+import hashlib
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from circuit_breaker import CircuitBreaker
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Se pueden sustituir por variables de entorno (p. ej. para apuntar a scripts/mock_sita.py)
+SITA_BASE_URL = os.getenv("SITA_BASE_URL", "https://sitaess-prod-frontdoor.azurefd.net").rstrip("/")
+SITA_AUTH_URL = os.getenv("SITA_AUTH_URL", f"{SITA_BASE_URL}/api/v1/auth/signin")
+# Si se define, sustituye a la URL del roster guardada en las credenciales de cada usuario
+SITA_ROSTER_URL = os.getenv("SITA_ROSTER_URL") or None
+
+
+class SitaError(Exception):
+    """Error devuelto por el servidor SITA"""
+    
+    def __init__(self, message, status_code=None, response_text=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response_text = response_text
+
+
+class SitaAuthError(SitaError):
+    """La autenticación contra SITA ha fallado"""
+    pass
+
+
+class SitaCancelada(SitaError):
+    """La petición se abandonó esperando al limitador porque se activó el evento de parada"""
+    
+    def __init__(self):
+        super().__init__("Petición a SITA cancelada: el sincronizador se está deteniendo")
+
+
+class SitaNoDisponible(SitaError):
+    """El cortacircuitos está abierto: SITA está fallando y no se le llama"""
+    
+    def __init__(self, reintento_en):
+        super().__init__(f"Servidor SITA no disponible, se reintentará en {reintento_en:.0f}s")
+        self.reintento_en = reintento_en
+
+
+class SitaClient:
+    """Cliente SITA con pool de conexiones HTTP y caché de tokens"""
+    
+    def __init__(self, base_url=SITA_BASE_URL, auth_url=SITA_AUTH_URL, roster_url=SITA_ROSTER_URL,
+                 pool_size=10, token_ttl=1200, timeout=30, breaker=None):
+        self.base_url = base_url
+        self.auth_url = auth_url
+        self.roster_url = roster_url
+        self.token_ttl = token_ttl
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        
+        # Sesión compartida: reutiliza conexiones TLS entre peticiones y entre hilos
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        self._tokens = {}  # (empleado_id, usuario, site_id, tenant, hash contraseña) -> (token, caduca_en)
+        self._lock = threading.Lock()
+        self._stats = {
+            'signins': 0,
+            'token_hits': 0,
+            'token_renewals': 0,
+            'requests': 0
+        }
+    
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+    
+    def _headers(self, cvation_tenantid, token=None):
+        """Cabeceras que espera el frontal de SITA"""
+        return {
+            "accept": "application/json",
+            "accept-language": "es-ES,es;q=0.9",
+            "authorization": f"Bearer {token}" if token else "Bearer",
+            "content-type": "application/json",
+            "cvation_tenantid": cvation_tenantid,
+            "origin": self.base_url,
+            "priority": "u=1, i",
+            "referer": f"{self.base_url}/",
+            "sec-ch-ua": '"Chromium";v="116", "Not:A-Brand";v="24"',
+            "sec-ch-ua-mobile": "?0",
+            "sec-ch-ua-platform": '"Windows"',
+            "sec-fetch-dest": "empty",
+            "sec-fetch-mode": "cors",
+            "sec-fetch-site": "same-origin",
+            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"
+        }
+    
+    def _request(self, method, url, rate_limiter=None, stop_event=None, **kwargs):
+        """
+        Realiza una petición por la sesión compartida respetando el limitador
+        
+        Los timeouts, errores de conexión, 5xx y 429 cuentan como fallos del servidor
+        para el cortacircuitos; el resto de respuestas (incluidos 401) como éxitos.
+        La espera por el limitador se interrumpe si se activa stop_event.
+        
+        Raises:
+            SitaNoDisponible: Si el cortacircuitos está abierto
+            SitaCancelada: Si se activó stop_event mientras se esperaba al limitador
+        """
+        if not self.breaker.permitir():
+            raise SitaNoDisponible(self.breaker.segundos_para_reintento())
+        
+        try:
+            if rate_limiter and not rate_limiter.acquire(stop_event=stop_event):
+                raise SitaCancelada()
+            self._count('requests')
+            kwargs.setdefault('timeout', self.timeout)
+            response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.registrar_fallo()
+            raise
+        except BaseException:
+            self.breaker.cancelar()
+            raise
+        
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.registrar_fallo()
+        else:
+            self.breaker.registrar_exito()
+        return response
+    
+    @staticmethod
+    def _clave_token(empleado_id, sita_username, sita_password, site_id, cvation_tenantid):
+        """
+        Clave de la caché de tokens: incluye el empleado y un hash de la contraseña para
+        que nadie reciba el token de otro guardando su usuario de SITA con otra contraseña
+        """
+        password_hash = hashlib.sha256(sita_password.encode("utf-8")).hexdigest()
+        return (empleado_id, sita_username, site_id, cvation_tenantid, password_hash)
+    
+    def iniciar_sesion(self, sita_username, sita_password, site_id, cvation_tenantid,
+                       timeout=None, rate_limiter=None, empleado_id=None, stop_event=None):
+        """
+        Devuelve un sessionToken válido, reutilizando el de la caché si no ha caducado
+        
+        Solo se usa la caché si se indica el empleado (sin él, p. ej. al validar
+        credenciales nuevas, siempre se autentica contra SITA y no se guarda el token)
+        
+        Raises:
+            SitaAuthError: Si SITA rechaza las credenciales o no devuelve token
+        """
+        key = None
+        if empleado_id is not None:
+            key = self._clave_token(empleado_id, sita_username, sita_password, site_id, cvation_tenantid)
+            with self._lock:
+                cached = self._tokens.get(key)
+                if cached and cached[1] > time.monotonic():
+                    self._stats['token_hits'] += 1
+                    return cached[0]
+        
+        payload = {
+            "username": sita_username,
+            "password": sita_password,
+            "siteId": site_id
+        }
+        
+        response = self._request(
+            "POST", self.auth_url, rate_limiter=rate_limiter, stop_event=stop_event,
+            headers=self._headers(cvation_tenantid), json=payload,
+            timeout=timeout or self.timeout
+        )
+        self._count('signins')
+        
+        if response.status_code != 200:
+            raise SitaAuthError(
+                f"Error de autenticación: {response.status_code} - {response.text}",
+                status_code=response.status_code, response_text=response.text
+            )
+        
+        token = response.json().get("sessionToken")
+        if not token:
+            raise SitaAuthError("No se recibió token de autenticación", status_code=response.status_code)
+        
+        if key is not None:
+            with self._lock:
+                self._tokens[key] = (token, time.monotonic() + self.token_ttl)
+        return token
+    
+    def invalidar_token(self, empleado_id):
+        """Elimina de la caché los tokens de un empleado"""
+        with self._lock:
+            for key in [key for key in self._tokens if key[0] == empleado_id]:
+                del self._tokens[key]
+    
+    def obtener_roster(self, roster_url, params, sita_username, sita_password, site_id,
+                       cvation_tenantid, timeout=None, rate_limiter=None, empleado_id=None,
+                       stop_event=None):
+        """
+        Descarga el roster con el token en caché; si SITA responde 401 renueva el token una vez
+        
+        Raises:
+            SitaAuthError: Si falla la autenticación
+            SitaError: Si SITA responde con un error al pedir el roster
+        """
+        for intento in range(2):
+            token = self.iniciar_sesion(
+                sita_username, sita_password, site_id, cvation_tenantid,
+                timeout=timeout, rate_limiter=rate_limiter, empleado_id=empleado_id,
+                stop_event=stop_event
+            )
+            response = self._request(
+                "GET", roster_url, rate_limiter=rate_limiter, stop_event=stop_event,
+                headers=self._headers(cvation_tenantid, token), params=params,
+                timeout=timeout or self.timeout
+            )
+            
+            if response.status_code == 401 and intento == 0:
+                # Token caducado en el servidor: renovar y reintentar
+                self.invalidar_token(empleado_id)
+                self._count('token_renewals')
+                continue
+            
+            if response.status_code != 200:
+                raise SitaError(
+                    f"Error al obtener turnos: {response.status_code} - {response.text}",
+                    status_code=response.status_code, response_text=response.text
+                )
+            return response.json()
+    
+    def get_stats(self):
+        """Devuelve los contadores del cliente"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_tokens'] = len(self._tokens)
+        stats['breaker'] = self.breaker.get_stats()
+        return stats
+
+
+# Cliente global compartido por la web y el sincronizador automático
+sita_client = SitaClient(
+    pool_size=int(os.getenv("SITA_HTTP_POOL_SIZE", 10)),
+    token_ttl=int(os.getenv("SITA_TOKEN_TTL", 1200)),
+    timeout=int(os.getenv("SITA_HTTP_TIMEOUT", 30)),
+    breaker=CircuitBreaker(
+        umbral=int(os.getenv("SITA_BREAKER_THRESHOLD", 5)),
+        espera=float(os.getenv("SITA_BREAKER_COOLDOWN", 30)),
+        espera_max=float(os.getenv("SITA_BREAKER_MAX_COOLDOWN", 600))
+    )
+)
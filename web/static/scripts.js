@@ -288,8 +288,8 @@ function checkSyncStatus() {
                         syncNotification.style.display = 'none';
                     }
                     
-                    // Verificar de nuevo en 5 segundos
-                    setTimeout(checkSyncStatus, 5000);
+                    // Recibir el progreso por long-poll
+                    pollSyncEvents(data.trabajo ? data.trabajo.id : null);
                 } else {
                     if (data.ultima_sincronizacion) {
                         const fecha = new Date(data.ultima_sincronizacion);
@@ -330,6 +330,88 @@ function checkSyncStatus() {
         });
 }
 
+// Textos de cada fase publicada por el servidor
+const SYNC_PHASE_LABELS = {
+    auth: 'Conectando con SITA...',
+    fetch: 'Descargando turnos...',
+    diff: 'Comparando turnos...',
+    write: 'Guardando cambios...'
+};
+
+let syncPolling = false;
+
+/**
+ * Escucha el progreso de la sincronización por long-poll (/sincronizacion/eventos/poll)
+ * Cada petición libera el hilo del servidor al llegar un evento o pasado el tiempo de
+ * espera; si no llega ninguno o falla, vuelve a consultar /sincronizacion/estado
+ */
+function pollSyncEvents(jobId) {
+    if (syncPolling) return;
+    syncPolling = true;
+    
+    const prefix = getUrlPrefix();
+    
+    // Devuelve true si el evento termina la sincronización
+    const handleEvent = (evento) => {
+        const syncIndicator = document.getElementById('sync-indicator');
+        
+        if (evento.terminado) {
+            syncPolling = false;
+            if (evento.fase === 'error') {
+                showSyncError(evento.mensaje || 'Error durante la sincronización.');
+                checkSyncStatus();
+            } else {
+                location.reload();
+            }
+            return true;
+        }
+        
+        if (syncIndicator && SYNC_PHASE_LABELS[evento.fase]) {
+            syncIndicator.innerHTML = '<div class="spinner-small"></div> ' + SYNC_PHASE_LABELS[evento.fase];
+            syncIndicator.className = 'sync-status in-progress';
+        }
+        return false;
+    };
+    
+    const poll = (desde) => {
+        const url = desde === null
+            ? `${prefix}/sincronizacion/eventos/poll`
+            : `${prefix}/sincronizacion/eventos/poll?desde=${desde}`;
+        
+        fetch(url)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Error en la respuesta del servidor');
+                }
+                return response.json();
+            })
+            .then(data => {
+                for (const evento of data.eventos) {
+                    // Último evento conocido al conectar: solo cuenta como final si es de este trabajo
+                    if (desde === null && evento.terminado && !(jobId && evento.job_id === jobId)) {
+                        continue;
+                    }
+                    if (handleEvent(evento)) return;
+                }
+                
+                // Sin eventos nuevos (p. ej. sincronización en otra instancia): comprobar el estado por JSON
+                if (desde !== null && !data.eventos.length) {
+                    syncPolling = false;
+                    checkSyncStatus();
+                    return;
+                }
+                poll(data.ultimo_id);
+            })
+            .catch(error => {
+                console.error('Error recibiendo el progreso de la sincronización:', error);
+                syncPolling = false;
+                setTimeout(checkSyncStatus, 5000);
+            });
+    };
+    
+    poll(null);
+}
+
 /**
  * Muestra una notificación de error de sincronización
  */
@@ -0,0 +1,143 @@
+"""
+Canal de eventos de progreso de la sincronización
+
+Los procesos de sincronización (cola manual y auto-sync) publican aquí cada cambio
+de fase de un empleado. Las rutas de /sincronizacion/eventos los entregan al navegador
+por Server-Sent Events o long-poll sin consultar la base de datos en cada ciclo.
+
+Fases: auth, fetch, diff, write, done, error
+
+Los eventos viven en memoria del proceso. Si la sincronización se ejecuta en otra
+instancia el cliente no los recibe y vuelve a /sincronizacion/estado al cerrarse el flujo.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+FASES = ('auth', 'fetch', 'diff', 'write', 'done', 'error')
+FASES_FINALES = ('done', 'error')
+
+# Eventos recientes que se guardan por empleado (para reconexiones con Last-Event-ID)
+EVENTOS_POR_EMPLEADO = 20
+
+# Segundos entre comentarios de keep-alive y duración máxima de un flujo SSE
+# (cada flujo ocupa un hilo del servidor mientras está abierto)
+SSE_HEARTBEAT = int(os.getenv('SYNC_EVENTOS_HEARTBEAT', '15'))
+SSE_DURACION_MAX = int(os.getenv('SYNC_EVENTOS_SSE_MAX', '60'))
+
+# Espera máxima de una petición long-poll
+LONG_POLL_TIMEOUT = int(os.getenv('SYNC_EVENTOS_LONG_POLL', '25'))
+
+
+class SyncEventos:
+    """Pub/sub en memoria de eventos de sincronización por empleado"""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._cond = threading.Condition()
+        # Se parte de la hora actual para que los IDs sigan creciendo tras un reinicio
+        self._seq = int(time.time() * 1000)
+        self._eventos = {}  # {empleado_id: deque de eventos}
+        self._actualizado = {}  # {empleado_id: time.monotonic() del último evento}
+        self.stats = {
+            'publicados': 0,
+            'suscriptores': 0
+        }
+
+    def publicar(self, empleado_id, fase, mensaje=None, **datos):
+        """
+        Publica un evento de progreso y despierta a los clientes que esperan
+
+        Args:
+            empleado_id: ID del empleado sincronizado
+            fase: Una de FASES
+            mensaje: Texto opcional para mostrar
+            **datos: Campos adicionales (job_id, dias_actualizados...)
+        """
+        if fase not in FASES:
+            raise ValueError(f"Fase de sincronización desconocida: {fase}")
+
+        with self._cond:
+            self._seq += 1
+            evento = {
+                'id': self._seq,
+                'empleado_id': empleado_id,
+                'fase': fase,
+                'terminado': fase in FASES_FINALES,
+                'mensaje': mensaje,
+                'fecha': datetime.now().isoformat(),
+                **datos
+            }
+            cola = self._eventos.get(empleado_id)
+            if cola is None:
+                cola = self._eventos[empleado_id] = deque(maxlen=EVENTOS_POR_EMPLEADO)
+            cola.append(evento)
+            self._actualizado[empleado_id] = time.monotonic()
+            self.stats['publicados'] += 1
+            self._purgar()
+            self._cond.notify_all()
+        return evento
+
+    def publicar_seguro(self, empleado_id, fase, mensaje=None, **datos):
+        """Como publicar, pero nunca interrumpe la sincronización por un fallo aquí"""
+        try:
+            return self.publicar(empleado_id, fase, mensaje, **datos)
+        except Exception as e:
+            print(f"Error al publicar evento de sincronización: {e}")
+            return None
+
+    def ultimo(self, empleado_id):
+        """Último evento del empleado o None"""
+        with self._cond:
+            cola = self._eventos.get(empleado_id)
+            return cola[-1] if cola else None
+
+    def esperar(self, empleado_id, desde=0, timeout=25):
+        """
+        Espera eventos del empleado posteriores al ID indicado
+
+        Args:
+            empleado_id: ID del empleado
+            desde: ID del último evento recibido por el cliente
+            timeout: Segundos máximos de espera
+
+        Returns:
+            list: Eventos nuevos (vacía si vence el timeout)
+        """
+        limite = time.monotonic() + timeout
+        with self._cond:
+            self.stats['suscriptores'] += 1
+            try:
+                while True:
+                    nuevos = [e for e in self._eventos.get(empleado_id, ()) if e['id'] > desde]
+                    if nuevos:
+                        return nuevos
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        return []
+                    self._cond.wait(restante)
+            finally:
+                self.stats['suscriptores'] -= 1
+
+    def _purgar(self):
+        """Elimina los empleados sin eventos recientes (con el lock tomado)"""
+        limite = time.monotonic() - self.ttl
+        for empleado_id in [k for k, t in self._actualizado.items() if t < limite]:
+            self._eventos.pop(empleado_id, None)
+            self._actualizado.pop(empleado_id, None)
+
+    def get_stats(self):
+        """Estadísticas del canal"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['empleados'] = len(self._eventos)
+            stats['ultimo_id'] = self._seq
+        return stats
+
+
+sync_eventos = SyncEventos(
+    ttl=int(os.getenv('SYNC_EVENTOS_TTL', '3600'))
+)
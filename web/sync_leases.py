@@ -0,0 +1,278 @@
+"""
+Reparto de la sincronización automática entre varios procesos mediante concesiones
+
+Cada empleado activo con credenciales SITA tiene una fila en sync_leases con la fecha de
+su próxima sincronización. Los procesos de sincronización (standalone_sync.py o la
+aplicación web, en uno o varios servidores) reclaman empleados vencidos con
+SELECT ... FOR UPDATE SKIP LOCKED: dos procesos nunca reciben el mismo empleado y no se
+esperan entre sí.
+
+- La concesión caduca a los lease_ttl segundos; un hilo de latido la renueva mientras el
+  proceso sigue trabajando
+- Si un proceso muere, sus concesiones caducan y otro las reclama
+- Al terminar (bien o mal) se libera la concesión y la próxima sincronización queda a
+  un intervalo: cada empleado se sincroniza una vez por intervalo entre todos los procesos
+
+Todas las fechas se calculan con NOW() del servidor MySQL (sin depender del reloj de
+cada máquina). Requiere MySQL 8.0 o superior (SKIP LOCKED).
+"""
+
+import os
+import socket
+import threading
+import uuid
+from database import db_connection, execute_query, close_db_connection
+
+
+class SyncLeases:
+    """Concesiones de sincronización por empleado con latido y recuperación"""
+
+    def __init__(self, intervalo=3600, lease_ttl=300):
+        self.intervalo = intervalo
+        self.lease_ttl = lease_ttl
+        self.instancia = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._propias = set()
+        self._stop_event = threading.Event()
+        self._latido = None
+        self.stats = {
+            'reclamadas': 0,
+            'recuperadas': 0,
+            'liberadas': 0,
+            'perdidas': 0,
+            'latidos': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Latido
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Arranca el hilo de latido que renueva las concesiones propias"""
+        if self._latido and self._latido.is_alive():
+            return
+        self._stop_event.clear()
+        self._latido = threading.Thread(target=self._latido_loop, name="SyncLeasesHeartbeat", daemon=True)
+        self._latido.start()
+
+    def stop(self):
+        """Detiene el latido y libera las concesiones que queden (sin aplazarlas)"""
+        self._stop_event.set()
+        if self._latido:
+            self._latido.join(timeout=5)
+        try:
+            self.liberar_todas()
+        except Exception as e:
+            print(f"Error al liberar concesiones de sincronización: {e}")
+
+    def _latido_loop(self):
+        """Renueva las concesiones propias cada tercio de su duración"""
+        while not self._stop_event.wait(max(1, self.lease_ttl / 3)):
+            try:
+                self.renovar()
+            except Exception as e:
+                print(f"Error al renovar concesiones de sincronización: {e}")
+            finally:
+                close_db_connection()
+
+    def renovar(self):
+        """
+        Alarga las concesiones propias; las que ya no son nuestras (caducaron y otro
+        proceso las reclamó) se dejan de renovar
+
+        Returns:
+            int: Concesiones renovadas
+        """
+        with self._lock:
+            propias = sorted(self._propias)
+        if not propias:
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(propias))
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        UPDATE sync_leases
+                        SET lease_hasta = NOW() + INTERVAL %s SECOND
+                        WHERE propietario = %s AND empleado_id IN ({placeholders})
+                        """,
+                        [self.lease_ttl, self.instancia] + propias
+                    )
+                    cursor.execute(
+                        f"""
+                        SELECT empleado_id FROM sync_leases
+                        WHERE propietario = %s AND empleado_id IN ({placeholders})
+                        """,
+                        [self.instancia] + propias
+                    )
+                    vigentes = {row['empleado_id'] for row in cursor.fetchall()}
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        perdidas = set(propias) - vigentes
+        with self._lock:
+            self._propias -= perdidas
+            self.stats['latidos'] += 1
+            self.stats['perdidas'] += len(perdidas)
+        if perdidas:
+            print(f"Concesiones perdidas por {self.instancia}: {sorted(perdidas)}")
+        return len(vigentes)
+
+    # ------------------------------------------------------------------
+    # Reparto
+    # ------------------------------------------------------------------
+
+    def registrar_empleados(self):
+        """
+        Crea la concesión de los empleados activos con credenciales que aún no la tienen
+        (vencida, para sincronizarlos cuanto antes)
+
+        Returns:
+            int: Empleados registrados
+        """
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        INSERT IGNORE INTO sync_leases (empleado_id, proxima_sync)
+                        SELECT e.id, NOW()
+                        FROM empleados e
+                        INNER JOIN credenciales_sita c ON e.id = c.empleado_id
+                        WHERE e.activo = 1
+                        """
+                    )
+                    nuevos = cursor.rowcount
+                conn.commit()
+                return nuevos
+            except Exception:
+                conn.rollback()
+                raise
+
+    def reclamar(self, limite=1):
+        """
+        Reclama hasta 'limite' empleados vencidos, libres o con la concesión caducada
+
+        Returns:
+            list: IDs de los empleados reclamados (por antigüedad de vencimiento)
+        """
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        SELECT l.empleado_id, l.propietario
+                        FROM sync_leases l
+                        INNER JOIN empleados e ON e.id = l.empleado_id
+                        WHERE e.activo = 1
+                          AND l.proxima_sync <= NOW()
+                          AND (l.propietario IS NULL OR l.lease_hasta < NOW())
+                        ORDER BY l.proxima_sync
+                        LIMIT %s
+                        FOR UPDATE OF l SKIP LOCKED
+                        """,
+                        (limite,)
+                    )
+                    filas = cursor.fetchall()
+                    if not filas:
+                        conn.commit()
+                        return []
+
+                    ids = [fila['empleado_id'] for fila in filas]
+                    placeholders = ", ".join(["%s"] * len(ids))
+                    cursor.execute(
+                        f"""
+                        UPDATE sync_leases
+                        SET propietario = %s, lease_hasta = NOW() + INTERVAL %s SECOND
+                        WHERE empleado_id IN ({placeholders})
+                        """,
+                        [self.instancia, self.lease_ttl] + ids
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        recuperadas = sum(1 for fila in filas if fila['propietario'])
+        with self._lock:
+            self._propias.update(ids)
+            self.stats['reclamadas'] += len(ids)
+            self.stats['recuperadas'] += recuperadas
+        if recuperadas:
+            print(f"{self.instancia} recupera {recuperadas} concesiones caducadas")
+        return ids
+
+    def liberar(self, empleado_id, sincronizado=True, intervalo=None):
+        """
+        Libera la concesión de un empleado
+
+        Args:
+            empleado_id: ID del empleado
+            sincronizado: Si se intentó sincronizar (la próxima queda a un intervalo);
+                con False vuelve a estar disponible enseguida
+            intervalo: Segundos hasta la próxima sincronización (por defecto el general)
+        """
+        with self._lock:
+            self._propias.discard(empleado_id)
+
+        if sincronizado:
+            query = """
+                UPDATE sync_leases
+                SET propietario = NULL, lease_hasta = NULL,
+                    ultima_sync = NOW(), proxima_sync = NOW() + INTERVAL %s SECOND
+                WHERE empleado_id = %s AND propietario = %s
+            """
+            params = (int(intervalo or self.intervalo), empleado_id, self.instancia)
+        else:
+            query = """
+                UPDATE sync_leases
+                SET propietario = NULL, lease_hasta = NULL
+                WHERE empleado_id = %s AND propietario = %s
+            """
+            params = (empleado_id, self.instancia)
+        execute_query(query, params, commit=True)
+
+        with self._lock:
+            self.stats['liberadas'] += 1
+
+    def liberar_todas(self):
+        """Libera sin aplazar todas las concesiones de esta instancia (al parar)"""
+        with self._lock:
+            self._propias.clear()
+        execute_query(
+            """
+            UPDATE sync_leases
+            SET propietario = NULL, lease_hasta = NULL
+            WHERE propietario = %s
+            """,
+            (self.instancia,),
+            commit=True
+        )
+
+    def segundos_hasta_proxima(self):
+        """Segundos hasta el siguiente vencimiento (None si no hay empleados)"""
+        result = execute_query(
+            """
+            SELECT TIMESTAMPDIFF(SECOND, NOW(), MIN(proxima_sync)) AS segundos
+            FROM sync_leases
+            WHERE propietario IS NULL OR lease_hasta < NOW()
+            """,
+            fetchone=True
+        )
+        if not result or result['segundos'] is None:
+            return None
+        return max(0, result['segundos'])
+
+    def get_stats(self):
+        """Estadísticas de esta instancia"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['propias'] = sorted(self._propias)
+        stats['instancia'] = self.instancia
+        stats['intervalo'] = self.intervalo
+        stats['lease_ttl'] = self.lease_ttl
+        return stats
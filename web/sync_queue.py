@@ -0,0 +1,487 @@
+"""
+Cola de trabajos de sincronización persistida en base de datos
+
+Sustituye al hilo por clic de la sincronización manual:
+- Cada petición crea (o reutiliza) un trabajo en la tabla sync_jobs y devuelve su ID
+- Un pool fijo de hilos procesa los trabajos por prioridad (manual antes que auto)
+- Solo puede haber un trabajo pendiente o en curso por empleado (columna clave_activa)
+- Los trabajos sobreviven a un reinicio: los que quedaron 'en_curso' de otra instancia
+  se vuelven a encolar y se limpia sincronizacion_en_progreso de sus empleados
+- Un hilo de latido refresca fecha_actualizacion de los trabajos en curso, para que una
+  fase lenta contra SITA no se confunda con un trabajo abandonado
+"""
+
+import os
+import socket
+import threading
+import traceback
+import uuid
+import pymysql
+from database import db_connection, execute_query, close_db_connection
+from models.credencial_sita import CredencialSita
+from sync_eventos import sync_eventos
+
+# Carriles de prioridad (menor valor = antes)
+PRIORIDADES = {
+    'manual': 0,
+    'auto': 10
+}
+
+# Estados de un trabajo
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_EN_CURSO = 'en_curso'
+ESTADO_COMPLETADO = 'completado'
+ESTADO_ERROR = 'error'
+
+# Fase del trabajo -> fase publicada en el canal de eventos
+FASES_EVENTO = {
+    'credenciales': 'auth',
+    'sita': 'fetch',
+    'guardando': 'diff',
+    'completado': 'done',
+    'error': 'error'
+}
+
+# Columnas que se devuelven al consultar un trabajo
+COLUMNAS_TRABAJO = """
+    id, empleado_id, origen, prioridad, estado, fase, dias_actualizados, mensaje,
+    intentos, fecha_creacion, fecha_inicio, fecha_fin, fecha_actualizacion
+"""
+
+
+class SyncQueue:
+    """Cola de sincronización con pool fijo de hilos"""
+
+    def __init__(self, workers=2, poll_interval=2, stale_seconds=120, max_intentos=3):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_seconds = stale_seconds
+        self.max_intentos = max_intentos
+        self.instancia = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.running = False
+        self._threads = []
+        self._stop_event = threading.Event()
+        self._nuevo_trabajo = threading.Event()
+        self._lock = threading.Lock()
+        self._activos = {}
+        self._en_curso = set()  # IDs de los trabajos que ejecutan los hilos de esta instancia
+        self._latido = None
+        self.stats = {
+            'encolados': 0,
+            'deduplicados': 0,
+            'completados': 0,
+            'errores': 0,
+            'recuperados': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Arranca el pool de hilos (no hace nada si workers es 0 o ya está en marcha)"""
+        if self.running or self.workers < 1:
+            return
+
+        self.running = True
+        self._stop_event.clear()
+
+        try:
+            self.recuperar_trabajos()
+        except Exception as e:
+            print(f"Error al recuperar trabajos de sincronización: {e}")
+
+        self._threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, args=(i,), name=f"SyncQueueWorker-{i + 1}")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        self._latido = threading.Thread(target=self._latido_loop, name="SyncQueueHeartbeat", daemon=True)
+        self._latido.start()
+        print(f"Cola de sincronización iniciada con {self.workers} hilos ({self.instancia})")
+
+    def stop(self, timeout=5):
+        """Detiene el pool; los trabajos en curso se recuperarán en el próximo arranque"""
+        self.running = False
+        self._stop_event.set()
+        self._nuevo_trabajo.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+        if self._latido:
+            self._latido.join(timeout=timeout)
+            self._latido = None
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def encolar(self, empleado_id, origen='manual'):
+        """
+        Encola una sincronización para un empleado
+
+        Si ya tiene un trabajo pendiente o en curso se devuelve ese mismo trabajo;
+        si el existente es automático y pendiente y llega uno manual, sube de prioridad.
+
+        Returns:
+            tuple: (job_id, nuevo)
+        """
+        prioridad = PRIORIDADES.get(origen, PRIORIDADES['auto'])
+
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    try:
+                        cursor.execute("""
+                            INSERT INTO sync_jobs (empleado_id, clave_activa, origen, prioridad, estado, fase)
+                            VALUES (%s, %s, %s, %s, 'pendiente', 'en_cola')
+                        """, (empleado_id, empleado_id, origen, prioridad))
+                        job_id = cursor.lastrowid
+                        nuevo = True
+                    except pymysql.err.IntegrityError as e:
+                        # 1062: ya hay un trabajo activo para este empleado (clave_activa única)
+                        if e.args[0] != 1062:
+                            raise
+                        cursor.execute("""
+                            UPDATE sync_jobs
+                            SET origen = IF(%s < prioridad, %s, origen),
+                                prioridad = LEAST(prioridad, %s)
+                            WHERE clave_activa = %s
+                        """, (prioridad, origen, prioridad, empleado_id))
+                        cursor.execute("SELECT id FROM sync_jobs WHERE clave_activa = %s", (empleado_id,))
+                        existente = cursor.fetchone()
+                        job_id = existente['id'] if existente else None
+                        nuevo = False
+
+                    # La sincronización manual se muestra como en curso desde el primer momento
+                    if origen == 'manual':
+                        cursor.execute("""
+                            UPDATE empleados
+                            SET sincronizacion_en_progreso = 1,
+                                ultimo_error_sincronizacion = NULL
+                            WHERE id = %s
+                        """, (empleado_id,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        with self._lock:
+            self.stats['encolados' if nuevo else 'deduplicados'] += 1
+        self._nuevo_trabajo.set()
+        return job_id, nuevo
+
+    @staticmethod
+    def obtener_trabajo(job_id, empleado_id=None):
+        """Devuelve un trabajo (opcionalmente solo si pertenece al empleado)"""
+        query = f"SELECT {COLUMNAS_TRABAJO} FROM sync_jobs WHERE id = %s"
+        params = [job_id]
+        if empleado_id is not None:
+            query += " AND empleado_id = %s"
+            params.append(empleado_id)
+        return execute_query(query, params, fetchone=True)
+
+    @staticmethod
+    def ultimo_trabajo(empleado_id):
+        """Devuelve el trabajo más reciente de un empleado"""
+        query = f"""
+            SELECT {COLUMNAS_TRABAJO} FROM sync_jobs
+            WHERE empleado_id = %s
+            ORDER BY id DESC
+            LIMIT 1
+        """
+        return execute_query(query, (empleado_id,), fetchone=True)
+
+    def get_stats(self):
+        """Estadísticas de la cola"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['activos'] = dict(self._activos)
+        stats['running'] = self.running
+        stats['workers'] = self.workers
+        stats['instancia'] = self.instancia
+        try:
+            filas = execute_query("""
+                SELECT origen, COUNT(*) AS total
+                FROM sync_jobs
+                WHERE estado = 'pendiente'
+                GROUP BY origen
+            """)
+            stats['pendientes'] = {fila['origen']: fila['total'] for fila in filas}
+        except Exception as e:
+            stats['pendientes'] = {}
+            stats['error'] = str(e)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Recuperación tras reinicio
+    # ------------------------------------------------------------------
+
+    def recuperar_trabajos(self):
+        """
+        Vuelve a encolar los trabajos 'en_curso' abandonados por otra instancia y limpia
+        la marca sincronizacion_en_progreso solo de sus empleados (el gestor automático
+        también la usa para las sincronizaciones que hace fuera de la cola)
+        """
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT id, empleado_id, origen, intentos
+                        FROM sync_jobs
+                        WHERE estado = 'en_curso' AND worker <> %s
+                          AND fecha_actualizacion < NOW() - INTERVAL %s SECOND
+                        FOR UPDATE SKIP LOCKED
+                    """, (self.instancia, self.stale_seconds))
+                    abandonados = cursor.fetchall()
+                    fallidos = [t for t in abandonados if t['intentos'] >= self.max_intentos]
+                    reencolados = [t for t in abandonados if t['intentos'] < self.max_intentos]
+
+                    # Trabajos que han agotado los intentos: se dan por fallidos
+                    if fallidos:
+                        placeholders = ", ".join(["%s"] * len(fallidos))
+                        cursor.execute(f"""
+                            UPDATE sync_jobs
+                            SET estado = 'error', fase = 'error', clave_activa = NULL, fecha_fin = NOW(),
+                                mensaje = 'Trabajo interrumpido demasiadas veces'
+                            WHERE id IN ({placeholders})
+                        """, [t['id'] for t in fallidos])
+
+                    if reencolados:
+                        placeholders = ", ".join(["%s"] * len(reencolados))
+                        cursor.execute(f"""
+                            UPDATE sync_jobs
+                            SET estado = 'pendiente', fase = 'en_cola', worker = NULL
+                            WHERE id IN ({placeholders})
+                        """, [t['id'] for t in reencolados])
+                    recuperados = len(reencolados)
+
+                    # Los manuales pendientes se siguen mostrando en curso, como al encolarlos
+                    liberar = sorted(
+                        {t['empleado_id'] for t in fallidos}
+                        | {t['empleado_id'] for t in reencolados if t['origen'] != 'manual'}
+                    )
+                    liberados = 0
+                    if liberar:
+                        placeholders = ", ".join(["%s"] * len(liberar))
+                        cursor.execute(f"""
+                            UPDATE empleados
+                            SET sincronizacion_en_progreso = 0
+                            WHERE id IN ({placeholders})
+                        """, liberar)
+                        liberados = cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        if recuperados or liberados:
+            print(f"Cola de sincronización: {recuperados} trabajos recuperados, "
+                  f"{liberados} empleados desbloqueados")
+        with self._lock:
+            self.stats['recuperados'] += recuperados
+        return recuperados
+
+    def _latido_loop(self):
+        """Refresca los trabajos en curso cada tercio de stale_seconds"""
+        while not self._stop_event.wait(max(1, self.stale_seconds / 3)):
+            try:
+                self.renovar()
+            except Exception as e:
+                print(f"Error al renovar trabajos de sincronización: {e}")
+            finally:
+                close_db_connection()
+
+    def renovar(self):
+        """
+        Marca como vivos los trabajos en curso de esta instancia
+
+        Returns:
+            int: Trabajos renovados
+        """
+        with self._lock:
+            en_curso = sorted(self._en_curso)
+        if not en_curso:
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(en_curso))
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        UPDATE sync_jobs
+                        SET fecha_actualizacion = NOW()
+                        WHERE estado = 'en_curso' AND worker = %s AND id IN ({placeholders})
+                        """,
+                        [self.instancia] + en_curso
+                    )
+                    renovados = cursor.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return renovados
+
+    # ------------------------------------------------------------------
+    # Hilos de trabajo
+    # ------------------------------------------------------------------
+
+    def _worker_loop(self, indice):
+        """Bucle de un hilo del pool"""
+        nombre = threading.current_thread().name
+        esperas = 0
+
+        while not self._stop_event.is_set():
+            trabajo = None
+            try:
+                trabajo = self._reclamar()
+            except Exception as e:
+                print(f"Error al reclamar trabajo de sincronización: {e}")
+
+            if trabajo is None:
+                self._nuevo_trabajo.wait(self.poll_interval)
+                self._nuevo_trabajo.clear()
+                close_db_connection()
+
+                # El primer hilo revisa de vez en cuando si hay trabajos abandonados
+                esperas += 1
+                if indice == 0 and esperas * self.poll_interval >= self.stale_seconds:
+                    esperas = 0
+                    try:
+                        self.recuperar_trabajos()
+                    except Exception as e:
+                        print(f"Error al recuperar trabajos de sincronización: {e}")
+                continue
+
+            with self._lock:
+                self._activos[nombre] = trabajo['empleado_id']
+                self._en_curso.add(trabajo['id'])
+            sync_eventos.publicar_seguro(trabajo['empleado_id'], 'auth', job_id=trabajo['id'])
+            try:
+                self._ejecutar(trabajo)
+            finally:
+                with self._lock:
+                    self._activos.pop(nombre, None)
+                    self._en_curso.discard(trabajo['id'])
+                close_db_connection()
+
+    def _reclamar(self):
+        """
+        Toma el siguiente trabajo pendiente por prioridad y lo marca en curso
+        (SKIP LOCKED: los hilos no esperan por la fila que otro está reclamando)
+        """
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT id, empleado_id, origen
+                        FROM sync_jobs
+                        WHERE estado = 'pendiente'
+                        ORDER BY prioridad, id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    """)
+                    trabajo = cursor.fetchone()
+                    if not trabajo:
+                        conn.commit()
+                        return None
+
+                    cursor.execute("""
+                        UPDATE sync_jobs
+                        SET estado = 'en_curso', fase = 'credenciales', worker = %s,
+                            intentos = intentos + 1, fecha_inicio = NOW()
+                        WHERE id = %s
+                    """, (self.instancia, trabajo['id']))
+                    cursor.execute("""
+                        UPDATE empleados
+                        SET sincronizacion_en_progreso = 1
+                        WHERE id = %s
+                    """, (trabajo['empleado_id'],))
+                conn.commit()
+                return trabajo
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _fase(self, trabajo, fase):
+        """Registra la fase actual de un trabajo y la publica"""
+        execute_query("UPDATE sync_jobs SET fase = %s WHERE id = %s", (fase, trabajo['id']), commit=True)
+        sync_eventos.publicar_seguro(trabajo['empleado_id'], FASES_EVENTO[fase], job_id=trabajo['id'])
+
+    def _finalizar(self, trabajo, ok, dias_actualizados=None, mensaje=None):
+        """Cierra el trabajo y actualiza el estado de sincronización del empleado"""
+        with db_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE sync_jobs
+                        SET estado = %s, fase = %s, dias_actualizados = %s, mensaje = %s,
+                            clave_activa = NULL, fecha_fin = NOW()
+                        WHERE id = %s
+                    """, (
+                        ESTADO_COMPLETADO if ok else ESTADO_ERROR,
+                        'completado' if ok else 'error',
+                        dias_actualizados,
+                        mensaje[:500] if mensaje else None,
+                        trabajo['id']
+                    ))
+                    cursor.execute("""
+                        UPDATE empleados
+                        SET sincronizacion_en_progreso = 0,
+                            ultima_sincronizacion = NOW(),
+                            ultimo_error_sincronizacion = %s
+                        WHERE id = %s
+                    """, (None if ok else (mensaje or '')[:500], trabajo['empleado_id']))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        with self._lock:
+            self.stats['completados' if ok else 'errores'] += 1
+
+        sync_eventos.publicar_seguro(
+            trabajo['empleado_id'], 'done' if ok else 'error', mensaje,
+            job_id=trabajo['id'], dias_actualizados=dias_actualizados
+        )
+
+    def _ejecutar(self, trabajo):
+        """Ejecuta la sincronización de un trabajo"""
+        # Importación diferida: las rutas importan este módulo
+        from routes.sincronizacion_routes import obtener_turnos_sita, insertar_turnos_en_bd
+
+        empleado_id = trabajo['empleado_id']
+        try:
+            credenciales = CredencialSita.obtener_por_empleado(empleado_id)
+            if not credenciales:
+                self._finalizar(trabajo, False, mensaje='No hay credenciales SITA configuradas')
+                return
+
+            self._fase(trabajo, 'sita')
+            turnos = obtener_turnos_sita(credenciales)
+            if not turnos:
+                print(f"No se encontraron turnos para el usuario ID {empleado_id}")
+                self._finalizar(trabajo, True, 0, 'No se encontraron turnos en SITA')
+                return
+
+            self._fase(trabajo, 'guardando')
+            actualizados = insertar_turnos_en_bd(empleado_id, turnos)
+            print(f"Sincronización completada para usuario ID {empleado_id} ({actualizados} días)")
+            self._finalizar(trabajo, True, actualizados, f'{actualizados} días actualizados')
+        except Exception as e:
+            print(f"Error durante la sincronización para usuario ID {empleado_id}: {e}")
+            traceback.print_exc()
+            try:
+                self._finalizar(trabajo, False, mensaje=str(e))
+            except Exception as e2:
+                print(f"Error al cerrar el trabajo de sincronización {trabajo['id']}: {e2}")
+
+
+sync_queue = SyncQueue(
+    workers=int(os.getenv('SYNC_QUEUE_WORKERS', '2')),
+    poll_interval=float(os.getenv('SYNC_QUEUE_POLL_INTERVAL', '2')),
+    stale_seconds=int(os.getenv('SYNC_QUEUE_STALE_SECONDS', '120')),
+    max_intentos=int(os.getenv('SYNC_QUEUE_MAX_INTENTOS', '3'))
+)
@@ -0,0 +1,265 @@
+"""
+Planificador adaptativo de la sincronización automática
+
+En lugar de sincronizar a todos los usuarios cada intervalo, cada usuario tiene su propia
+próxima sincronización en una cola de prioridad (heap):
+
+- Prioridad (0 a 1) según el último acceso a la aplicación, la frecuencia histórica de
+  cambios en su cuadrante (media de días actualizados por sincronización, tabla
+  sync_actividad) y la cercanía de su próximo turno
+- Intervalo propio: AUTO_SYNC_CYCLE_INTERVAL para la prioridad máxima, hasta
+  MAX_INTERVAL_FACTOR veces más para los usuarios sin actividad ni cambios
+- Entre los vencidos se sincronizan antes los más atrasados respecto a su intervalo y los
+  de mayor prioridad
+- Los vencidos al arrancar se reparten a lo largo de un intervalo y cada reprogramación
+  lleva un pequeño desfase aleatorio, para que la carga contra SITA sea uniforme
+- MAX_USERS_PER_CYCLE limita las sincronizaciones en cualquier ventana de un intervalo
+"""
+
+import heapq
+import math
+import random
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from database import execute_query
+
+# Peso de la última sincronización en la media de días actualizados
+ALFA_CAMBIOS = 0.3
+
+# Desfase aleatorio de cada reprogramación (fracción del intervalo del usuario)
+DESFASE = 0.1
+
+# Pesos de cada factor en la prioridad
+PESO_ACCESO = 0.4
+PESO_CAMBIOS = 0.35
+PESO_TURNOS = 0.25
+
+# Atraso máximo considerado al ordenar (en intervalos del usuario)
+ATRASO_MAXIMO = 3
+
+
+class SyncScheduler:
+    """Cola de prioridad con la próxima sincronización de cada usuario"""
+
+    def __init__(self, intervalo=3600, factor_max=6, max_por_ciclo=0, refresco=300):
+        self.intervalo = intervalo
+        self.factor_max = max(1, factor_max)
+        self.max_por_ciclo = max_por_ciclo
+        self.refresco = refresco
+        self._lock = threading.Lock()
+        self._heap = []
+        self._programado = {}
+        self._usuarios = {}
+        self._despachos = deque()
+        self._ultima_carga = None
+
+    # ------------------------------------------------------------------
+    # Historial de cambios
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def registrar_cambios(empleado_id, dias):
+        """
+        Acumula el resultado de una sincronización en sync_actividad
+
+        Args:
+            empleado_id: ID del empleado
+            dias: Días actualizados (0 si la respuesta de SITA no cambió nada)
+        """
+        execute_query(
+            """
+            INSERT INTO sync_actividad (empleado_id, sincronizaciones, con_cambios, cambios_media, ultimo_cambio)
+            VALUES (%s, 1, %s, %s, IF(%s > 0, NOW(), NULL))
+            ON DUPLICATE KEY UPDATE
+                sincronizaciones = sincronizaciones + 1,
+                con_cambios = con_cambios + VALUES(con_cambios),
+                cambios_media = cambios_media * %s + VALUES(cambios_media) * %s,
+                ultimo_cambio = IF(VALUES(con_cambios) > 0, NOW(), ultimo_cambio)
+            """,
+            (empleado_id, int(dias > 0), dias, dias, 1 - ALFA_CAMBIOS, ALFA_CAMBIOS),
+            commit=True
+        )
+
+    # ------------------------------------------------------------------
+    # Prioridad
+    # ------------------------------------------------------------------
+
+    def prioridad(self, user, ahora=None):
+        """
+        Prioridad de 0 a 1 a partir de los campos ultimo_acceso, cambios_media y
+        proximo_turno del usuario (los que falten cuentan como 0)
+        """
+        ahora = ahora or datetime.now()
+
+        acceso = 0.0
+        if user.get('ultimo_acceso'):
+            dias = max(0.0, (ahora - user['ultimo_acceso']).total_seconds() / 86400)
+            acceso = math.exp(-dias / 7)
+
+        cambios = 1 - math.exp(-float(user.get('cambios_media') or 0))
+
+        turnos = 0.0
+        if user.get('proximo_turno'):
+            # proximo_turno viene de turno_shift, en UTC naive (ahora es hora local)
+            ahora_utc = ahora.astimezone(timezone.utc).replace(tzinfo=None)
+            horas = max(0.0, (user['proximo_turno'] - ahora_utc).total_seconds() / 3600)
+            turnos = math.exp(-horas / 48)
+
+        return PESO_ACCESO * acceso + PESO_CAMBIOS * cambios + PESO_TURNOS * turnos
+
+    def intervalo_para(self, user, ahora=None):
+        """Segundos entre sincronizaciones del usuario según su prioridad"""
+        prioridad = self.prioridad(user, ahora)
+        return self.intervalo * self.factor_max ** (1 - prioridad)
+
+    def _con_desfase(self, segundos):
+        return segundos * random.uniform(1 - DESFASE, 1 + DESFASE)
+
+    def _puntuacion(self, user, ahora):
+        """Orden entre vencidos: atraso relativo a su intervalo más prioridad"""
+        intervalo = self.intervalo_para(user, ahora)
+        if user.get('ultima_sincronizacion'):
+            atraso = (ahora - user['ultima_sincronizacion']).total_seconds() / intervalo
+        else:
+            atraso = ATRASO_MAXIMO
+        return min(ATRASO_MAXIMO, max(0.0, atraso)) + self.prioridad(user, ahora)
+
+    # ------------------------------------------------------------------
+    # Cola
+    # ------------------------------------------------------------------
+
+    def _programar(self, empleado_id, cuando):
+        """Fija la próxima sincronización (requiere tener el lock)"""
+        self._programado[empleado_id] = cuando
+        heapq.heappush(self._heap, (cuando, empleado_id))
+
+    def necesita_refresco(self, ahora=None):
+        """Indica si toca volver a leer la lista de usuarios"""
+        ahora = ahora or datetime.now()
+        return self._ultima_carga is None or (ahora - self._ultima_carga).total_seconds() >= self.refresco
+
+    def actualizar(self, users, ahora=None):
+        """
+        Sustituye la lista de usuarios a sincronizar
+
+        Los usuarios que ya estaban conservan su próxima sincronización; los nuevos se
+        programan a un intervalo propio de su última sincronización y, si ya están
+        vencidos, se reparten a lo largo de un intervalo por orden de puntuación.
+        """
+        ahora = ahora or datetime.now()
+        with self._lock:
+            self._usuarios = {user['id']: user for user in users}
+            for empleado_id in list(self._programado):
+                if empleado_id not in self._usuarios:
+                    del self._programado[empleado_id]
+
+            atrasados = []
+            for empleado_id, user in self._usuarios.items():
+                if empleado_id in self._programado:
+                    continue
+                if user.get('ultima_sincronizacion'):
+                    cuando = user['ultima_sincronizacion'] + timedelta(
+                        seconds=self._con_desfase(self.intervalo_para(user, ahora))
+                    )
+                    if cuando > ahora:
+                        self._programar(empleado_id, cuando)
+                        continue
+                atrasados.append(user)
+
+            atrasados.sort(key=lambda user: self._puntuacion(user, ahora), reverse=True)
+            paso = self.intervalo / len(atrasados) if atrasados else 0
+            for i, user in enumerate(atrasados):
+                self._programar(user['id'], ahora + timedelta(seconds=i * paso))
+
+            self._ultima_carga = ahora
+            return len(atrasados)
+
+    def _cupo(self, ahora):
+        """Sincronizaciones disponibles en la ventana actual (None = sin límite)"""
+        if self.max_por_ciclo <= 0:
+            return None
+        limite = ahora - timedelta(seconds=self.intervalo)
+        while self._despachos and self._despachos[0] <= limite:
+            self._despachos.popleft()
+        return max(0, self.max_por_ciclo - len(self._despachos))
+
+    def vencidos(self, ahora=None):
+        """
+        Saca de la cola los usuarios vencidos, de mayor a menor puntuación, respetando
+        MAX_USERS_PER_CYCLE (los que no caben siguen vencidos en la cola)
+
+        Hay que llamar a reprogramar() con cada uno al terminar.
+        """
+        ahora = ahora or datetime.now()
+        with self._lock:
+            cupo = self._cupo(ahora)
+            if cupo == 0:
+                return []
+
+            lote = []
+            while self._heap and self._heap[0][0] <= ahora:
+                cuando, empleado_id = heapq.heappop(self._heap)
+                if self._programado.get(empleado_id) != cuando:
+                    continue  # Entrada antigua de un usuario reprogramado o retirado
+                del self._programado[empleado_id]
+                lote.append(self._usuarios[empleado_id])
+
+            lote.sort(key=lambda user: self._puntuacion(user, ahora), reverse=True)
+            if cupo is not None and len(lote) > cupo:
+                for user in lote[cupo:]:
+                    self._programar(user['id'], ahora)
+                lote = lote[:cupo]
+
+            if cupo is not None:
+                self._despachos.extend([ahora] * len(lote))
+            return lote
+
+    def reprogramar(self, user, ahora=None):
+        """Programa la siguiente sincronización de un usuario a un intervalo propio"""
+        ahora = ahora or datetime.now()
+        with self._lock:
+            if user['id'] not in self._usuarios:
+                return
+            user['ultima_sincronizacion'] = ahora
+            self._programar(user['id'], ahora + timedelta(seconds=self._con_desfase(self.intervalo_para(user, ahora))))
+
+    def aplazar(self, user, segundos, ahora=None):
+        """Vuelve a poner en cola un usuario que no se ha podido sincronizar"""
+        ahora = ahora or datetime.now()
+        with self._lock:
+            if user['id'] not in self._usuarios:
+                return
+            self._programar(user['id'], ahora + timedelta(seconds=self._con_desfase(segundos)))
+
+    def segundos_hasta_proximo(self, ahora=None):
+        """Segundos hasta el siguiente vencimiento o liberación de cupo (None si no hay usuarios)"""
+        ahora = ahora or datetime.now()
+        with self._lock:
+            if not self._programado:
+                return None
+            espera = (min(self._programado.values()) - ahora).total_seconds()
+            if self._cupo(ahora) == 0:
+                libera = self._despachos[0] + timedelta(seconds=self.intervalo)
+                espera = max(espera, (libera - ahora).total_seconds())
+            return max(0.0, espera)
+
+    def get_stats(self, ahora=None):
+        """Resumen de la cola para el panel y la API de estado"""
+        ahora = ahora or datetime.now()
+        with self._lock:
+            usuarios = list(self._usuarios.values())
+            proxima = min(self._programado.values()) if self._programado else None
+            stats = {
+                'usuarios': len(usuarios),
+                'vencidos': sum(1 for cuando in self._programado.values() if cuando <= ahora),
+                'proxima_sincronizacion': proxima.isoformat() if proxima else None,
+                'max_por_ciclo': self.max_por_ciclo or None,
+                'cupo_disponible': self._cupo(ahora),
+                'ultima_carga': self._ultima_carga.isoformat() if self._ultima_carga else None
+            }
+        if usuarios:
+            intervalos = [self.intervalo_para(user, ahora) for user in usuarios]
+            stats['intervalo_medio_minutos'] = round(sum(intervalos) / len(intervalos) / 60, 1)
+            stats['prioridad_media'] = round(sum(self.prioridad(user, ahora) for user in usuarios) / len(usuarios), 3)
+        return stats
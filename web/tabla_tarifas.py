@@ -0,0 +1,262 @@
+"""
+Tabla precalculada de pluses por hora de la semana
+
+Las ventanas de madrugue, nocturnidad y domingo empiezan y terminan en horas en punto,
+así que cada plus es constante dentro de cada una de las 168 horas de la semana
+(lunes 00:00 = hueco 0). Para cada plus se guarda un indicador por hueco y su suma
+acumulada; las horas de un turno son la diferencia de dos acumulados, sin recorrer
+el turno hora a hora. Los acumulados se llevan en segundos enteros para que el
+resultado sea exacto.
+
+Los festivos se aplican como una capa aparte con el calendario de festivos.py: horas
+del turno que caen en un día festivo.
+
+La tabla se construye una vez por versión de tarifas y festivos (obtener_tabla) y el
+simulador puede pedir tablas con tarifas alternativas.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, date
+from config import TARIFAS
+from festivos import calendario_festivos, CalendarioFestivos
+
+HORAS_SEMANA = 168
+
+# Ventanas horarias de los pluses (horas desde el inicio de cada día)
+VENTANA_MADRUGUE = ((4, 7),)
+VENTANA_NOCTURNIDAD = ((0, 4), (22, 24))
+
+# Plus -> clave de la tarifa en TARIFAS
+TARIFA_PLUS = {
+    "madrugue": "plus_madrugue",
+    "nocturnidad": "plus_nocturnidad",
+    "domingo": "plus_domingo",
+    "festividad": "plus_festividad"
+}
+
+# Pluses que dependen solo de la hora de la semana
+PLUSES_SEMANALES = ("madrugue", "nocturnidad", "domingo")
+
+# Lunes de referencia para calcular la hora de la semana
+_EPOCA = datetime(1970, 1, 5)
+_ORDINAL_EPOCA = _EPOCA.toordinal()
+_SEGUNDOS_SEMANA = HORAS_SEMANA * 3600
+
+# Tablas alternativas que se mantienen en memoria (simulador)
+MAX_TABLAS = 16
+
+
+def _indicadores():
+    """Indicador 0/1 por hueco de la semana para cada plus semanal"""
+    indicadores = {plus: [0] * HORAS_SEMANA for plus in PLUSES_SEMANALES}
+    for hueco in range(HORAS_SEMANA):
+        dia_semana, hora = divmod(hueco, 24)
+        if any(desde <= hora < hasta for desde, hasta in VENTANA_MADRUGUE):
+            indicadores["madrugue"][hueco] = 1
+        if any(desde <= hora < hasta for desde, hasta in VENTANA_NOCTURNIDAD):
+            indicadores["nocturnidad"][hueco] = 1
+        if dia_semana == 6:
+            indicadores["domingo"][hueco] = 1
+    return indicadores
+
+
+def _segundos(momento):
+    """Segundos enteros desde la época en la hora local del instante"""
+    return int((momento.replace(tzinfo=None) - _EPOCA).total_seconds())
+
+
+def _acumular(valores):
+    """Sumas acumuladas con un elemento inicial a cero (longitud n + 1)"""
+    acumulado = [0] * (len(valores) + 1)
+    for i, valor in enumerate(valores):
+        acumulado[i + 1] = acumulado[i] + valor
+    return acumulado
+
+
+def _como_calendario(dias_festivos):
+    """Convierte una lista de fechas en CalendarioFestivos (el vigente si es None)"""
+    if dias_festivos is None:
+        return calendario_festivos()
+    if isinstance(dias_festivos, CalendarioFestivos):
+        return dias_festivos
+    return CalendarioFestivos(dias_festivos)
+
+
+def version_de(tarifas, calendario):
+    """Hash de unas tarifas y un calendario de festivos"""
+    datos = json.dumps({"tarifas": tarifas, "festivos": calendario.version}, sort_keys=True)
+    return hashlib.sha1(datos.encode("utf-8")).hexdigest()[:12]
+
+
+class TablaTarifas:
+    """Pluses por hora de la semana con sumas acumuladas y capa de festivos"""
+
+    def __init__(self, tarifas, dias_festivos):
+        self.tarifas = dict(tarifas)
+        self.festivos = _como_calendario(dias_festivos)
+        self.version = version_de(self.tarifas, self.festivos)
+
+        self.indicadores = _indicadores()
+        # Acumulado en segundos por plus: hueco h -> segundos de plus antes de h
+        self._acumulados = {
+            plus: [v * 3600 for v in _acumular(indicador)]
+            for plus, indicador in self.indicadores.items()
+        }
+        # Importe por hueco de todos los pluses semanales juntos (€/h)
+        self.importe_hueco = [
+            sum(self.indicadores[plus][h] * self.tarifas[TARIFA_PLUS[plus]] for plus in PLUSES_SEMANALES)
+            for h in range(HORAS_SEMANA)
+        ]
+        self._importe_acumulado = _acumular(self.importe_hueco)
+        self._por_plus = [(self._acumulados[plus], self.indicadores[plus]) for plus in PLUSES_SEMANALES]
+
+    # ------------------------------------------------------------------
+    # Acumulados
+    # ------------------------------------------------------------------
+
+    def _acumulados_en(self, segundos):
+        """Segundos de cada plus semanal desde la época hasta un instante (en segundos)"""
+        semanas, resto = divmod(segundos, _SEGUNDOS_SEMANA)
+        hueco, dentro = divmod(resto, 3600)
+        return [
+            semanas * acumulado[HORAS_SEMANA] + acumulado[hueco] + dentro * indicador[hueco]
+            for acumulado, indicador in self._por_plus
+        ]
+
+    def _importe(self, segundos):
+        """Importe de pluses semanales desde la época hasta un instante (en segundos)"""
+        acumulado = self._importe_acumulado
+        semanas, resto = divmod(segundos, _SEGUNDOS_SEMANA)
+        hueco, dentro = divmod(resto, 3600)
+        return semanas * acumulado[HORAS_SEMANA] + acumulado[hueco] + dentro / 3600 * self.importe_hueco[hueco]
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def horas_plus(self, plus, inicio, fin):
+        """Horas del plus semanal indicado entre inicio y fin"""
+        s0, s1 = _segundos(inicio), _segundos(fin)
+        if s1 <= s0:
+            return 0.0
+        i = PLUSES_SEMANALES.index(plus)
+        return (self._acumulados_en(s1)[i] - self._acumulados_en(s0)[i]) / 3600
+
+    def horas_pluses(self, inicio, fin, festivos=None):
+        """
+        Horas de cada plus horario de un turno y días en que se generan
+
+        Args:
+            inicio: datetime de inicio del turno
+            fin: datetime de fin del turno
+            festivos: CalendarioFestivos o conjunto de fechas (por defecto el de la tabla)
+
+        Returns:
+            tuple: (horas por plus, días con horas por plus)
+        """
+        festivos = self.festivos if festivos is None else festivos
+        es_calendario = isinstance(festivos, CalendarioFestivos)
+        horas = {"madrugue": 0.0, "nocturnidad": 0.0, "festividad": 0.0, "domingo": 0.0}
+        dias = {"madrugue": [], "nocturnidad": [], "festividad": [], "domingo": []}
+
+        # Un turno toca normalmente uno o dos días; se trocea por día para saber
+        # en qué días se genera cada plus
+        s0, s1 = _segundos(inicio), _segundos(fin)
+        posicion = s0
+        anterior = self._acumulados_en(s0)
+        dia = s0 // 86400
+        while posicion < s1:
+            limite = min(s1, (dia + 1) * 86400)
+            actual = self._acumulados_en(limite)
+            dia_str = date.fromordinal(_ORDINAL_EPOCA + dia).isoformat()
+
+            for i, plus in enumerate(PLUSES_SEMANALES):
+                valor = actual[i] - anterior[i]
+                if valor > 0:
+                    horas[plus] += valor / 3600
+                    dias[plus].append(dia_str)
+
+            # Capa de festivos: todo el tramo del día cuenta
+            if festivos.es_ordinal(_ORDINAL_EPOCA + dia) if es_calendario else dia_str in festivos:
+                horas["festividad"] += (limite - posicion) / 3600
+                dias["festividad"].append(dia_str)
+
+            anterior = actual
+            posicion = limite
+            dia += 1
+
+        return horas, dias
+
+    def importe_pluses(self, inicio, fin, festivos=None):
+        """Importe total de los pluses horarios de un turno (sin trocear por día)"""
+        s0, s1 = _segundos(inicio), _segundos(fin)
+        if s1 <= s0:
+            return 0.0
+        importe = self._importe(s1) - self._importe(s0)
+
+        festivos = self.festivos if festivos is None else festivos
+        if isinstance(festivos, CalendarioFestivos):
+            importe += festivos.segundos_festivos(s0, s1) / 3600 * self.tarifas["plus_festividad"]
+        elif festivos:
+            dia = s0 // 86400
+            while dia * 86400 < s1:
+                if date.fromordinal(_ORDINAL_EPOCA + dia).isoformat() in festivos:
+                    tramo = min(s1, (dia + 1) * 86400) - max(s0, dia * 86400)
+                    importe += tramo / 3600 * self.tarifas["plus_festividad"]
+                dia += 1
+        return importe
+
+
+_tablas = OrderedDict()
+_lock = threading.Lock()
+_tabla_config = None
+
+
+def obtener_tabla(tarifas=None, dias_festivos=None):
+    """
+    Tabla para unas tarifas y festivos (por defecto los vigentes), construida
+    una sola vez por versión
+
+    Args:
+        tarifas: Tarifas alternativas (p. ej. desde el simulador)
+        dias_festivos: CalendarioFestivos o lista de fechas alternativa
+
+    Returns:
+        TablaTarifas
+    """
+    global _tabla_config
+    if tarifas is None and dias_festivos is None:
+        # Camino habitual (una llamada por turno): sin recalcular la versión
+        tabla = _tabla_config
+        calendario = calendario_festivos()
+        if tabla is None or tabla.festivos is not calendario:
+            tabla = _tabla_config = TablaTarifas(TARIFAS, calendario)
+        return tabla
+
+    tarifas = TARIFAS if tarifas is None else tarifas
+    calendario = _como_calendario(dias_festivos)
+    version = version_de(tarifas, calendario)
+
+    with _lock:
+        tabla = _tablas.get(version)
+        if tabla is not None:
+            _tablas.move_to_end(version)
+            return tabla
+
+    tabla = TablaTarifas(tarifas, calendario)
+    with _lock:
+        _tablas[version] = tabla
+        while len(_tablas) > MAX_TABLAS:
+            _tablas.popitem(last=False)
+    return tabla
+
+
+def reconstruir():
+    """Descarta las tablas construidas (tras cambiar tarifas o festivos)"""
+    global _tabla_config
+    with _lock:
+        _tablas.clear()
+        _tabla_config = None
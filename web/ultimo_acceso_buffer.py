@@ -0,0 +1,165 @@
+"""
+Buffer de escritura diferida para empleados.ultimo_acceso
+
+Cada acceso se anota en memoria (solo se guarda la marca más reciente por empleado)
+y un hilo vuelca el buffer cada FLUSH_INTERVAL segundos con una única sentencia
+UPDATE ... CASE para todos los empleados pendientes. Al cerrar la aplicación se
+hace un último volcado.
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from database import db_connection, close_db_connection
+
+# Máximo de empleados por sentencia UPDATE
+TAMANO_LOTE = 500
+
+
+class UltimoAccesoBuffer:
+    """Acumula los últimos accesos y los escribe por lotes"""
+
+    def __init__(self, flush_interval=30):
+        self.flush_interval = flush_interval
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.stats = {
+            'registros': 0,
+            'flushes': 0,
+            'filas_escritas': 0,
+            'ultimo_lote': 0,
+            'lote_max': 0,
+            'ultima_latencia_ms': None,
+            'latencia_max_ms': 0.0,
+            'ultimo_flush': None,
+            'errores': 0
+        }
+
+    def registrar(self, empleado_id, momento=None):
+        """Anota un acceso del empleado (no toca la base de datos)"""
+        momento = momento or datetime.now()
+        with self._lock:
+            anterior = self._pendientes.get(empleado_id)
+            if anterior is None or momento > anterior:
+                self._pendientes[empleado_id] = momento
+            self.stats['registros'] += 1
+
+        # Sin intervalo se escribe al momento (comportamiento anterior). Un fallo no debe
+        # romper la petición que registra el acceso: el lote vuelve al buffer y se
+        # reintenta en el siguiente acceso
+        if self.flush_interval <= 0:
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error al volcar últimos accesos: {e}")
+        else:
+            self._asegurar_hilo()
+
+    def _asegurar_hilo(self):
+        """Arranca el hilo de volcado la primera vez que se registra un acceso"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._bucle, name="UltimoAccesoFlush", daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _bucle(self):
+        """Vuelca el buffer periódicamente hasta que se pide parar"""
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error al volcar últimos accesos: {e}")
+            finally:
+                close_db_connection()
+
+    def flush(self):
+        """
+        Escribe todos los accesos pendientes
+
+        Returns:
+            int: Número de empleados actualizados
+        """
+        with self._flush_lock:
+            with self._lock:
+                lote = self._pendientes
+                self._pendientes = {}
+            if not lote:
+                return 0
+
+            inicio = time.perf_counter()
+            items = sorted(lote.items())
+            try:
+                with db_connection() as conn:
+                    try:
+                        with conn.cursor() as cursor:
+                            for i in range(0, len(items), TAMANO_LOTE):
+                                parte = items[i:i + TAMANO_LOTE]
+                                casos = " ".join(["WHEN %s THEN %s"] * len(parte))
+                                placeholders = ", ".join(["%s"] * len(parte))
+                                params = [v for item in parte for v in item] + [emp_id for emp_id, _ in parte]
+                                cursor.execute(
+                                    f"""
+                                    UPDATE empleados
+                                    SET ultimo_acceso = CASE id {casos} END
+                                    WHERE id IN ({placeholders})
+                                    """,
+                                    params
+                                )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+            except Exception:
+                # Devolver el lote al buffer sin pisar accesos más recientes
+                with self._lock:
+                    for emp_id, momento in lote.items():
+                        actual = self._pendientes.get(emp_id)
+                        if actual is None or momento > actual:
+                            self._pendientes[emp_id] = momento
+                    self.stats['errores'] += 1
+                raise
+
+            latencia_ms = (time.perf_counter() - inicio) * 1000
+            with self._lock:
+                self.stats['flushes'] += 1
+                self.stats['filas_escritas'] += len(items)
+                self.stats['ultimo_lote'] = len(items)
+                self.stats['lote_max'] = max(self.stats['lote_max'], len(items))
+                self.stats['ultima_latencia_ms'] = round(latencia_ms, 2)
+                self.stats['latencia_max_ms'] = round(max(self.stats['latencia_max_ms'], latencia_ms), 2)
+                self.stats['ultimo_flush'] = datetime.now()
+            return len(items)
+
+    def stop(self):
+        """Detiene el hilo y hace el último volcado"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error en el volcado final de últimos accesos: {e}")
+
+    def get_stats(self):
+        """Estadísticas del buffer"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['pendientes'] = len(self._pendientes)
+        stats['flush_interval'] = self.flush_interval
+        return stats
+
+
+ultimo_acceso_buffer = UltimoAccesoBuffer(
+    flush_interval=float(os.getenv('ULTIMO_ACCESO_FLUSH_INTERVAL', '30'))
+)